@@ -1,82 +1,85 @@
-from database.models import User, GameRound, Bet, Transaction
+from database.models import User
+from database.repository import users, rounds, settlement_jobs
+from games.game_manager import game_manager
+from games.leadership import leadership
+from admin.analytics import analytics
 from database.db_manager import connect_db
 from config import ADMIN_IDS
-from datetime import datetime
 
 class AdminPanel:
     def __init__(self):
         pass
 
     async def is_admin(self, user_id: int) -> bool:
-        return user_id in ADMIN_IDS or User.objects(user_id=user_id, is_admin=True).first() is not None
+        return user_id in ADMIN_IDS or await users.is_admin(user_id)
 
     async def add_admin(self, user_id: int) -> bool:
-        user = User.objects(user_id=user_id).first()
-        if user:
-            user.is_admin = True
-            user.save()
-            return True
-        return False
+        return await users.set_admin(user_id, True)
 
     async def remove_admin(self, user_id: int) -> bool:
-        user = User.objects(user_id=user_id).first()
-        if user and user.is_admin:
-            user.is_admin = False
-            user.save()
-            return True
-        return False
+        return await users.set_admin(user_id, False)
 
     async def ban_user(self, user_id: int) -> bool:
-        # Implement user banning logic (e.g., add a 'is_banned' field to User model)
-        # For now, just a placeholder
-        print(f"User {user_id} banned.")
-        return True
+        banned = await users.set_banned(user_id, True)
+        if banned:
+            print(f"User {user_id} banned.")
+        return banned
 
     async def unban_user(self, user_id: int) -> bool:
-        # Implement user unbanning logic
-        print(f"User {user_id} unbanned.")
-        return True
+        unbanned = await users.set_banned(user_id, False)
+        if unbanned:
+            print(f"User {user_id} unbanned.")
+        return unbanned
 
     async def get_analytics(self):
-        total_users = User.objects.count()
-        total_bets = Bet.objects.count()
-        total_revenue = Bet.objects.sum('amount') # Sum of all bet amounts
-        # This is a simplified revenue. Real revenue would be bets - payouts.
-
-        # You might want to calculate active users based on recent activity
-        active_users = User.objects(updated_at__gte=datetime.utcnow() - datetime.timedelta(days=7)).count()
-
-        return {
-            "total_users": total_users,
-            "total_bets": total_bets,
-            "total_revenue": total_revenue,
-            "active_users_last_7_days": active_users
-        }
+        # Served from the running analytics counters; see admin.analytics
+        return analytics.snapshot()
 
     async def set_game_result(self, round_id: int, game_type: str, result: str) -> bool:
-        game_round = GameRound.objects(round_id=round_id, game_type=game_type).first()
-        if game_round:
-            game_round.result = result
-            game_round.is_manual_result = True
-            game_round.save()
-            # Trigger bet settlement for this round if it hasn't been settled
-            return True
-        return False
+        game = await game_manager.get_game_instance(game_type)
+        if not game or not game.is_valid_result(result):
+            return False
+
+        state = game_manager.get_round(game_type)
+        if state and state.round_id == round_id and state.status != 'settled':
+            # Round still running: the draw at its end uses this result instead of a random one.
+            # Written to MongoDB, since the draw may run in another worker process.
+            return await rounds.set_manual_result(state.document, result)
+
+        game_round = await rounds.get(game_type, round_id)
+        if not game_round or game_round.is_settled:
+            return False
+        if not leadership.is_leader:
+            # Only the scheduler process settles; it also settles or voids such rounds when it takes over
+            print(f"{game_type} round {round_id} has ended; its result can only be set from the scheduler process.")
+            return False
+        if await settlement_jobs.get(game_round.id):
+            # Settlement has started with the drawn result; it can only be finished, not changed
+            print(f"Result of {game_type} round {round_id} is already being settled.")
+            return False
+
+        # Ended but never settled (e.g. the process died first): settle with the manual result
+        game_round.result = result
+        game_round.is_manual_result = True
+        await rounds.save(game_round)
+        try:
+            await game.settle(game_round)
+        except Exception as e:
+            # The job keeps its checkpoint; the next startup recovery pass finishes it
+            print(f"Failed to settle {game_type} round {round_id}: {e}")
+            return False
+        return True
 
     async def add_funds(self, user_id: int, amount: float) -> bool:
-        user = User.objects(user_id=user_id).first()
+        user = await users.credit(user_id, amount)
         if user:
-            user.balance += amount
-            user.save()
             # Log this transaction
             return True
         return False
 
     async def remove_funds(self, user_id: int, amount: float) -> bool:
-        user = User.objects(user_id=user_id).first()
-        if user and user.balance >= amount:
-            user.balance -= amount
-            user.save()
+        user = await users.debit(user_id, amount)
+        if user:
             # Log this transaction
             return True
         return False
@@ -118,4 +121,4 @@ async def main():
 
 if __name__ == "__main__":
     import asyncio
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,237 @@
+import asyncio
+from datetime import datetime, timedelta
+from database.repository import analytics_buckets, users, bets, transactions
+from config import ANALYTICS_FLUSH_INTERVAL, ANALYTICS_RECONCILE_INTERVAL
+
+COUNTERS = ('new_users', 'bets', 'wagered', 'payouts', 'deposits', 'withdrawals')
+GAME_COUNTERS = ('bets', 'wagered', 'payouts')
+ACTIVE_WINDOW_DAYS = 7
+
+# granularity -> (bucket key format, truncation, how long MongoDB keeps the bucket)
+ROLLUPS = {
+    'minute': ('%Y-%m-%dT%H:%M', lambda t: t.replace(second=0, microsecond=0), timedelta(days=2)),
+    'hour': ('%Y-%m-%dT%H', lambda t: t.replace(minute=0, second=0, microsecond=0), timedelta(days=60)),
+    'day': ('%Y-%m-%d', lambda t: t.replace(hour=0, minute=0, second=0, microsecond=0), None),
+}
+
+def _empty_bucket():
+    return {'counters': dict.fromkeys(COUNTERS, 0), 'games': {}, 'active_users': set()}
+
+def _ggr(counters: dict) -> float:
+    # Gross gaming revenue: stakes taken minus winnings paid out
+    return counters['wagered'] - counters['payouts']
+
+class AnalyticsService:
+    # Real-time analytics counters.
+    # Bet placement, settlement, payment approval and sign-up call the record_* methods, which
+    # only touch memory: the running totals, the current minute/hour/day rollups and a buffer of
+    # pending increments. The buffer is flushed to AnalyticsBucket documents every few seconds
+    # with one bulk write, and the totals are periodically reconciled against the source
+    # collections so that drift from crashes or manual edits does not accumulate.
+    def __init__(self):
+        self.totals = dict.fromkeys(COUNTERS, 0)
+        self.game_totals = {} # game_type -> {bets, wagered, payouts}
+        self._current = {} # granularity -> (bucket key, bucket)
+        self._days = {} # day key -> set of active Telegram ids, for the last ACTIVE_WINDOW_DAYS days
+        self._active_window = set() # union of self._days, so the 7-day count is a len()
+        self._pending = {} # bucket key -> increments not yet written
+        self._lock = asyncio.Lock()
+        self._tasks = []
+        self.reconciled_at = None
+
+    def record_new_user(self):
+        self._add({'new_users': 1})
+
+    def record_bet(self, user_id: int, game_type: str, amount: float):
+        self._add({'bets': 1, 'wagered': amount}, game_type, {'bets': 1, 'wagered': amount}, user_id)
+
+    def record_payouts(self, game_type: str, amount: float):
+        if amount:
+            self._add({'payouts': amount}, game_type, {'payouts': amount})
+
+    def record_deposit(self, amount: float):
+        self._add({'deposits': amount})
+
+    def record_withdrawal(self, amount: float):
+        self._add({'withdrawals': amount})
+
+    def _add(self, counters: dict, game_type: str = None, game_counters: dict = None, user_id: int = None):
+        now = datetime.utcnow()
+        self._apply(self.totals, self.game_totals, counters, game_type, game_counters)
+        self._pend('total', 'total', None, None, counters, game_type, game_counters, None)
+
+        for granularity, (key_format, truncate, retention) in ROLLUPS.items():
+            start = truncate(now)
+            key = f"{granularity}:{start.strftime(key_format)}"
+            current_key, bucket = self._current.get(granularity, (None, None))
+            if current_key != key:
+                bucket = _empty_bucket()
+                self._current[granularity] = (key, bucket)
+                if granularity == 'day':
+                    self._roll_days(key, bucket)
+            self._apply(bucket['counters'], bucket['games'], counters, game_type, game_counters)
+
+            active = None
+            if granularity == 'day' and user_id is not None:
+                active = user_id
+                bucket['active_users'].add(user_id)
+                self._active_window.add(user_id)
+            self._pend(key, granularity, start, start + retention if retention else None,
+                       counters, game_type, game_counters, active)
+
+    def _apply(self, totals: dict, game_totals: dict, counters: dict, game_type: str, game_counters: dict):
+        for name, value in counters.items():
+            totals[name] = totals.get(name, 0) + value
+        if game_type and game_counters:
+            per_game = game_totals.setdefault(game_type, dict.fromkeys(GAME_COUNTERS, 0))
+            for name, value in game_counters.items():
+                per_game[name] = per_game.get(name, 0) + value
+
+    def _pend(self, key, granularity, start, expires_at, counters, game_type, game_counters, active_user):
+        pending = self._pending.setdefault(key, {'granularity': granularity, 'bucket_start': start,
+                                                 'expires_at': expires_at, 'inc': {}, 'active_users': set()})
+        for name, value in counters.items():
+            pending['inc'][f'counters.{name}'] = pending['inc'].get(f'counters.{name}', 0) + value
+        if game_type and game_counters:
+            for name, value in game_counters.items():
+                field = f'games.{game_type}.{name}'
+                pending['inc'][field] = pending['inc'].get(field, 0) + value
+        if active_user is not None:
+            pending['active_users'].add(active_user)
+
+    def _roll_days(self, key: str, bucket: dict):
+        # A new day started: drop days that left the window and rebuild the union once
+        self._days[key] = bucket['active_users']
+        oldest = (datetime.utcnow() - timedelta(days=ACTIVE_WINDOW_DAYS - 1)).strftime(ROLLUPS['day'][0])
+        self._days = {day: ids for day, ids in self._days.items() if day >= f"day:{oldest}"}
+        self._active_window = set().union(*self._days.values())
+
+    def snapshot(self) -> dict:
+        # O(1) read for the admin panel; no queries
+        today_bucket = self._current_bucket('day')
+        today = dict(today_bucket['counters'])
+        this_hour = dict(self._current_bucket('hour')['counters'])
+        return {
+            "total_users": self.totals['new_users'],
+            "total_bets": self.totals['bets'],
+            "total_wagered": self.totals['wagered'],
+            "total_payouts": self.totals['payouts'],
+            "ggr": _ggr(self.totals),
+            "total_deposits": self.totals['deposits'],
+            "total_withdrawals": self.totals['withdrawals'],
+            "today": dict(today, ggr=_ggr(today)),
+            "this_hour": dict(this_hour, ggr=_ggr(this_hour)),
+            "active_users_today": len(today_bucket['active_users']),
+            "active_users_last_7_days": len(self._active_window),
+            "games": {game_type: dict(values, ggr=values['wagered'] - values['payouts'])
+                      for game_type, values in self.game_totals.items()},
+            "reconciled_at": self.reconciled_at
+        }
+
+    def _current_bucket(self, granularity: str) -> dict:
+        key_format, truncate, _ = ROLLUPS[granularity]
+        current_key, bucket = self._current.get(granularity, (None, None))
+        if current_key != f"{granularity}:{truncate(datetime.utcnow()).strftime(key_format)}":
+            return _empty_bucket() # Nothing recorded in this period yet
+        return bucket
+
+    async def start(self):
+        await self.load()
+        self._tasks = [asyncio.create_task(self._flush_loop()), asyncio.create_task(self._reconcile_loop())]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await self.flush()
+
+    async def load(self):
+        # Restore totals, the current rollups and the active-user window after a restart
+        total = await analytics_buckets.get('total')
+        if total:
+            self.totals.update(total.counters or {})
+            self.game_totals = {game_type: dict(dict.fromkeys(GAME_COUNTERS, 0), **values)
+                                for game_type, values in (total.games or {}).items()}
+            self.reconciled_at = total.reconciled_at
+        else:
+            await self.reconcile()
+
+        now = datetime.utcnow()
+        for granularity, (key_format, truncate, _) in ROLLUPS.items():
+            key = f"{granularity}:{truncate(now).strftime(key_format)}"
+            doc = await analytics_buckets.get(key)
+            bucket = _empty_bucket()
+            if doc:
+                bucket['counters'].update(doc.counters or {})
+                bucket['games'] = {game_type: dict(values) for game_type, values in (doc.games or {}).items()}
+                bucket['active_users'] = set(doc.active_users or [])
+            self._current[granularity] = (key, bucket)
+
+        since = ROLLUPS['day'][1](now) - timedelta(days=ACTIVE_WINDOW_DAYS - 1)
+        self._days = {doc.key: set(doc.active_users or []) for doc in await analytics_buckets.days_since(since)}
+        self._days[self._current['day'][0]] = self._current['day'][1]['active_users']
+        self._active_window = set().union(*self._days.values())
+
+    async def flush(self):
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        try:
+            await analytics_buckets.apply(pending)
+        except Exception as e:
+            # Put the increments back so they are written with the next flush
+            print(f"Failed to flush analytics counters: {e}")
+            for key, update in pending.items():
+                current = self._pending.setdefault(key, dict(update, inc={}, active_users=set()))
+                for field, value in update['inc'].items():
+                    current['inc'][field] = current['inc'].get(field, 0) + value
+                current['active_users'] |= update['active_users']
+
+    async def reconcile(self):
+        # Recompute the running totals from the source collections and persist them
+        async with self._lock:
+            await self.flush()
+            game_totals = await bets.totals_by_game()
+            approved = await transactions.approved_totals()
+            counters = {
+                'new_users': await users.count(),
+                'bets': sum(values['bets'] for values in game_totals.values()),
+                'wagered': sum(values['wagered'] for values in game_totals.values()),
+                'payouts': sum(values['payouts'] for values in game_totals.values()),
+                'deposits': approved.get('deposit', 0),
+                'withdrawals': approved.get('withdrawal', 0)
+            }
+            drift = {name: counters[name] - self.totals.get(name, 0) for name in COUNTERS
+                     if abs(counters[name] - self.totals.get(name, 0)) > 1e-6}
+            if drift:
+                print(f"Analytics reconcile corrected drift: {drift}")
+
+            await analytics_buckets.set_totals(counters, game_totals)
+
+            # Events recorded while the aggregation ran are still pending; keep them on top
+            in_flight = self._pending.get('total', {}).get('inc', {})
+            self.totals = dict(counters)
+            self.game_totals = {game_type: dict(values) for game_type, values in game_totals.items()}
+            for field, value in in_flight.items():
+                section, *path = field.split('.')
+                if section == 'counters':
+                    self.totals[path[0]] = self.totals.get(path[0], 0) + value
+                else:
+                    per_game = self.game_totals.setdefault(path[0], dict.fromkeys(GAME_COUNTERS, 0))
+                    per_game[path[1]] = per_game.get(path[1], 0) + value
+            self.reconciled_at = datetime.utcnow()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(ANALYTICS_FLUSH_INTERVAL)
+            async with self._lock:
+                await self.flush()
+
+    async def _reconcile_loop(self):
+        while True:
+            await asyncio.sleep(ANALYTICS_RECONCILE_INTERVAL)
+            try:
+                await self.reconcile()
+            except Exception as e:
+                print(f"Analytics reconcile failed: {e}")
+
+analytics = AnalyticsService()
@@ -0,0 +1,121 @@
+import asyncio
+import time
+from datetime import datetime
+from pyrogram.errors import RPCError
+from database.repository import users, broadcasts
+from bot.utils.rate_limiter import TokenBucket
+from bot.utils.outbox import outbox, BROADCAST
+from games.leadership import leadership
+from config import (BROADCAST_CONCURRENCY, BROADCAST_RATE_PER_SECOND, BROADCAST_PAGE_SIZE,
+                    BROADCAST_PROGRESS_INTERVAL)
+
+class BroadcastManager:
+    # Runs admin broadcasts as resumable background jobs.
+    # Recipients are streamed as keyset pages of user_id; each page is sent with bounded
+    # concurrency under a global rate limit, then checkpointed on the BroadcastJob document.
+    # Messages go out through the outbox's lowest-priority lane, which also handles FloodWait;
+    # the broadcast's own rate limit keeps it from taking the whole global send budget.
+    # After a crash a job resumes from its last checkpoint, so at most one page may be re-sent.
+    # Jobs only run in the scheduler process, which picks up new ones on every lease renewal, so
+    # a broadcast started from any worker process is sent exactly once.
+    def __init__(self):
+        self.limiter = TokenBucket(BROADCAST_RATE_PER_SECOND)
+        self._tasks = {}
+
+    async def start(self, client, admin_user_id: int, text: str, progress_message=None):
+        job = await broadcasts.create(
+            text=text,
+            created_by=admin_user_id,
+            total=await users.count(),
+            progress_chat_id=progress_message.chat.id if progress_message else None,
+            progress_message_id=progress_message.id if progress_message else None
+        )
+        if leadership.is_leader:
+            self._launch(client, job)
+        return job
+
+    async def resume_pending(self, client):
+        for job in await broadcasts.unfinished():
+            if job.id not in self._tasks:
+                print(f"Resuming broadcast {job.id} after user {job.last_user_id} ({job.sent + job.failed}/{job.total} done)")
+                self._launch(client, job)
+
+    async def stop(self):
+        # Leadership listener: the next scheduler process resumes these from their checkpoints
+        for task in list(self._tasks.values()):
+            task.cancel()
+
+    def _launch(self, client, job):
+        task = asyncio.create_task(self._run(client, job))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+
+    async def _run(self, client, job):
+        semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+        started = time.monotonic()
+        done_at_start = job.sent + job.failed
+        last_report = started
+
+        while True:
+            user_ids = await users.user_ids_after(job.last_user_id, BROADCAST_PAGE_SIZE)
+            if not user_ids:
+                break
+
+            results = await asyncio.gather(*(self._send(client, semaphore, user_id, job.text) for user_id in user_ids))
+            job.sent += results.count(True)
+            job.failed += results.count(False)
+            job.last_user_id = user_ids[-1]
+            await broadcasts.save(job) # Checkpoint
+
+            if time.monotonic() - last_report >= BROADCAST_PROGRESS_INTERVAL:
+                await self._report(client, job, started, done_at_start)
+                last_report = time.monotonic()
+
+        job.status = 'completed'
+        job.finished_at = datetime.utcnow()
+        await broadcasts.save(job)
+        await self._report(client, job, started, done_at_start)
+        print(f"Broadcast {job.id} completed: {job.sent} sent, {job.failed} failed.")
+
+    async def _send(self, client, semaphore, user_id: int, text: str) -> bool:
+        async with semaphore:
+            await self.limiter.acquire()
+            try:
+                await outbox.send_message(client, user_id, f"**📣 Admin Broadcast:**\n\n{text}", lane=BROADCAST,
+                                          parse_mode="Markdown")
+                return True
+            except RPCError as e:
+                # Blocked the bot, deactivated account, FloodWait retries used up, etc.
+                print(f"Failed to send broadcast to {user_id}: {e}")
+                return False
+
+    def _progress_text(self, job, started: float, done_at_start: int) -> str:
+        done = job.sent + job.failed
+        elapsed = max(time.monotonic() - started, 0.001)
+        throughput = (done - done_at_start) / elapsed
+        remaining = max(job.total - done, 0)
+        if job.status == 'completed':
+            eta = "done"
+        elif throughput > 0:
+            eta = f"{int(remaining / throughput)}s"
+        else:
+            eta = "unknown"
+        return f"**📣 Broadcast {job.status.title()}**\n\n" \
+               f"**Sent**: {job.sent}\n" \
+               f"**Failed**: {job.failed}\n" \
+               f"**Progress**: {done}/{job.total}\n" \
+               f"**Throughput**: {throughput:.1f} msg/s\n" \
+               f"**ETA**: {eta}"
+
+    async def _report(self, client, job, started: float, done_at_start: int):
+        if not job.progress_chat_id or not job.progress_message_id:
+            return
+        try:
+            await outbox.edit_message_text(client, job.progress_chat_id, job.progress_message_id,
+                                           self._progress_text(job, started, done_at_start), lane=BROADCAST,
+                                           parse_mode="Markdown")
+        except RPCError as e:
+            print(f"Failed to update broadcast progress: {e}")
+
+broadcast_manager = BroadcastManager()
+leadership.on_step_down(broadcast_manager.stop)
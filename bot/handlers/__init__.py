@@ -1,2 +1,3 @@
 from . import user_commands
-from . import admin_commands
\ No newline at end of file
+from . import admin_commands
+from . import dispatch
\ No newline at end of file
@@ -1,18 +1,39 @@
 from pyrogram import Client, filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from database.models import User, Transaction, GameRound
+from database.repository import transactions
+from database.user_cache import user_cache
+from games.bet_ingest import bet_ingest
+from games.game_manager import game_manager
 from admin.admin_panel import AdminPanel
-from config import ADMIN_IDS
+from admin.broadcast import broadcast_manager
+from bot.utils.conversation import conversations, ADMIN
+from bot.utils.router import router
+from bot.utils.outbox import outbox, PAYMENT
+from bot.utils.notifier import result_notifier
+from bot.utils.countdown import countdowns
+from bot.utils.sequencer import updates
+from games.leadership import leadership
+from bot.utils.callback_codec import PAYMENT_QUEUE
+from payments.deposit import DepositManager
+from payments.withdrawal import WithdrawalManager
+from config import PAYMENT_QUEUE_PAGE_SIZE
 
 admin_panel = AdminPanel()
+deposit_manager = DepositManager()
+withdrawal_manager = WithdrawalManager()
 
 @Client.on_message(filters.command("admin") & filters.private)
+@updates.ordered
 async def admin_menu_command(client: Client, message):
-    if not await admin_panel.is_admin(message.from_user.id):
-        await message.reply_text("You are not authorized to access the admin panel.")
+    await _show_admin_menu(message, message.from_user.id)
+
+async def _show_admin_menu(message, user_id: int):
+    # Replies to `message` with the admin menu, if user_id is an admin
+    if not await admin_panel.is_admin(user_id):
+        await outbox.reply(message, "You are not authorized to access the admin panel.")
         return
 
-    await message.reply_text(
+    await outbox.reply(message,
         "**⚙️ Admin Panel**\n\n" \
         "Welcome, Admin! Choose an action:",
         reply_markup=InlineKeyboardMarkup([
@@ -26,31 +47,72 @@ async def admin_menu_command(client: Client, message):
         parse_mode="Markdown"
     )
 
-@Client.on_callback_query(filters.regex("^admin_analytics$"))
+@router.callback("admin_analytics")
 async def admin_analytics_callback(client: Client, callback_query):
     if not await admin_panel.is_admin(callback_query.from_user.id):
         await callback_query.answer("Not authorized.", show_alert=True)
         return
 
     analytics = await admin_panel.get_analytics()
+    today = analytics['today']
     text = f"**📊 System Analytics**\n\n" \
            f"**Total Users**: {analytics['total_users']}\n" \
            f"**Total Bets**: {analytics['total_bets']}\n" \
-           f"**Total Revenue (Simplified)**: {analytics['total_revenue']:.2f}\n" \
-           f"**Active Users (Last 7 Days)**: {analytics['active_users_last_7_days']}"
-
-    await callback_query.message.edit_text(text, parse_mode="Markdown",
-                                          reply_markup=InlineKeyboardMarkup([
-                                              [InlineKeyboardButton("🔙 Back to Admin Menu", callback_data="admin_menu")]
-                                          ]))
-
-@Client.on_callback_query(filters.regex("^admin_payments$"))
+           f"**Total Wagered**: {analytics['total_wagered']:.2f}\n" \
+           f"**Total Payouts**: {analytics['total_payouts']:.2f}\n" \
+           f"**GGR**: {analytics['ggr']:.2f}\n" \
+           f"**Deposits / Withdrawals**: {analytics['total_deposits']:.2f} / {analytics['total_withdrawals']:.2f}\n" \
+           f"**Active Users (Today / Last 7 Days)**: {analytics['active_users_today']} / {analytics['active_users_last_7_days']}\n\n" \
+           f"**Today**: {today['bets']} bets, {today['wagered']:.2f} wagered, GGR {today['ggr']:.2f}, {today['new_users']} new users\n" \
+           f"**This Hour**: {analytics['this_hour']['bets']} bets, GGR {analytics['this_hour']['ggr']:.2f}\n\n" \
+           f"**Per Game**:\n"
+    for game_type, values in sorted(analytics['games'].items()):
+        text += f"- {game_type}: {values['bets']} bets, {values['wagered']:.2f} wagered, GGR {values['ggr']:.2f}\n"
+
+    sessions = await conversations.metrics()
+    text += f"\n**Conversations**: {sessions['live_sessions']} live, {sessions['expired']} expired, " \
+            f"{sessions['evicted']} evicted ({sessions['backend']})"
+    cache = user_cache.metrics()
+    text += f"\n**User Cache**: {cache['size']} users, {cache['hit_rate']:.1%} hit rate " \
+            f"({cache['revalidated']} revalidated, {cache['refetched']} refetched, {cache['evictions']} evicted)"
+    ingest = bet_ingest.metrics()
+    text += f"\n**Bet Ingestion**: {ingest['bets_written']} bets in {ingest['batches']} batches " \
+            f"(avg {ingest['avg_batch']:.1f}, max {ingest['max_batch']}, {ingest['avg_flush_ms']:.1f} ms/flush), " \
+            f"{ingest['bets_failed']} failed, {ingest['bets_unconfirmed']} unconfirmed, {ingest['queued']} queued"
+    sending = outbox.metrics()
+    text += f"\n**Outbox**: {sending['in_flight']} in flight, {sending['coalesced']} edits coalesced, " \
+            f"{sending['flood_waits']} FloodWaits\n"
+    for lane, values in sending['lanes'].items():
+        text += f"- {lane}: {values['queued']} queued, {values['sent']} sent, {values['failed']} failed, " \
+                f"avg {values['avg_latency_ms']:.0f} ms (max {values['max_latency_ms']:.0f} ms)\n"
+    results = result_notifier.metrics()
+    text += f"**Result Messages**: {results['sent']} sent, {results['failed']} failed, " \
+            f"{results['rounds_notified']} rounds done, {results['rounds_in_progress']} in progress\n"
+    counting = countdowns.metrics()
+    text += f"**Countdowns**: {counting['tracked']} menus in {counting['rounds']} rounds, {counting['edits']} edits, " \
+            f"{counting['deferred']} deferred, {counting['failed']} failed\n"
+    sequencing = updates.metrics()
+    deepest = ", ".join(f"{user_id}: {depth}" for depth, user_id in sequencing['deepest']) or "none"
+    text += f"**Update Queues**: {sequencing['queued']} queued for {sequencing['shards']} users " \
+            f"(deepest {deepest}; max {sequencing['max_depth']}), {sequencing['rejected']} rejected, " \
+            f"avg wait {sequencing['avg_wait_ms']:.0f} ms\n"
+    leading = leadership.metrics()
+    role = "runs the scheduler" if leading['is_leader'] else "follows the scheduler process"
+    text += f"**Worker** `{leading['worker_id']}`: {role} ({leading['promotions']} promotions, " \
+            f"{leading['step_downs']} step-downs, {leading['renew_failures']} failed renewals)"
+
+    await outbox.edit(callback_query.message, text, parse_mode="Markdown",
+                     reply_markup=InlineKeyboardMarkup([
+                         [InlineKeyboardButton("🔙 Back to Admin Menu", callback_data="admin_menu")]
+                     ]))
+
+@router.callback("admin_payments")
 async def admin_payments_callback(client: Client, callback_query):
     if not await admin_panel.is_admin(callback_query.from_user.id):
         await callback_query.answer("Not authorized.", show_alert=True)
         return
 
-    await callback_query.message.edit_text(
+    await outbox.edit(callback_query.message,
         "**💰 Payment Management**\n\n" \
         "Review and approve deposits/withdrawals.",
         reply_markup=InlineKeyboardMarkup([
@@ -61,136 +123,145 @@ async def admin_payments_callback(client: Client, callback_query):
         parse_mode="Markdown"
     )
 
-@Client.on_callback_query(filters.regex("^admin_pending_deposits$"))
-async def admin_pending_deposits_callback(client: Client, callback_query):
-    if not await admin_panel.is_admin(callback_query.from_user.id):
-        await callback_query.answer("Not authorized.", show_alert=True)
+# Payment review queue: a single editable message per admin, PAYMENT_QUEUE_PAGE_SIZE rows per page.
+# Buttons carry packed PAYMENT_QUEUE callback data (see bot.utils.callback_codec). Row actions
+# carry the first id of the page, so the same page is re-rendered afterwards. Approve all / reject
+# all carry the first and last id of the page and act on every pending row between them.
+# Deposits have no bulk approve: nothing records a payment proof yet, so each one is checked by hand.
+PAYMENT_KINDS = {'d': 'deposit', 'w': 'withdrawal'}
+
+def _payment_row_text(index: int, kind: str, txn: dict, user: dict) -> str:
+    text = f"**{index}. {txn['amount']:.2f}** via {txn.get('payment_method')} - " \
+           f"{user.get('first_name')} (@{user.get('username') or 'N/A'}) (ID: {user.get('user_id')})\n" \
+           f"    Txn ID: `{txn.get('transaction_id')}` | {txn['created_at'].strftime('%Y-%m-%d %H:%M')}\n"
+    if kind == 'd' and txn.get('screenshot_proof'):
+        text += f"    [Screenshot Proof]({txn['screenshot_proof']})\n"
+    elif kind == 'w':
+        text += f"    Address: {txn.get('screenshot_proof')}\n"
+    return text
+
+async def _show_payment_queue(callback_query, kind: str, after=None, before=None, start=None, notice: str = None):
+    transaction_type = PAYMENT_KINDS[kind]
+    get_page = deposit_manager.get_pending_deposits if kind == 'd' else withdrawal_manager.get_pending_withdrawals
+    rows, users_by_pk, has_previous, has_next = await get_page(PAYMENT_QUEUE_PAGE_SIZE, after=after, before=before, start=start)
+    if not rows and (after or before or start):
+        # The page emptied out, e.g. its last row was just approved; go back to the start of the queue
+        rows, users_by_pk, has_previous, has_next = await get_page(PAYMENT_QUEUE_PAGE_SIZE)
+
+    back_button = [InlineKeyboardButton("🔙 Back to Payment Management", callback_data="admin_payments")]
+    if not rows:
+        text = f"{notice}\n\n" if notice else ""
+        await outbox.edit(callback_query.message, text + f"No pending {transaction_type} requests.", lane=PAYMENT,
+                         reply_markup=InlineKeyboardMarkup([back_button]), parse_mode="Markdown")
         return
 
-    pending_deposits = Transaction.objects(transaction_type='deposit', status='pending').all()
-
-    if not pending_deposits:
-        await callback_query.message.edit_text("No pending deposit requests.",
-                                              reply_markup=InlineKeyboardMarkup([
-                                                  [InlineKeyboardButton("🔙 Back to Payment Management", callback_data="admin_payments")]
-                                              ]))
-        return
-
-    for deposit in pending_deposits:
-        user = User.objects(id=deposit.user.id).first()
-        text = f"**📥 Pending Deposit Request**\n\n" \
-               f"**User**: {user.first_name} (@{user.username or 'N/A'}) (ID: {user.user_id})\n" \
-               f"**Amount**: {deposit.amount:.2f}\n" \
-               f"**Method**: {deposit.payment_method}\n" \
-               f"**Txn ID**: `{deposit.transaction_id}`\n" \
-               f"**Date**: {deposit.created_at.strftime('%Y-%m-%d %H:%M')}"
-        
-        if deposit.screenshot_proof:
-            text += f"\n[Screenshot Proof]({deposit.screenshot_proof})"
-
-        keyboard = InlineKeyboardMarkup([
-            [InlineKeyboardButton("✅ Approve", callback_data=f"approve_deposit_{deposit.transaction_id}"),
-             InlineKeyboardButton("❌ Reject", callback_data=f"reject_deposit_{deposit.transaction_id}")]
+    title = "📥 Pending Deposits" if kind == 'd' else "📤 Pending Withdrawals"
+    text = f"{notice}\n\n" if notice else ""
+    text += f"**{title}**\n\n"
+    first_id = rows[0]['_id']
+    keyboard = []
+    for index, txn in enumerate(rows, start=1):
+        text += _payment_row_text(index, kind, txn, users_by_pk.get(txn['user'], {})) + "\n"
+        keyboard.append([
+            InlineKeyboardButton(f"✅ Approve #{index}", callback_data=PAYMENT_QUEUE.encode(kind=kind, op='a', target=txn['_id'], page=first_id)),
+            InlineKeyboardButton(f"❌ Reject #{index}", callback_data=PAYMENT_QUEUE.encode(kind=kind, op='r', target=txn['_id'], page=first_id))
         ])
-        await client.send_message(callback_query.from_user.id, text, reply_markup=keyboard, parse_mode="Markdown")
-    
-    await callback_query.answer("Displayed pending deposit requests.")
 
-@Client.on_callback_query(filters.regex("^approve_deposit_"))
-async def approve_deposit_callback(client: Client, callback_query):
+    last_id = rows[-1]['_id']
+    bulk_row = [InlineKeyboardButton("❌ Reject all", callback_data=PAYMENT_QUEUE.encode(kind=kind, op='R', target=first_id, page=last_id))]
+    if kind == 'w':
+        bulk_row.insert(0, InlineKeyboardButton("✅ Approve all", callback_data=PAYMENT_QUEUE.encode(kind=kind, op='A', target=first_id, page=last_id)))
+    keyboard.append(bulk_row)
+
+    navigation = []
+    if has_previous:
+        navigation.append(InlineKeyboardButton("⬅️ Prev", callback_data=PAYMENT_QUEUE.encode(kind=kind, op='p', target=first_id)))
+    if has_next:
+        navigation.append(InlineKeyboardButton("Next ➡️", callback_data=PAYMENT_QUEUE.encode(kind=kind, op='n', target=last_id)))
+    if navigation:
+        keyboard.append(navigation)
+    keyboard.append(back_button)
+
+    await outbox.edit(callback_query.message, text, lane=PAYMENT, reply_markup=InlineKeyboardMarkup(keyboard),
+                     parse_mode="Markdown", disable_web_page_preview=True)
+
+@router.callback("admin_pending_deposits")
+@router.callback("admin_pending_withdrawals")
+async def admin_pending_payments_callback(client: Client, callback_query):
     if not await admin_panel.is_admin(callback_query.from_user.id):
         await callback_query.answer("Not authorized.", show_alert=True)
         return
 
-    transaction_id = callback_query.data.replace("approve_deposit_", "")
-    from payments.deposit import DepositManager
-    deposit_manager = DepositManager()
-    success, msg = await deposit_manager.approve_deposit(transaction_id, callback_query.from_user.id)
-    await callback_query.message.edit_text(f"Deposit {transaction_id}: {msg}")
-    await callback_query.answer(msg, show_alert=True)
+    kind = 'd' if callback_query.data == "admin_pending_deposits" else 'w'
+    await _show_payment_queue(callback_query, kind)
+    await callback_query.answer()
 
-@Client.on_callback_query(filters.regex("^reject_deposit_"))
-async def reject_deposit_callback(client: Client, callback_query):
+@router.action(PAYMENT_QUEUE)
+async def payment_queue_callback(client: Client, callback_query, payload):
     if not await admin_panel.is_admin(callback_query.from_user.id):
         await callback_query.answer("Not authorized.", show_alert=True)
         return
 
-    transaction_id = callback_query.data.replace("reject_deposit_", "")
-    from payments.deposit import DepositManager
-    deposit_manager = DepositManager()
-    success, msg = await deposit_manager.reject_deposit(transaction_id, callback_query.from_user.id)
-    await callback_query.message.edit_text(f"Deposit {transaction_id}: {msg}")
-    await callback_query.answer(msg, show_alert=True)
+    kind, action, target, page = payload
 
-@Client.on_callback_query(filters.regex("^admin_pending_withdrawals$"))
-async def admin_pending_withdrawals_callback(client: Client, callback_query):
-    if not await admin_panel.is_admin(callback_query.from_user.id):
-        await callback_query.answer("Not authorized.", show_alert=True)
+    if action == 'n':
+        await _show_payment_queue(callback_query, kind, after=target)
+        await callback_query.answer()
         return
-
-    pending_withdrawals = Transaction.objects(transaction_type='withdrawal', status='pending').all()
-
-    if not pending_withdrawals:
-        await callback_query.message.edit_text("No pending withdrawal requests.",
-                                              reply_markup=InlineKeyboardMarkup([
-                                                  [InlineKeyboardButton("🔙 Back to Payment Management", callback_data="admin_payments")]
-                                              ]))
+    if action == 'p':
+        await _show_payment_queue(callback_query, kind, before=target)
+        await callback_query.answer()
         return
 
-    for withdrawal in pending_withdrawals:
-        user = User.objects(id=withdrawal.user.id).first()
-        text = f"**📤 Pending Withdrawal Request**\n\n" \
-               f"**User**: {user.first_name} (@{user.username or 'N/A'}) (ID: {user.user_id})\n" \
-               f"**Amount**: {withdrawal.amount:.2f}\n" \
-               f"**Method**: {withdrawal.payment_method}\n" \
-               f"**Address**: {withdrawal.screenshot_proof} " \
-               f"**Txn ID**: `{withdrawal.transaction_id}`\n" \
-               f"**Date**: {withdrawal.created_at.strftime('%Y-%m-%d %H:%M')}"
-
-        keyboard = InlineKeyboardMarkup([
-            [InlineKeyboardButton("✅ Approve", callback_data=f"approve_withdrawal_{withdrawal.transaction_id}"),
-             InlineKeyboardButton("❌ Reject", callback_data=f"reject_withdrawal_{withdrawal.transaction_id}")]
-        ])
-        await client.send_message(callback_query.from_user.id, text, reply_markup=keyboard, parse_mode="Markdown")
-    
-    await callback_query.answer("Displayed pending withdrawal requests.")
-
-@Client.on_callback_query(filters.regex("^approve_withdrawal_"))
-async def approve_withdrawal_callback(client: Client, callback_query):
-    if not await admin_panel.is_admin(callback_query.from_user.id):
-        await callback_query.answer("Not authorized.", show_alert=True)
+    if action in ('A', 'R'):
+        await _bulk_payment_action(callback_query, kind, action, target, page)
         return
 
-    transaction_id = callback_query.data.replace("approve_withdrawal_", "")
-    from payments.withdrawal import WithdrawalManager
-    withdrawal_manager = WithdrawalManager()
-    success, msg = await withdrawal_manager.approve_withdrawal(transaction_id, callback_query.from_user.id)
-    await callback_query.message.edit_text(f"Withdrawal {transaction_id}: {msg}")
-    await callback_query.answer(msg, show_alert=True)
-
-@Client.on_callback_query(filters.regex("^reject_withdrawal_"))
-async def reject_withdrawal_callback(client: Client, callback_query):
-    if not await admin_panel.is_admin(callback_query.from_user.id):
-        await callback_query.answer("Not authorized.", show_alert=True)
+    transaction = await transactions.get_by_pk(target)
+    if not transaction:
+        msg = "Transaction not found."
+    elif kind == 'd':
+        handler = deposit_manager.approve_deposit if action == 'a' else deposit_manager.reject_deposit
+        success, msg = await handler(transaction.transaction_id, callback_query.from_user.id)
+    else:
+        handler = withdrawal_manager.approve_withdrawal if action == 'a' else withdrawal_manager.reject_withdrawal
+        success, msg = await handler(transaction.transaction_id, callback_query.from_user.id)
+
+    # Re-render the page the admin was looking at, minus the row that was just handled
+    await _show_payment_queue(callback_query, kind, start=page, notice=msg)
+    await callback_query.answer(msg)
+
+async def _bulk_payment_action(callback_query, kind: str, action: str, first, last):
+    admin_user_id = callback_query.from_user.id
+    if kind == 'd' and action == 'A':
+        # Button from a queue message sent before deposits lost their bulk approve
+        await callback_query.answer("Approve deposits one at a time.", show_alert=True)
         return
+    if kind == 'd':
+        success, msg, results = await deposit_manager.reject_deposits(admin_user_id, first=first, last=last)
+    elif action == 'A':
+        success, msg, results = await withdrawal_manager.approve_withdrawals(admin_user_id, first=first, last=last)
+    else:
+        success, msg, results = await withdrawal_manager.reject_withdrawals(admin_user_id, first=first, last=last)
 
-    transaction_id = callback_query.data.replace("reject_withdrawal_", "")
-    from payments.withdrawal import WithdrawalManager
-    withdrawal_manager = WithdrawalManager()
-    success, msg = await withdrawal_manager.reject_withdrawal(transaction_id, callback_query.from_user.id)
-    await callback_query.message.edit_text(f"Withdrawal {transaction_id}: {msg}")
-    await callback_query.answer(msg, show_alert=True)
+    summary = msg
+    if results:
+        summary += "\n" + "\n".join(f"- `{transaction_id}`: {status}" for transaction_id, status in results.items())
+    # Rows left on this page (e.g. handled meanwhile by another admin) are shown again below the summary
+    await _show_payment_queue(callback_query, kind, start=first, notice=summary)
+    await callback_query.answer(msg)
 
-@Client.on_callback_query(filters.regex("^admin_games$"))
+@router.callback("admin_games")
 async def admin_games_callback(client: Client, callback_query):
     if not await admin_panel.is_admin(callback_query.from_user.id):
         await callback_query.answer("Not authorized.", show_alert=True)
         return
 
-    await callback_query.message.edit_text(
+    await outbox.edit(callback_query.message,
         "**🎮 Game Management**\n\n" \
         "Control game results and settings.",
         reply_markup=InlineKeyboardMarkup([
+            [InlineKeyboardButton("📈 Live Exposure", callback_data="admin_exposure")],
             [InlineKeyboardButton("🎲 Set Game Result", callback_data="admin_set_game_result")],
             [InlineKeyboardButton("⚙️ Update Game Settings", callback_data="admin_update_game_settings")],
             [InlineKeyboardButton("🔙 Back to Admin Menu", callback_data="admin_menu")]
@@ -198,13 +269,43 @@ async def admin_games_callback(client: Client, callback_query):
         parse_mode="Markdown"
     )
 
-@Client.on_callback_query(filters.regex("^admin_set_game_result$"))
+EXPOSURE_TOP_OUTCOMES = 5 # Outcomes listed per game, largest liability first
+
+@router.callback("admin_exposure")
+async def admin_exposure_callback(client: Client, callback_query):
+    if not await admin_panel.is_admin(callback_query.from_user.id):
+        await callback_query.answer("Not authorized.", show_alert=True)
+        return
+
+    # Served from the in-memory round table; no bet is read from the database
+    text = "**📈 Live Exposure**\n"
+    reports = game_manager.get_all_exposure()
+    if not reports:
+        text += "\nNo rounds are running."
+    for report in sorted(reports, key=lambda report: report['game_type']):
+        text += f"\n**{report['game_type']}** round {report['round_id']} ({report['status']}): " \
+                f"{report['total_bets']} bets, {report['total_stake']:.2f} staked\n"
+        if not report['outcomes']:
+            text += "- No bets yet\n"
+        for outcome in report['outcomes'][:EXPOSURE_TOP_OUTCOMES]:
+            text += f"- `{outcome['bet_value']}`: {outcome['stake']:.2f} from {outcome['bettors']} bettors, " \
+                    f"pays {outcome['potential_payout']:.2f} (house {outcome['house_net']:+.2f})\n"
+
+    # A refresh with no new bets is not an error: the outbox ignores unchanged edits
+    await outbox.edit(callback_query.message, text, parse_mode="Markdown",
+                     reply_markup=InlineKeyboardMarkup([
+                         [InlineKeyboardButton("🔄 Refresh", callback_data="admin_exposure")],
+                         [InlineKeyboardButton("🔙 Back to Games", callback_data="admin_games")]
+                     ]))
+    await callback_query.answer()
+
+@router.callback("admin_set_game_result")
 async def admin_set_game_result_callback(client: Client, callback_query):
     if not await admin_panel.is_admin(callback_query.from_user.id):
         await callback_query.answer("Not authorized.", show_alert=True)
         return
 
-    await callback_query.message.edit_text(
+    await outbox.edit(callback_query.message,
         "**🎲 Set Game Result**\n\n" \
         "Reply to this message with `game_type round_id result` (e.g., `color_prediction 123 red`).",
         reply_markup=InlineKeyboardMarkup([
@@ -212,51 +313,45 @@ async def admin_set_game_result_callback(client: Client, callback_query):
         ]),
         parse_mode="Markdown"
     )
-    client.admin_context[callback_query.from_user.id] = {"state": "waiting_for_game_result", "message_id": callback_query.message.id}
+    await conversations.start(callback_query.from_user.id, ADMIN, "waiting_for_game_result", callback_query.message.id)
 
-@Client.on_message(filters.text & filters.private & filters.reply)
-async def handle_admin_reply(client: Client, message):
+@router.reply(ADMIN)
+async def handle_admin_reply(client: Client, message, context):
     user_id = message.from_user.id
-    if user_id not in client.admin_context:
-        return
 
-    context = client.admin_context[user_id]
-
-    if context["state"] == "waiting_for_game_result":
+    if context.step == "waiting_for_game_result":
         parts = message.text.split()
         if len(parts) != 3:
-            await message.reply_text("Invalid format. Usage: `game_type round_id result`")
+            await outbox.reply(message, "Invalid format. Usage: `game_type round_id result`")
             return
         
         game_type, round_id_str, result = parts
         try:
             round_id = int(round_id_str)
         except ValueError:
-            await message.reply_text("Invalid round ID.")
+            await outbox.reply(message, "Invalid round ID.")
             return
 
         success = await admin_panel.set_game_result(round_id, game_type, result)
         if success:
-            await message.reply_text(f"Game result for Round {round_id} ({game_type}) set to {result}.")
+            await outbox.reply(message, f"Game result for Round {round_id} ({game_type}) set to {result}.")
         else:
-            await message.reply_text(f"Failed to set game result for Round {round_id} ({game_type}).")
-        del client.admin_context[user_id]
+            await outbox.reply(message, f"Failed to set game result for Round {round_id} ({game_type}). "
+                               "The round may not exist, may already be settled, or the result is invalid for this game. "
+                               "An ended round's result can only be set from the scheduler process.")
+        await conversations.finish(user_id, ADMIN)
 
-    elif context["state"] == "waiting_for_broadcast_message":
+    elif context.step == "waiting_for_broadcast_message":
         broadcast_message = message.text
-        users = User.objects().all()
-        for user in users:
-            try:
-                await client.send_message(user.user_id, f"**📣 Admin Broadcast:**\n\n{broadcast_message}", parse_mode="Markdown")
-            except Exception as e:
-                print(f"Failed to send broadcast to {user.user_id}: {e}")
-        await message.reply_text("Broadcast message sent to all users.")
-        del client.admin_context[user_id]
-
-    elif context["state"] == "waiting_for_add_funds":
+        # Sending runs as a background job; this message is edited with its progress
+        progress_message = await outbox.reply(message, "Broadcast started. Progress will be shown here.")
+        await broadcast_manager.start(client, user_id, broadcast_message, progress_message)
+        await conversations.finish(user_id, ADMIN)
+
+    elif context.step == "waiting_for_add_funds":
         parts = message.text.split()
         if len(parts) != 2:
-            await message.reply_text("Invalid format. Usage: `user_id amount`")
+            await outbox.reply(message, "Invalid format. Usage: `user_id amount`")
             return
         try:
             target_user_id = int(parts[0])
@@ -264,20 +359,20 @@ async def handle_admin_reply(client: Client, message):
             if amount <= 0:
                 raise ValueError
         except ValueError:
-            await message.reply_text("Invalid user ID or amount.")
+            await outbox.reply(message, "Invalid user ID or amount.")
             return
         
         success = await admin_panel.add_funds(target_user_id, amount)
         if success:
-            await message.reply_text(f"Successfully added {amount} to user {target_user_id}'s balance.")
+            await outbox.reply(message, f"Successfully added {amount} to user {target_user_id}'s balance.")
         else:
-            await message.reply_text(f"Failed to add funds to user {target_user_id}. User not found?")
-        del client.admin_context[user_id]
+            await outbox.reply(message, f"Failed to add funds to user {target_user_id}. User not found?")
+        await conversations.finish(user_id, ADMIN)
 
-    elif context["state"] == "waiting_for_remove_funds":
+    elif context.step == "waiting_for_remove_funds":
         parts = message.text.split()
         if len(parts) != 2:
-            await message.reply_text("Invalid format. Usage: `user_id amount`")
+            await outbox.reply(message, "Invalid format. Usage: `user_id amount`")
             return
         try:
             target_user_id = int(parts[0])
@@ -285,75 +380,75 @@ async def handle_admin_reply(client: Client, message):
             if amount <= 0:
                 raise ValueError
         except ValueError:
-            await message.reply_text("Invalid user ID or amount.")
+            await outbox.reply(message, "Invalid user ID or amount.")
             return
         
         success = await admin_panel.remove_funds(target_user_id, amount)
         if success:
-            await message.reply_text(f"Successfully removed {amount} from user {target_user_id}'s balance.")
+            await outbox.reply(message, f"Successfully removed {amount} from user {target_user_id}'s balance.")
         else:
-            await message.reply_text(f"Failed to remove funds from user {target_user_id}. User not found or insufficient balance?")
-        del client.admin_context[user_id]
+            await outbox.reply(message, f"Failed to remove funds from user {target_user_id}. User not found or insufficient balance?")
+        await conversations.finish(user_id, ADMIN)
 
-    elif context["state"] == "waiting_for_ban_user":
+    elif context.step == "waiting_for_ban_user":
         try:
             target_user_id = int(message.text)
         except ValueError:
-            await message.reply_text("Invalid user ID.")
+            await outbox.reply(message, "Invalid user ID.")
             return
         success = await admin_panel.ban_user(target_user_id)
         if success:
-            await message.reply_text(f"User {target_user_id} has been banned.")
+            await outbox.reply(message, f"User {target_user_id} has been banned.")
         else:
-            await message.reply_text(f"Failed to ban user {target_user_id}.")
-        del client.admin_context[user_id]
+            await outbox.reply(message, f"Failed to ban user {target_user_id}.")
+        await conversations.finish(user_id, ADMIN)
 
-    elif context["state"] == "waiting_for_unban_user":
+    elif context.step == "waiting_for_unban_user":
         try:
             target_user_id = int(message.text)
         except ValueError:
-            await message.reply_text("Invalid user ID.")
+            await outbox.reply(message, "Invalid user ID.")
             return
         success = await admin_panel.unban_user(target_user_id)
         if success:
-            await message.reply_text(f"User {target_user_id} has been unbanned.")
+            await outbox.reply(message, f"User {target_user_id} has been unbanned.")
         else:
-            await message.reply_text(f"Failed to unban user {target_user_id}.")
-        del client.admin_context[user_id]
+            await outbox.reply(message, f"Failed to unban user {target_user_id}.")
+        await conversations.finish(user_id, ADMIN)
 
-    elif context["state"] == "waiting_for_add_admin":
+    elif context.step == "waiting_for_add_admin":
         try:
             target_user_id = int(message.text)
         except ValueError:
-            await message.reply_text("Invalid user ID.")
+            await outbox.reply(message, "Invalid user ID.")
             return
         success = await admin_panel.add_admin(target_user_id)
         if success:
-            await message.reply_text(f"User {target_user_id} has been made an admin.")
+            await outbox.reply(message, f"User {target_user_id} has been made an admin.")
         else:
-            await message.reply_text(f"Failed to make user {target_user_id} an admin. User not found?")
-        del client.admin_context[user_id]
+            await outbox.reply(message, f"Failed to make user {target_user_id} an admin. User not found?")
+        await conversations.finish(user_id, ADMIN)
 
-    elif context["state"] == "waiting_for_remove_admin":
+    elif context.step == "waiting_for_remove_admin":
         try:
             target_user_id = int(message.text)
         except ValueError:
-            await message.reply_text("Invalid user ID.")
+            await outbox.reply(message, "Invalid user ID.")
             return
         success = await admin_panel.remove_admin(target_user_id)
         if success:
-            await message.reply_text(f"User {target_user_id} has been removed from admin.")
+            await outbox.reply(message, f"User {target_user_id} has been removed from admin.")
         else:
-            await message.reply_text(f"Failed to remove user {target_user_id} from admin. User not found or not an admin?")
-        del client.admin_context[user_id]
+            await outbox.reply(message, f"Failed to remove user {target_user_id} from admin. User not found or not an admin?")
+        await conversations.finish(user_id, ADMIN)
 
-@Client.on_callback_query(filters.regex("^admin_users$"))
+@router.callback("admin_users")
 async def admin_users_callback(client: Client, callback_query):
     if not await admin_panel.is_admin(callback_query.from_user.id):
         await callback_query.answer("Not authorized.", show_alert=True)
         return
 
-    await callback_query.message.edit_text(
+    await outbox.edit(callback_query.message,
         "**👥 User Management**\n\n" \
         "Manage user accounts.",
         reply_markup=InlineKeyboardMarkup([
@@ -367,12 +462,12 @@ async def admin_users_callback(client: Client, callback_query):
         parse_mode="Markdown"
     )
 
-@Client.on_callback_query(filters.regex("^admin_manage_funds$"))
+@router.callback("admin_manage_funds")
 async def admin_manage_funds_callback(client: Client, callback_query):
     if not await admin_panel.is_admin(callback_query.from_user.id):
         await callback_query.answer("Not authorized.", show_alert=True)
         return
-    await callback_query.message.edit_text(
+    await outbox.edit(callback_query.message,
         "**💰 Manage User Funds**\n\n" \
         "Choose an action: ",
         reply_markup=InlineKeyboardMarkup([
@@ -383,12 +478,12 @@ async def admin_manage_funds_callback(client: Client, callback_query):
         parse_mode="Markdown"
     )
 
-@Client.on_callback_query(filters.regex("^admin_add_funds$"))
+@router.callback("admin_add_funds")
 async def admin_add_funds_callback(client: Client, callback_query):
     if not await admin_panel.is_admin(callback_query.from_user.id):
         await callback_query.answer("Not authorized.", show_alert=True)
         return
-    await callback_query.message.edit_text(
+    await outbox.edit(callback_query.message,
         "**➕ Add Funds**\n\n" \
         "Reply to this message with `user_id amount` (e.g., `123456789 100.00`).",
         reply_markup=InlineKeyboardMarkup([
@@ -396,14 +491,14 @@ async def admin_add_funds_callback(client: Client, callback_query):
         ]),
         parse_mode="Markdown"
     )
-    client.admin_context[callback_query.from_user.id] = {"state": "waiting_for_add_funds", "message_id": callback_query.message.id}
+    await conversations.start(callback_query.from_user.id, ADMIN, "waiting_for_add_funds", callback_query.message.id)
 
-@Client.on_callback_query(filters.regex("^admin_remove_funds$"))
+@router.callback("admin_remove_funds")
 async def admin_remove_funds_callback(client: Client, callback_query):
     if not await admin_panel.is_admin(callback_query.from_user.id):
         await callback_query.answer("Not authorized.", show_alert=True)
         return
-    await callback_query.message.edit_text(
+    await outbox.edit(callback_query.message,
         "**➖ Remove Funds**\n\n" \
         "Reply to this message with `user_id amount` (e.g., `123456789 50.00`).",
         reply_markup=InlineKeyboardMarkup([
@@ -411,14 +506,14 @@ async def admin_remove_funds_callback(client: Client, callback_query):
         ]),
         parse_mode="Markdown"
     )
-    client.admin_context[callback_query.from_user.id] = {"state": "waiting_for_remove_funds", "message_id": callback_query.message.id}
+    await conversations.start(callback_query.from_user.id, ADMIN, "waiting_for_remove_funds", callback_query.message.id)
 
-@Client.on_callback_query(filters.regex("^admin_ban_user$"))
+@router.callback("admin_ban_user")
 async def admin_ban_user_callback(client: Client, callback_query):
     if not await admin_panel.is_admin(callback_query.from_user.id):
         await callback_query.answer("Not authorized.", show_alert=True)
         return
-    await callback_query.message.edit_text(
+    await outbox.edit(callback_query.message,
         "**🚫 Ban User**\n\n" \
         "Reply to this message with the `user_id` to ban.",
         reply_markup=InlineKeyboardMarkup([
@@ -426,14 +521,14 @@ async def admin_ban_user_callback(client: Client, callback_query):
         ]),
         parse_mode="Markdown"
     )
-    client.admin_context[callback_query.from_user.id] = {"state": "waiting_for_ban_user", "message_id": callback_query.message.id}
+    await conversations.start(callback_query.from_user.id, ADMIN, "waiting_for_ban_user", callback_query.message.id)
 
-@Client.on_callback_query(filters.regex("^admin_unban_user$"))
+@router.callback("admin_unban_user")
 async def admin_unban_user_callback(client: Client, callback_query):
     if not await admin_panel.is_admin(callback_query.from_user.id):
         await callback_query.answer("Not authorized.", show_alert=True)
         return
-    await callback_query.message.edit_text(
+    await outbox.edit(callback_query.message,
         "**✅ Unban User**\n\n" \
         "Reply to this message with the `user_id` to unban.",
         reply_markup=InlineKeyboardMarkup([
@@ -441,14 +536,14 @@ async def admin_unban_user_callback(client: Client, callback_query):
         ]),
         parse_mode="Markdown"
     )
-    client.admin_context[callback_query.from_user.id] = {"state": "waiting_for_unban_user", "message_id": callback_query.message.id}
+    await conversations.start(callback_query.from_user.id, ADMIN, "waiting_for_unban_user", callback_query.message.id)
 
-@Client.on_callback_query(filters.regex("^admin_add_admin$"))
+@router.callback("admin_add_admin")
 async def admin_add_admin_callback(client: Client, callback_query):
     if not await admin_panel.is_admin(callback_query.from_user.id):
         await callback_query.answer("Not authorized.", show_alert=True)
         return
-    await callback_query.message.edit_text(
+    await outbox.edit(callback_query.message,
         "**👑 Add Admin**\n\n" \
         "Reply to this message with the `user_id` to make an admin.",
         reply_markup=InlineKeyboardMarkup([
@@ -456,14 +551,14 @@ async def admin_add_admin_callback(client: Client, callback_query):
         ]),
         parse_mode="Markdown"
     )
-    client.admin_context[callback_query.from_user.id] = {"state": "waiting_for_add_admin", "message_id": callback_query.message.id}
+    await conversations.start(callback_query.from_user.id, ADMIN, "waiting_for_add_admin", callback_query.message.id)
 
-@Client.on_callback_query(filters.regex("^admin_remove_admin$"))
+@router.callback("admin_remove_admin")
 async def admin_remove_admin_callback(client: Client, callback_query):
     if not await admin_panel.is_admin(callback_query.from_user.id):
         await callback_query.answer("Not authorized.", show_alert=True)
         return
-    await callback_query.message.edit_text(
+    await outbox.edit(callback_query.message,
         "**🗑️ Remove Admin**\n\n" \
         "Reply to this message with the `user_id` to remove from admin.",
         reply_markup=InlineKeyboardMarkup([
@@ -471,15 +566,15 @@ async def admin_remove_admin_callback(client: Client, callback_query):
         ]),
         parse_mode="Markdown"
     )
-    client.admin_context[callback_query.from_user.id] = {"state": "waiting_for_remove_admin", "message_id": callback_query.message.id}
+    await conversations.start(callback_query.from_user.id, ADMIN, "waiting_for_remove_admin", callback_query.message.id)
 
-@Client.on_callback_query(filters.regex("^admin_broadcast$"))
+@router.callback("admin_broadcast")
 async def admin_broadcast_callback(client: Client, callback_query):
     if not await admin_panel.is_admin(callback_query.from_user.id):
         await callback_query.answer("Not authorized.", show_alert=True)
         return
 
-    await callback_query.message.edit_text(
+    await outbox.edit(callback_query.message,
         "**📣 Broadcast Message**\n\n" \
         "Reply to this message with the text you want to broadcast to all users.",
         reply_markup=InlineKeyboardMarkup([
@@ -487,15 +582,15 @@ async def admin_broadcast_callback(client: Client, callback_query):
         ]),
         parse_mode="Markdown"
     )
-    client.admin_context[callback_query.from_user.id] = {"state": "waiting_for_broadcast_message", "message_id": callback_query.message.id}
+    await conversations.start(callback_query.from_user.id, ADMIN, "waiting_for_broadcast_message", callback_query.message.id)
 
-@Client.on_callback_query(filters.regex("^admin_maintenance$"))
+@router.callback("admin_maintenance")
 async def admin_maintenance_callback(client: Client, callback_query):
     if not await admin_panel.is_admin(callback_query.from_user.id):
         await callback_query.answer("Not authorized.", show_alert=True)
         return
 
-    await callback_query.message.edit_text(
+    await outbox.edit(callback_query.message,
         "**🛠️ Maintenance Mode**\n\n" \
         "Toggle maintenance mode for the bot.",
         reply_markup=InlineKeyboardMarkup([
@@ -506,49 +601,46 @@ async def admin_maintenance_callback(client: Client, callback_query):
         parse_mode="Markdown"
     )
 
-@Client.on_callback_query(filters.regex("^admin_enable_maintenance$"))
+@router.callback("admin_enable_maintenance")
 async def admin_enable_maintenance_callback(client: Client, callback_query):
     if not await admin_panel.is_admin(callback_query.from_user.id):
         await callback_query.answer("Not authorized.", show_alert=True)
         return
     success = await admin_panel.set_maintenance_mode(True)
     if success:
-        await callback_query.message.edit_text("Maintenance mode **ENABLED**.",
-                                              reply_markup=InlineKeyboardMarkup([
-                                                  [InlineKeyboardButton("🔙 Back to Admin Menu", callback_data="admin_menu")]
-                                              ]))
+        await outbox.edit(callback_query.message, "Maintenance mode **ENABLED**.",
+                         reply_markup=InlineKeyboardMarkup([
+                             [InlineKeyboardButton("🔙 Back to Admin Menu", callback_data="admin_menu")]
+                         ]))
     else:
         await callback_query.answer("Failed to enable maintenance mode.", show_alert=True)
 
-@Client.on_callback_query(filters.regex("^admin_disable_maintenance$"))
+@router.callback("admin_disable_maintenance")
 async def admin_disable_maintenance_callback(client: Client, callback_query):
     if not await admin_panel.is_admin(callback_query.from_user.id):
         await callback_query.answer("Not authorized.", show_alert=True)
         return
     success = await admin_panel.set_maintenance_mode(False)
     if success:
-        await callback_query.message.edit_text("Maintenance mode **DISABLED**.",
-                                              reply_markup=InlineKeyboardMarkup([
-                                                  [InlineKeyboardButton("🔙 Back to Admin Menu", callback_data="admin_menu")]
-                                              ]))
+        await outbox.edit(callback_query.message, "Maintenance mode **DISABLED**.",
+                         reply_markup=InlineKeyboardMarkup([
+                             [InlineKeyboardButton("🔙 Back to Admin Menu", callback_data="admin_menu")]
+                         ]))
     else:
         await callback_query.answer("Failed to disable maintenance mode.", show_alert=True)
 
-@Client.on_callback_query(filters.regex("^admin_cancel_action$"))
+@router.callback("admin_cancel_action")
 async def admin_cancel_action_callback(client: Client, callback_query):
     user_id = callback_query.from_user.id
-    if user_id in client.admin_context:
-        del client.admin_context[user_id]
-    await callback_query.message.edit_text("Admin action cancelled.",
-                                          reply_markup=InlineKeyboardMarkup([
-                                              [InlineKeyboardButton("🔙 Back to Admin Menu", callback_data="admin_menu")]
-                                          ]))
-
-@Client.on_callback_query(filters.regex("^admin_menu$"))
-async def back_to_admin_menu_callback(client: Client, callback_query):
-    await admin_menu_command(client, callback_query.message) # Re-use the admin_menu_command logic
+    await conversations.finish(user_id, ADMIN)
+    await outbox.edit(callback_query.message, "Admin action cancelled.",
+                     reply_markup=InlineKeyboardMarkup([
+                         [InlineKeyboardButton("🔙 Back to Admin Menu", callback_data="admin_menu")]
+                     ]))
 
-# Add a dictionary to store temporary admin context for users
-Client.admin_context = {}
+@router.callback("admin_menu")
+async def back_to_admin_menu_callback(client: Client, callback_query):
+    await _show_admin_menu(callback_query.message, callback_query.from_user.id)
+    await callback_query.answer()
 
 print("Admin commands loaded.")
\ No newline at end of file
@@ -0,0 +1,24 @@
+from pyrogram import Client, filters
+from bot.utils.router import router
+from bot.utils.countdown import countdowns
+from bot.utils.sequencer import updates
+
+# The only reply-message and callback-query handlers registered with Pyrogram.
+# Everything else registers with bot.utils.router and is reached through its dispatch tables.
+# Every Pyrogram handler is wrapped with updates.ordered, so each user's updates run one at a time.
+
+@Client.on_message(filters.text & filters.private & filters.reply)
+@updates.ordered
+async def dispatch_reply(client: Client, message):
+    await router.dispatch_reply(client, message)
+
+@Client.on_callback_query()
+@updates.ordered
+async def dispatch_callback(client: Client, callback_query):
+    # Whatever the button does may replace the game menu, so its countdown stops here;
+    # handlers that leave a menu on screen track it again
+    if callback_query.message:
+        countdowns.untrack(callback_query.message)
+    await router.dispatch_callback(client, callback_query)
+
+print("Dispatch router loaded.")
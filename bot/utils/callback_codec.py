@@ -0,0 +1,158 @@
+import base64
+from collections import namedtuple
+from bson import ObjectId
+
+# Compact callback data.
+# A packed payload is MARKER followed by base64url (no padding) of: one varint action id, then
+# each field of that action in order. Ints are varints, choices are the varint index into a
+# fixed option list and ObjectIds are their 12 raw bytes, so a bet button costs about 8
+# characters of Telegram's 64-byte limit whatever the round id.
+# Option lists and action ids are part of the wire format: only ever append to them, or buttons
+# in messages already sent will decode to the wrong thing.
+MARKER = '~'
+
+GAME_TYPES = ('color_prediction', 'parity_evens', 'number_prediction', 'wheel_spin', 'lucky_7')
+
+BET_OPTIONS = (
+    'red', 'green', 'violet', 'blue', # colors
+    'even', 'odd',
+    '0', '1', '2', '3', '4', '5', '6', '7', '8', '9',
+    'x5', 'x10', 'x20', # wheel multipliers
+    'less_than_7', 'equal_to_7', 'greater_than_7'
+)
+
+LEADERBOARD_PERIODS = ('weekly', 'monthly', 'all_time')
+
+class CallbackDataError(ValueError):
+    pass
+
+def _write_varint(value: int, out: bytearray):
+    if value < 0:
+        raise CallbackDataError("Varints must be non-negative")
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _read_varint(buf: bytes, pos: int):
+    value = shift = 0
+    while True:
+        if pos >= len(buf) or shift > 63:
+            raise CallbackDataError("Truncated varint")
+        byte = buf[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+class UInt:
+    def encode(self, value, out: bytearray):
+        _write_varint(int(value), out)
+
+    def decode(self, buf: bytes, pos: int):
+        return _read_varint(buf, pos)
+
+class Choice:
+    def __init__(self, options):
+        self.options = tuple(options)
+        self._codes = {option: code for code, option in enumerate(self.options)}
+
+    def encode(self, value, out: bytearray):
+        if value not in self._codes:
+            raise CallbackDataError(f"Unknown option {value!r}")
+        _write_varint(self._codes[value], out)
+
+    def decode(self, buf: bytes, pos: int):
+        code, pos = _read_varint(buf, pos)
+        if code >= len(self.options):
+            raise CallbackDataError(f"Unknown option code {code}")
+        return self.options[code], pos
+
+class ObjectIdField:
+    def encode(self, value, out: bytearray):
+        out += ObjectId(value).binary
+
+    def decode(self, buf: bytes, pos: int):
+        if pos + 12 > len(buf):
+            raise CallbackDataError("Truncated ObjectId")
+        return ObjectId(bytes(buf[pos:pos + 12])), pos + 12
+
+class Optional:
+    # One presence byte, then the wrapped field when present
+    def __init__(self, field):
+        self.field = field
+
+    def encode(self, value, out: bytearray):
+        out.append(0 if value is None else 1)
+        if value is not None:
+            self.field.encode(value, out)
+
+    def decode(self, buf: bytes, pos: int):
+        if pos >= len(buf):
+            raise CallbackDataError("Truncated optional field")
+        if buf[pos] == 0:
+            return None, pos + 1
+        return self.field.decode(buf, pos + 1)
+
+class CallbackAction:
+    # One registered kind of button. Decoding yields an instance of `struct`, a namedtuple
+    # with the action's field names.
+    def __init__(self, action_id: int, name: str, fields: dict):
+        self.action_id = action_id
+        self.name = name
+        self.fields = fields
+        self.struct = namedtuple(name, list(fields))
+
+    def encode(self, **values) -> str:
+        out = bytearray()
+        _write_varint(self.action_id, out)
+        for field_name, field in self.fields.items():
+            field.encode(values.get(field_name), out)
+        data = MARKER + base64.urlsafe_b64encode(bytes(out)).decode().rstrip('=')
+        if len(data.encode()) > 64:
+            raise CallbackDataError(f"{self.name} callback data is {len(data)} bytes, over Telegram's 64-byte limit")
+        return data
+
+ACTIONS = {} # action id -> CallbackAction
+
+def register(action_id: int, name: str, **fields) -> CallbackAction:
+    if action_id in ACTIONS:
+        raise ValueError(f"Callback action id {action_id} is already registered to {ACTIONS[action_id].name}")
+    action = CallbackAction(action_id, name, fields)
+    ACTIONS[action_id] = action
+    return action
+
+def is_packed(data) -> bool:
+    return isinstance(data, str) and data.startswith(MARKER)
+
+def decode(data: str):
+    # Returns (CallbackAction, struct); raises CallbackDataError on anything malformed
+    if not is_packed(data):
+        raise CallbackDataError("Not packed callback data")
+    encoded = data[len(MARKER):]
+    try:
+        buf = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+    except (ValueError, TypeError) as e:
+        raise CallbackDataError(f"Bad encoding: {e}")
+
+    action_id, pos = _read_varint(buf, 0)
+    action = ACTIONS.get(action_id)
+    if not action:
+        raise CallbackDataError(f"Unknown action id {action_id}")
+    values = []
+    for field in action.fields.values():
+        value, pos = field.decode(buf, pos)
+        values.append(value)
+    if pos != len(buf):
+        raise CallbackDataError("Trailing bytes in callback data")
+    return action, action.struct(*values)
+
+# Registered actions
+GAME_MENU = register(1, 'GameMenu', game=Choice(GAME_TYPES))
+BET = register(2, 'Bet', game=Choice(GAME_TYPES), round_id=UInt(), option=Choice(BET_OPTIONS))
+LEADERBOARD = register(3, 'Leaderboard', period=Choice(LEADERBOARD_PERIODS))
+# Admin payment queue. kind: d(eposit)/w(ithdrawal); op: n(ext page after target), p(revious page
+# before target), a(pprove)/r(eject) row target, A(pprove all)/R(eject all) rows from target to page
+PAYMENT_QUEUE = register(4, 'PaymentQueue', kind=Choice(('d', 'w')), op=Choice(('n', 'p', 'a', 'r', 'A', 'R')),
+                         target=ObjectIdField(), page=Optional(ObjectIdField()))
@@ -0,0 +1,141 @@
+import time
+from collections import OrderedDict
+from database.repository import conversation_sessions
+from config import CONVERSATION_BACKEND, CONVERSATION_TTL, CONVERSATION_MAX_SESSIONS
+
+# Flows a user can be in; each user is in at most one at a time
+BET = 'bet'
+DEPOSIT = 'deposit'
+WITHDRAW = 'withdraw'
+ADMIN = 'admin'
+
+class ConversationState:
+    # What the bot is waiting for from one user: the flow, the step within it, the id of the
+    # prompt message and any values collected so far
+    def __init__(self, flow: str, step: str, message_id: int = None, data: dict = None):
+        self.flow = flow
+        self.step = step
+        self.message_id = message_id
+        self.data = data or {}
+
+class MemoryBackend:
+    # In-process sessions in an OrderedDict kept in last-access order. Expiry slides on every
+    # access, so the oldest entries are always at the front: expired sessions are swept from
+    # there, and when the store is full the front entry is the least recently used.
+    def __init__(self, ttl: float, max_sessions: int):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict() # user_id -> (expires_at, ConversationState)
+        self.expired = 0
+        self.evicted = 0
+
+    def _sweep(self, now: float):
+        while self._sessions:
+            user_id, (expires_at, _) = next(iter(self._sessions.items()))
+            if expires_at > now:
+                break
+            del self._sessions[user_id]
+            self.expired += 1
+
+    async def get(self, user_id: int):
+        now = time.monotonic()
+        self._sweep(now)
+        entry = self._sessions.get(user_id)
+        if not entry:
+            return None
+        self._sessions[user_id] = (now + self.ttl, entry[1])
+        self._sessions.move_to_end(user_id)
+        return entry[1]
+
+    async def put(self, user_id: int, state: ConversationState):
+        now = time.monotonic()
+        self._sweep(now)
+        self._sessions[user_id] = (now + self.ttl, state)
+        self._sessions.move_to_end(user_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+
+    async def delete(self, user_id: int, flow: str = None):
+        entry = self._sessions.get(user_id)
+        if entry and (flow is None or entry[1].flow == flow):
+            del self._sessions[user_id]
+            return 1
+        return 0
+
+    async def live(self) -> int:
+        self._sweep(time.monotonic())
+        return len(self._sessions)
+
+class MongoBackend:
+    # Sessions in the conversation_session collection, shared by every worker process.
+    # Expiry is checked on read and enforced by a TTL index; there is no size bound.
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.expired = 0 # Counted by MongoDB's TTL monitor, not visible here
+        self.evicted = 0
+
+    async def get(self, user_id: int):
+        doc = await conversation_sessions.get_active(user_id, self.ttl)
+        if not doc:
+            return None
+        return ConversationState(doc.flow, doc.step, doc.message_id, dict(doc.data or {}))
+
+    async def put(self, user_id: int, state: ConversationState):
+        await conversation_sessions.put(user_id, state.flow, state.step, state.message_id, state.data, self.ttl)
+
+    async def delete(self, user_id: int, flow: str = None):
+        return await conversation_sessions.delete(user_id, flow)
+
+    async def live(self) -> int:
+        return await conversation_sessions.count_active()
+
+class ConversationStore:
+    # Per-user conversation state for multi-step flows, with hit/miss and lifecycle counters
+    def __init__(self, backend):
+        self.backend = backend
+        self.started = 0
+        self.finished = 0
+        self.hits = 0
+        self.misses = 0
+
+    async def start(self, user_id: int, flow: str, step: str, message_id: int = None, **data):
+        # Starting a flow replaces whatever the user was doing before
+        await self.backend.put(user_id, ConversationState(flow, step, message_id, data))
+        self.started += 1
+
+    async def update(self, user_id: int, state: ConversationState):
+        await self.backend.put(user_id, state)
+
+    async def get(self, user_id: int, flow: str = None):
+        # The user's state, or None if they are not in a flow (or not in `flow`, when given)
+        state = await self.backend.get(user_id)
+        if state is None or (flow is not None and state.flow != flow):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return state
+
+    async def finish(self, user_id: int, flow: str = None):
+        # End the user's flow (only if it is `flow`, when given)
+        if await self.backend.delete(user_id, flow):
+            self.finished += 1
+
+    async def metrics(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "live_sessions": await self.backend.live(),
+            "started": self.started,
+            "finished": self.finished,
+            "expired": self.backend.expired,
+            "evicted": self.backend.evicted,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+def _create_backend():
+    if CONVERSATION_BACKEND == 'mongo':
+        return MongoBackend(CONVERSATION_TTL)
+    return MemoryBackend(CONVERSATION_TTL, CONVERSATION_MAX_SESSIONS)
+
+conversations = ConversationStore(_create_backend())
@@ -0,0 +1,163 @@
+import asyncio
+import time
+from collections import OrderedDict
+from pyrogram.errors import RPCError
+from games.round_state import round_table
+from bot.utils.keyboards import game_menus
+from bot.utils.outbox import outbox, COUNTDOWN
+from bot.utils.rate_limiter import TokenBucket
+from config import (COUNTDOWN_INTERVAL, COUNTDOWN_FINAL_INTERVAL, COUNTDOWN_FINAL_WINDOW, COUNTDOWN_EDITS_PER_SECOND,
+                    COUNTDOWN_MAX_MESSAGES)
+
+TICK = 1 # Seconds between checks for rounds that are due an update
+
+class CountdownService:
+    # Keeps the "Time Left" of open game menus current.
+    # Every menu a user has open is tracked under its round. A round's menus are re-rendered every
+    # COUNTDOWN_INTERVAL seconds, and every COUNTDOWN_FINAL_INTERVAL seconds once betting is about
+    # to close; the text is rendered once per round per update and the edits share one budget of
+    # COUNTDOWN_EDITS_PER_SECOND, least recently edited menus first, so a busy round lags instead
+    # of flooding. Each tick starts at a different due round, so one busy round cannot take the
+    # whole budget tick after tick while later rounds wait. Edits go through the outbox's
+    # countdown lane, below everything users wait on.
+    # When betting closes the menus get a last edit without bet buttons and are forgotten.
+    def __init__(self):
+        self._rounds = {} # (game_type, round_id) -> OrderedDict of (chat_id, message_id) -> Message, least recently edited first
+        self._round_of = {} # (chat_id, message_id) -> (game_type, round_id)
+        self._next_update = {} # (game_type, round_id) -> monotonic time of the round's next update
+        self._budget = TokenBucket(COUNTDOWN_EDITS_PER_SECOND)
+        self._in_flight = set()
+        self._task = None
+        self._ticks = 0 # Rotates the round each tick starts with
+        self.edits = 0
+        self.failed = 0
+        self.deferred = 0 # Menus left for a later tick because the edit budget ran out
+        self.dropped = 0 # Menus forgotten because their round tracked too many
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        for task in list(self._in_flight):
+            task.cancel()
+
+    def track(self, message, state):
+        # Called after a game menu for `state` has been shown in `message`
+        key = (message.chat.id, message.id)
+        self.untrack(message)
+        round_key = (state.game_type, state.round_id)
+        menus = self._rounds.get(round_key)
+        if menus is None:
+            menus = self._rounds[round_key] = OrderedDict()
+            self._next_update[round_key] = time.monotonic() + self._interval(state)
+        menus[key] = message
+        self._round_of[key] = round_key
+        if len(menus) > COUNTDOWN_MAX_MESSAGES:
+            oldest, _ = menus.popitem(last=False)
+            del self._round_of[oldest]
+            self.dropped += 1
+
+    def untrack(self, message):
+        # Called when the user acts on a message, which may replace the menu with something else
+        key = (message.chat.id, message.id)
+        round_key = self._round_of.pop(key, None)
+        if round_key:
+            self._forget(round_key, key)
+
+    def _forget(self, round_key, key):
+        menus = self._rounds.get(round_key)
+        if menus is None:
+            return
+        menus.pop(key, None)
+        if not menus:
+            del self._rounds[round_key]
+            self._next_update.pop(round_key, None)
+
+    def round_closed(self, game_type: str, round_id: int):
+        # round_table close listener: the bet buttons come off every menu still showing this round
+        round_key = (game_type, round_id)
+        menus = self._rounds.pop(round_key, None)
+        self._next_update.pop(round_key, None)
+        if not menus:
+            return
+        text, keyboard = game_menus.render_closed(game_type, round_id)
+        for key, message in menus.items():
+            del self._round_of[key]
+            self._launch(self._edit(None, key, message, text, keyboard))
+
+    def _interval(self, state) -> int:
+        return COUNTDOWN_FINAL_INTERVAL if state.seconds_left() <= COUNTDOWN_FINAL_WINDOW else COUNTDOWN_INTERVAL
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(TICK)
+            try:
+                self._tick()
+            except Exception as e:
+                print(f"Countdown update failed: {e}")
+
+    def _tick(self):
+        now = time.monotonic()
+        due = [round_key for round_key, due_at in self._next_update.items() if due_at <= now]
+        if not due:
+            return
+        self._ticks += 1
+        start = self._ticks % len(due)
+        for round_key in due[start:] + due[:start]:
+            game_type, round_id = round_key
+            state = round_table.get(game_type)
+            if not state or state.round_id != round_id or not state.accepts_bets():
+                continue # round_closed removes it
+            menu = game_menus.render(state)
+            if not menu:
+                continue
+            text, keyboard = menu
+            menus = self._rounds[round_key]
+            finished = True
+            for done, key in enumerate(list(menus)):
+                if self._budget.wait_time(now) > 0:
+                    # Out of budget: the rest keep their place at the front, and the round stays
+                    # due so they go on a later tick
+                    self.deferred += len(menus) - done
+                    finished = False
+                    break
+                self._budget.take()
+                message = menus[key]
+                menus.move_to_end(key)
+                self._launch(self._edit(round_key, key, message, text, keyboard))
+            if finished:
+                self._next_update[round_key] = now + self._interval(state)
+
+    def _launch(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _edit(self, round_key, key, message, text: str, keyboard):
+        try:
+            await outbox.edit(message, text, lane=COUNTDOWN, reply_markup=keyboard, parse_mode="Markdown")
+            self.edits += 1
+        except RPCError as e:
+            # Deleted, too old to edit, etc.: stop updating it
+            self.failed += 1
+            if round_key and self._round_of.get(key) == round_key:
+                del self._round_of[key]
+                self._forget(round_key, key)
+            print(f"Countdown edit of message {key[1]} in chat {key[0]} failed: {e}")
+
+    def metrics(self) -> dict:
+        return {
+            "rounds": len(self._rounds),
+            "tracked": len(self._round_of),
+            "edits": self.edits,
+            "failed": self.failed,
+            "deferred": self.deferred,
+            "dropped": self.dropped,
+            "in_flight": len(self._in_flight)
+        }
+
+countdowns = CountdownService()
+round_table.on_close(countdowns.round_closed)
@@ -0,0 +1,105 @@
+from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from bot.utils.callback_codec import GAME_MENU, BET
+from games.round_state import round_table
+
+BACK_TO_GAMES = [InlineKeyboardButton("🔙 Back to Games", callback_data="games_menu")]
+
+CLOSED_MENU = InlineKeyboardMarkup([BACK_TO_GAMES])
+
+# The game picker never changes, so it is built once
+GAMES_MENU = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🌈 Color Prediction", callback_data=GAME_MENU.encode(game="color_prediction"))],
+    [InlineKeyboardButton("🎲 Parity/Evens", callback_data=GAME_MENU.encode(game="parity_evens"))],
+    [InlineKeyboardButton("🔢 Number Prediction", callback_data=GAME_MENU.encode(game="number_prediction"))],
+    [InlineKeyboardButton("🎡 Wheel Spin", callback_data=GAME_MENU.encode(game="wheel_spin"))],
+    [InlineKeyboardButton("🍀 Lucky 7", callback_data=GAME_MENU.encode(game="lucky_7"))]
+])
+
+def _number_rows(multiplier: str):
+    # 0-9 in rows of three, e.g. "7 (x9)"
+    return [[(f"{n} ({multiplier})", str(n)) for n in range(row, min(row + 3, 10))] for row in range(0, 10, 3)]
+
+# game_type -> (title, button rows of (label, bet value), how-to line)
+GAME_MENU_LAYOUTS = {
+    'color_prediction': (
+        "🔴 Color Prediction Game",
+        [[("🔴 Red (x2)", "red"), ("🟢 Green (x2)", "green")],
+         [("🟣 Violet (x5)", "violet")]],
+        "Choose your color and amount to bet. Example: `/bet color red 10`"
+    ),
+    'parity_evens': (
+        "🎲 Parity/Evens & Number Prediction Game",
+        [[("Even (x2)", "even"), ("Odd (x2)", "odd")]] + _number_rows("x10"),
+        "Choose even/odd or predict a number (0-9) and amount to bet. Example: `/bet parity even 10` or `/bet parity 7 5`"
+    ),
+    'number_prediction': (
+        "🔢 Number Prediction Game",
+        _number_rows("x9"),
+        "Predict a number (0-9) and amount to bet. Example: `/bet number 7 5`"
+    ),
+    'wheel_spin': (
+        "🎡 Wheel Spin Game",
+        [[("Red (x2)", "red"), ("Green (x2)", "green"), ("Blue (x2)", "blue")],
+         [("x5 Multiplier", "x5")],
+         [("x10 Multiplier", "x10")],
+         [("x20 Multiplier", "x20")]],
+        "Choose your bet and amount. Example: `/bet wheel red 10`"
+    ),
+    'lucky_7': (
+        "🍀 Lucky 7 Game",
+        [[("Sum < 7 (x2)", "less_than_7")],
+         [("Sum = 7 (x5)", "equal_to_7")],
+         [("Sum > 7 (x2)", "greater_than_7")]],
+        "Predict the sum of two dice rolls and amount to bet. Example: `/bet lucky less_than_7 10`"
+    ),
+}
+
+class GameMenuCache:
+    # Rendered game menus keyed by (game_type, round_id).
+    # Everything except the time left is the same for every user during a round, so the keyboard
+    # and the text around the countdown are built once per round and dropped when it closes.
+    def __init__(self):
+        self._menus = {} # (game_type, round_id) -> (text before time left, text after it, keyboard)
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, state):
+        # Returns (text, keyboard) for the round, or None for a game without a menu layout
+        key = (state.game_type, state.round_id)
+        entry = self._menus.get(key)
+        if entry is None:
+            layout = GAME_MENU_LAYOUTS.get(state.game_type)
+            if not layout:
+                return None
+            self.misses += 1
+            entry = self._build(state, *layout)
+            self._menus[key] = entry
+        else:
+            self.hits += 1
+        before, after, keyboard = entry
+        return f"{before}{state.seconds_left()}{after}", keyboard
+
+    def _build(self, state, title: str, rows: list, how_to: str):
+        keyboard = InlineKeyboardMarkup(
+            [[InlineKeyboardButton(label, callback_data=BET.encode(game=state.game_type, round_id=state.round_id, option=option))
+              for label, option in row] for row in rows] + [BACK_TO_GAMES]
+        )
+        before = f"**{title}**\n\n" \
+                 f"**Round ID**: `{state.round_id}`\n" \
+                 f"**Time Left**: "
+        after = f" seconds\n\n{how_to}"
+        return before, after, keyboard
+
+    def render_closed(self, game_type: str, round_id: int):
+        # The menu once betting has closed: no bet buttons, just the way back
+        title = GAME_MENU_LAYOUTS[game_type][0] if game_type in GAME_MENU_LAYOUTS else game_type
+        text = f"**{title}**\n\n" \
+               f"**Round ID**: `{round_id}`\n" \
+               f"Betting for this round has closed. Results are on their way."
+        return text, CLOSED_MENU
+
+    def evict(self, game_type: str, round_id: int):
+        self._menus.pop((game_type, round_id), None)
+
+game_menus = GameMenuCache()
+round_table.on_close(game_menus.evict)
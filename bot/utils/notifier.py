@@ -0,0 +1,106 @@
+import asyncio
+from datetime import datetime, timedelta
+from pyrogram.errors import RPCError
+from database.repository import bets, settlement_jobs
+from games.settlement import on_settled
+from games.leadership import leadership
+from bot.utils.outbox import outbox, RESULT
+from config import RESULT_NOTIFY_CONCURRENCY, RESULT_NOTIFY_BATCH, RESULT_NOTIFY_RESUME_WINDOW
+
+def _result_text(job, summary) -> str:
+    title = job.game_type.replace('_', ' ').title()
+    if job.result == 'void':
+        text = f"**🎲 {title}** round {job.round_id} was voided and your stakes were refunded.\n\n"
+    else:
+        text = f"**🎲 {title}** round {job.round_id} result: **{job.result}**\n\n"
+    for outcome in sorted(summary['outcomes'], key=lambda outcome: outcome['bet_value']):
+        bets_label = "bet" if outcome['bets'] == 1 else "bets"
+        outcome_text = f"won {outcome['payout']:.2f}" if outcome['payout'] > 0 else "lost"
+        text += f"- `{outcome['bet_value']}`: {outcome['bets']} {bets_label}, {outcome['stake']:.2f} staked, {outcome_text}\n"
+    text += f"\n**Net**: {summary['payout'] - summary['stake']:+.2f}\n" \
+            f"**Balance**: {summary['balance']:.2f}"
+    return text
+
+class ResultNotifier:
+    # Sends every bettor one message per settled round, summarising all of their bets.
+    # Summaries are grouped by MongoDB and streamed from an aggregation cursor in batches; each
+    # batch is sent with at most RESULT_NOTIFY_CONCURRENCY messages in flight through the outbox's
+    # result lane, then checkpointed on the SettlementJob so a restart resumes after the last
+    # notified bettor instead of messaging everyone again. Only the scheduler process settles
+    # rounds, so only it sends results and resumes interrupted ones.
+    def __init__(self):
+        self.client = None
+        self._ready = asyncio.Event() # Set once the client is connected
+        self._tasks = {} # SettlementJob id -> task
+        self.rounds_notified = 0
+        self.sent = 0
+        self.failed = 0
+
+    async def start(self, client):
+        self.client = client
+        self._ready.set()
+
+    async def resume(self):
+        # Leadership listener: pick up result messages the previous scheduler process left unsent
+        finished_since = datetime.utcnow() - timedelta(seconds=RESULT_NOTIFY_RESUME_WINDOW)
+        for job in await settlement_jobs.unnotified(finished_since):
+            print(f"Resuming result messages for {job.game_type} round {job.round_id} ({job.notified_users} sent)")
+            self._launch(job)
+
+    async def stop(self):
+        # Leadership listener: the next scheduler process resumes these from their checkpoints
+        for task in list(self._tasks.values()):
+            task.cancel()
+
+    def round_settled(self, game_round, job):
+        # Settlement listener; the messages go out in the background
+        self._launch(job)
+
+    def _launch(self, job):
+        if job.id in self._tasks:
+            return
+        task = asyncio.create_task(self._run(job))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+
+    async def _run(self, job):
+        await self._ready.wait()
+        semaphore = asyncio.Semaphore(RESULT_NOTIFY_CONCURRENCY)
+        try:
+            async for batch in bets.result_summaries(job.id, after_user=job.notified_through, batch_size=RESULT_NOTIFY_BATCH):
+                results = await asyncio.gather(*(self._send(semaphore, job, summary) for summary in batch))
+                self.sent += results.count(True)
+                self.failed += results.count(False)
+                job.notified_users += len(batch)
+                job.notified_through = batch[-1]['_id']
+                await settlement_jobs.save(job) # Checkpoint
+            job.notified_at = datetime.utcnow()
+            await settlement_jobs.save(job)
+            self.rounds_notified += 1
+        except Exception as e:
+            # Picked up again from the checkpoint on the next start
+            print(f"Failed to send results for {job.game_type} round {job.round_id}: {e}")
+
+    async def _send(self, semaphore, job, summary) -> bool:
+        async with semaphore:
+            try:
+                await outbox.send_message(self.client, summary['user_id'], _result_text(job, summary), lane=RESULT,
+                                          parse_mode="Markdown")
+                return True
+            except RPCError as e:
+                # Blocked the bot, deactivated account, etc.
+                print(f"Failed to send round result to {summary['user_id']}: {e}")
+                return False
+
+    def metrics(self) -> dict:
+        return {
+            "rounds_in_progress": len(self._tasks),
+            "rounds_notified": self.rounds_notified,
+            "sent": self.sent,
+            "failed": self.failed
+        }
+
+result_notifier = ResultNotifier()
+on_settled(result_notifier.round_settled)
+leadership.on_lead(result_notifier.resume)
+leadership.on_step_down(result_notifier.stop)
@@ -0,0 +1,242 @@
+import asyncio
+import time
+from collections import deque
+from pyrogram.errors import FloodWait, MessageNotModified
+from bot.utils.rate_limiter import TokenBucket
+from config import (OUTBOX_GLOBAL_RATE, OUTBOX_CHAT_RATE, OUTBOX_CHAT_BURST, OUTBOX_CONCURRENCY,
+                    OUTBOX_MAX_RETRIES, OUTBOX_GLOBAL_FLOOD_WAIT)
+
+# Lanes, highest priority first
+INTERACTIVE = 0 # Replies to what a user just did
+PAYMENT = 1 # Payment cards and notices
+RESULT = 2 # Round results
+COUNTDOWN = 3 # Live countdown edits of open game menus
+BROADCAST = 4 # Admin broadcasts and their progress
+LANE_NAMES = ('interactive', 'payment', 'result', 'countdown', 'broadcast')
+
+SCAN_LIMIT = 64 # Jobs looked at per lane when the ones at the front are waiting on their chat
+MAX_IDLE_CHATS = 10000 # Per-chat buckets kept before idle ones are forgotten
+
+class OutboundJob:
+    def __init__(self, lane: int, chat_id: int, send, key=None):
+        self.lane = lane
+        self.chat_id = chat_id
+        self.send = send # Coroutine function that makes the Telegram request
+        self.key = key # (chat_id, message_id) for edits, so repeats can be coalesced
+        self.futures = [] # One per caller waiting for the result
+        self.enqueued_at = time.monotonic()
+        self.attempts = 0
+
+class Outbox:
+    # Every outbound Telegram message goes through here.
+    # Jobs wait in one FIFO per lane. The dispatcher always takes the first job, from the highest
+    # priority lane, whose chat has a token; a global token bucket paces the whole bot and a
+    # bucket per chat keeps under Telegram's per-chat limit. An edit to a message that already has
+    # an edit queued replaces the queued one, so only the latest text is sent. FloodWait pauses
+    # that chat's bucket, and the global bucket too when the wait is longer than
+    # OUTBOX_GLOBAL_FLOOD_WAIT (Telegram is limiting the whole bot, not one chat); the job goes
+    # back to the front of its lane.
+    def __init__(self):
+        self.global_bucket = TokenBucket(OUTBOX_GLOBAL_RATE)
+        self._lanes = [deque() for _ in LANE_NAMES]
+        self._chat_buckets = {} # chat_id -> TokenBucket
+        self._pending_edits = {} # (chat_id, message_id) -> queued OutboundJob
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(OUTBOX_CONCURRENCY)
+        self._in_flight = set()
+        self._task = None
+        self.sent = [0] * len(LANE_NAMES)
+        self.failed = [0] * len(LANE_NAMES)
+        self.latency_total = [0.0] * len(LANE_NAMES) # Seconds from enqueue to delivery
+        self.latency_max = [0.0] * len(LANE_NAMES)
+        self.coalesced = 0
+        self.flood_waits = 0
+        self.retries = 0
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10):
+        # Deliver what is queued (within the timeout), then stop the dispatcher
+        if not self._task:
+            return
+        deadline = time.monotonic() + timeout
+        while (any(self._lanes) or self._in_flight) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        self._task.cancel()
+        self._task = None
+
+    # Public API. With wait=True (the default) these return what Pyrogram returns and raise what it
+    # raises; with wait=False they return at once and failures are only logged.
+
+    async def send_message(self, client, chat_id: int, text: str, lane: int = INTERACTIVE, wait: bool = True, **kwargs):
+        return await self._submit(lane, chat_id, lambda: client.send_message(chat_id, text, **kwargs), None, wait)
+
+    async def reply(self, message, text: str, lane: int = INTERACTIVE, wait: bool = True, **kwargs):
+        return await self._submit(lane, message.chat.id, lambda: message.reply_text(text, **kwargs), None, wait)
+
+    async def edit(self, message, text: str, lane: int = INTERACTIVE, wait: bool = True, **kwargs):
+        key = (message.chat.id, message.id)
+        return await self._submit(lane, message.chat.id, lambda: message.edit_text(text, **kwargs), key, wait)
+
+    async def edit_message_text(self, client, chat_id: int, message_id: int, text: str, lane: int = INTERACTIVE,
+                                wait: bool = True, **kwargs):
+        send = lambda: client.edit_message_text(chat_id, message_id, text, **kwargs)
+        return await self._submit(lane, chat_id, send, (chat_id, message_id), wait)
+
+    async def _submit(self, lane: int, chat_id: int, send, key, wait: bool):
+        if not self._task:
+            # Dispatcher not running (scripts, shutdown): send directly
+            return await self._call(send, key)
+
+        job = self._pending_edits.get(key) if key else None
+        if job:
+            # Coalesce: the queued edit sends this text instead, in the better of the two lanes
+            job.send = send
+            self.coalesced += 1
+            if lane < job.lane:
+                self._lanes[job.lane].remove(job)
+                job.lane = lane
+                self._lanes[lane].append(job)
+        else:
+            job = OutboundJob(lane, chat_id, send, key)
+            self._lanes[lane].append(job)
+            if key:
+                self._pending_edits[key] = job
+        self._wakeup.set()
+
+        if not wait:
+            return None
+        future = asyncio.get_running_loop().create_future()
+        job.futures.append(future)
+        return await future
+
+    async def _call(self, send, key):
+        try:
+            return await send()
+        except MessageNotModified:
+            if key:
+                return None # The message already shows this text
+            raise
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= MAX_IDLE_CHATS:
+                now = time.monotonic()
+                self._chat_buckets = {chat: b for chat, b in self._chat_buckets.items() if not b.is_idle(now)}
+            bucket = self._chat_buckets[chat_id] = TokenBucket(OUTBOX_CHAT_RATE, OUTBOX_CHAT_BURST)
+        return bucket
+
+    def _next_job(self):
+        # Returns (job, None) with tokens taken, or (None, seconds until a job could go, or None if idle)
+        now = time.monotonic()
+        global_wait = self.global_bucket.wait_time(now)
+        if global_wait > 0:
+            return None, global_wait if any(self._lanes) else None
+
+        soonest = None
+        for lane in self._lanes:
+            for index, job in enumerate(lane):
+                if index >= SCAN_LIMIT:
+                    break
+                chat_bucket = self._chat_bucket(job.chat_id)
+                wait = chat_bucket.wait_time(now)
+                if wait == 0:
+                    del lane[index]
+                    if job.key and self._pending_edits.get(job.key) is job:
+                        del self._pending_edits[job.key]
+                    self.global_bucket.take()
+                    chat_bucket.take()
+                    return job, None
+                soonest = wait if soonest is None else min(soonest, wait)
+        return None, soonest
+
+    async def _run(self):
+        while True:
+            await self._slots.acquire()
+            job, wait = self._next_job()
+            if job is None:
+                self._slots.release()
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            task = asyncio.create_task(self._deliver(job))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _deliver(self, job):
+        try:
+            job.attempts += 1
+            try:
+                result = await self._call(job.send, job.key)
+            except FloodWait as e:
+                self.flood_waits += 1
+                self._chat_bucket(job.chat_id).pause(e.value)
+                if e.value > OUTBOX_GLOBAL_FLOOD_WAIT:
+                    self.global_bucket.pause(e.value)
+                if job.attempts <= OUTBOX_MAX_RETRIES:
+                    self._retry(job)
+                    return
+                self._finish(job, error=e)
+            except Exception as e:
+                self._finish(job, error=e)
+            else:
+                self._finish(job, result=result)
+        finally:
+            self._slots.release()
+            self._wakeup.set()
+
+    def _retry(self, job):
+        self.retries += 1
+        newer = self._pending_edits.get(job.key) if job.key else None
+        if newer:
+            # A newer edit of the same message is already queued; it answers this job's callers too
+            newer.futures.extend(job.futures)
+            return
+        self._lanes[job.lane].appendleft(job)
+        if job.key:
+            self._pending_edits[job.key] = job
+
+    def _finish(self, job, result=None, error=None):
+        lane = job.lane
+        if error is None:
+            latency = time.monotonic() - job.enqueued_at
+            self.sent[lane] += 1
+            self.latency_total[lane] += latency
+            self.latency_max[lane] = max(self.latency_max[lane], latency)
+        else:
+            self.failed[lane] += 1
+            if not job.futures:
+                print(f"Failed to deliver {LANE_NAMES[lane]} message to chat {job.chat_id}: {error}")
+        for future in job.futures:
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def metrics(self) -> dict:
+        return {
+            "lanes": {
+                name: {
+                    "queued": len(self._lanes[lane]),
+                    "sent": self.sent[lane],
+                    "failed": self.failed[lane],
+                    "avg_latency_ms": self.latency_total[lane] / self.sent[lane] * 1000 if self.sent[lane] else 0.0,
+                    "max_latency_ms": self.latency_max[lane] * 1000
+                }
+                for lane, name in enumerate(LANE_NAMES)
+            },
+            "in_flight": len(self._in_flight),
+            "coalesced": self.coalesced,
+            "flood_waits": self.flood_waits,
+            "retries": self.retries,
+            "chats": len(self._chat_buckets)
+        }
+
+outbox = Outbox()
@@ -0,0 +1,54 @@
+import asyncio
+import time
+
+class TokenBucket:
+    # Async token bucket: `rate` tokens per second, bursts of up to `capacity`.
+    # pause() blocks every caller, then restarts the bucket nearly empty; that is how FloodWait is honoured.
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def wait_time(self, now: float = None) -> float:
+        # Seconds until a token is available, 0 if one is available now. Does not take it, so
+        # a caller can check several buckets and then take() from all of them together.
+        now = now or time.monotonic()
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        self._refill(now)
+        return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+
+    def take(self):
+        self._tokens -= 1
+
+    def is_idle(self, now: float = None) -> bool:
+        # Full and not paused: forgetting this bucket would change nothing
+        now = now or time.monotonic()
+        return self.wait_time(now) == 0 and self._tokens >= self.capacity
+
+    def pause(self, seconds: float):
+        # One token is ready when the pause ends and refilling starts from there, so the retry goes
+        # out at once but the bucket does not come back with a full burst
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        self._tokens = min(1, self.capacity)
+        self._updated = self._blocked_until
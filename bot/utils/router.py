@@ -0,0 +1,72 @@
+from bot.utils.conversation import conversations
+from bot.utils.callback_codec import is_packed, decode, CallbackDataError
+
+class Router:
+    # Routes every reply message and callback query through dispatch tables instead of a chain
+    # of Pyrogram filters, so the cost of routing does not grow with the number of handlers.
+    # - Replies go to the handler registered for the user's conversation flow (one state read).
+    # - Packed callback data (see bot.utils.callback_codec) is decoded and dispatched on its
+    #   action id; the handler receives the decoded struct.
+    # - Other callback data (fixed menu buttons) is looked up as an exact key. Buttons that carry
+    #   values are packed, so either way routing is one or two dict lookups.
+    def __init__(self):
+        self._replies = {} # flow -> coroutine(client, message, context)
+        self._actions = {} # codec action id -> coroutine(client, callback_query, payload)
+        self._callbacks = {} # exact callback data -> coroutine(client, callback_query)
+
+    def reply(self, flow: str):
+        def decorator(func):
+            if flow in self._replies:
+                raise ValueError(f"Reply handler for flow '{flow}' is already registered")
+            self._replies[flow] = func
+            return func
+        return decorator
+
+    def callback(self, data: str):
+        def decorator(func):
+            if data in self._callbacks:
+                raise ValueError(f"Callback handler for '{data}' is already registered")
+            self._callbacks[data] = func
+            return func
+        return decorator
+
+    def action(self, callback_action):
+        def decorator(func):
+            if callback_action.action_id in self._actions:
+                raise ValueError(f"Handler for callback action {callback_action.name} is already registered")
+            self._actions[callback_action.action_id] = func
+            return func
+        return decorator
+
+    async def dispatch_reply(self, client, message) -> bool:
+        context = await conversations.get(message.from_user.id)
+        handler = self._replies.get(context.flow) if context else None
+        if not handler:
+            return False # Not a reply to one of our prompts
+        await handler(client, message, context)
+        return True
+
+    async def dispatch_callback(self, client, callback_query) -> bool:
+        data = callback_query.data or ""
+        if is_packed(data):
+            try:
+                action, payload = decode(data)
+            except CallbackDataError as e:
+                print(f"Rejected callback data {data!r}: {e}")
+                await callback_query.answer("Invalid request.", show_alert=True)
+                return False
+            handler = self._actions.get(action.action_id)
+            if not handler:
+                await callback_query.answer()
+                return False
+            await handler(client, callback_query, payload)
+            return True
+
+        handler = self._callbacks.get(data)
+        if not handler:
+            await callback_query.answer() # Stale or unknown button; stop the loading spinner
+            return False
+        await handler(client, callback_query)
+        return True
+
+router = Router()
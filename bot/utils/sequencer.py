@@ -0,0 +1,149 @@
+import asyncio
+import contextvars
+import functools
+import heapq
+import time
+from collections import deque
+from pyrogram.errors import RPCError
+from pyrogram.types import CallbackQuery
+from database.repository import update_claims
+from games.leadership import leadership
+from config import UPDATE_MAX_BACKLOG, UPDATE_CLAIMS, UPDATE_CLAIM_TTL
+
+# The user whose shard the current task is running, if any
+_running_user = contextvars.ContextVar('running_user', default=None)
+
+def update_key(update) -> str:
+    # Identifies an update across worker processes
+    if isinstance(update, CallbackQuery):
+        return f"cb:{update.id}"
+    return f"msg:{update.chat.id}:{update.id}"
+
+class UpdateSequencer:
+    # Runs each user's updates one at a time, in arrival order, while different users run in parallel.
+    # Pyrogram hands updates to handlers concurrently, so two quick taps from one user could both
+    # pass a check (bonus not yet claimed, balance high enough) before either writes. Handlers
+    # wrapped with ordered() instead append the update to a queue per user (a shard) and return;
+    # one task per shard with work runs the queue and exits once it is empty. A shard holds at most
+    # UPDATE_MAX_BACKLOG updates, counting the one running; beyond that new ones are rejected.
+    # A handler that calls another ordered handler for the same user (a button re-using a command)
+    # runs it inline: it already holds that user's turn, and the update was never delivered as such.
+    # With UPDATE_CLAIMS, each delivered update is claimed in MongoDB (update_claims) just before
+    # its handler runs, so an update delivered to more than one process is handled once. Ordering
+    # is per process: two updates from one user handled by different processes may overlap, which
+    # is why balances, bonuses and payments are changed only by conditional writes.
+    def __init__(self):
+        self._shards = {} # user_id -> deque of (handler, client, update), the first one running
+        self._tasks = {} # user_id -> task running that shard
+        self._accepting = True
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.duplicates = 0 # Updates another process (or an earlier delivery) already claimed
+        self.max_depth = 0
+        self.wait_total = 0.0 # Seconds updates spent queued behind the same user's earlier ones
+        self.wait_max = 0.0
+
+    def ordered(self, handler):
+        # Decorator for Pyrogram handlers; put it under @Client.on_message / @Client.on_callback_query
+        @functools.wraps(handler)
+        async def wrapper(client, update):
+            user = getattr(update, 'from_user', None)
+            if user and _running_user.get() == user.id:
+                # Called from a handler already holding this user's turn
+                await handler(client, update)
+                return
+            if not user:
+                # Channel posts and the like have nobody to order against
+                if await self._claim(update):
+                    await handler(client, update)
+                return
+            await self.submit(user.id, handler, client, update)
+        return wrapper
+
+    async def submit(self, user_id: int, handler, client, update) -> bool:
+        shard = self._shards.get(user_id)
+        depth = len(shard) if shard else 0
+        if not self._accepting or depth >= UPDATE_MAX_BACKLOG:
+            self.rejected += 1
+            if isinstance(update, CallbackQuery):
+                try:
+                    await update.answer("Too many requests at once. Please wait a moment.", show_alert=True)
+                except RPCError:
+                    pass
+            return False
+
+        if shard is None:
+            shard = self._shards[user_id] = deque()
+        shard.append((handler, client, update, time.monotonic()))
+        self.max_depth = max(self.max_depth, len(shard))
+        if user_id not in self._tasks:
+            self._tasks[user_id] = asyncio.create_task(self._run(user_id, shard))
+        return True
+
+    async def _run(self, user_id: int, shard):
+        _running_user.set(user_id)
+        try:
+            while shard:
+                handler, client, update, queued_at = shard[0]
+                waited = time.monotonic() - queued_at
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+                try:
+                    if await self._claim(update):
+                        await handler(client, update)
+                        self.processed += 1
+                except Exception as e:
+                    # One failing update must not stall the rest of this user's queue
+                    self.failed += 1
+                    print(f"Handler {handler.__name__} failed for user {user_id}: {e}")
+                shard.popleft()
+        finally:
+            # No await between the queue running dry and this, so a new update always finds either
+            # a running task or no shard at all
+            del self._shards[user_id]
+            del self._tasks[user_id]
+
+    async def _claim(self, update) -> bool:
+        if not UPDATE_CLAIMS:
+            return True
+        try:
+            claimed = await update_claims.claim(update_key(update), leadership.worker_id, UPDATE_CLAIM_TTL)
+        except Exception as e:
+            # Without a claim the update might run twice; dropping it is safer, the user can retry
+            print(f"Failed to claim update {update_key(update)}, dropping it: {e}")
+            if isinstance(update, CallbackQuery):
+                try:
+                    await update.answer("Please try again.", show_alert=True)
+                except RPCError:
+                    pass
+            return False
+        if not claimed:
+            self.duplicates += 1
+        return claimed
+
+    async def stop(self, timeout: float = 10):
+        # Stop taking updates and let the queued ones finish (within the timeout)
+        self._accepting = False
+        deadline = time.monotonic() + timeout
+        while self._tasks and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        for task in list(self._tasks.values()):
+            task.cancel()
+
+    def metrics(self, top: int = 5) -> dict:
+        started = self.processed + self.failed
+        return {
+            "shards": len(self._shards),
+            "queued": sum(len(shard) for shard in self._shards.values()),
+            "deepest": heapq.nlargest(top, ((len(shard), user_id) for user_id, shard in self._shards.items())),
+            "max_depth": self.max_depth,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "duplicates": self.duplicates,
+            "avg_wait_ms": self.wait_total / started * 1000 if started else 0.0,
+            "max_wait_ms": self.wait_max * 1000
+        }
+
+updates = UpdateSequencer()
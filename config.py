@@ -12,4 +12,115 @@ DATABASE_URL = os.environ.get("DATABASE_URL", "mongodb://localhost:27017/betting
 # Optional: Payment API keys or other sensitive info
 # BKASH_API_KEY = os.environ.get("BKASH_API_KEY", "")
 # PAYPAL_CLIENT_ID = os.environ.get("PAYPAL_CLIENT_ID", "")
-# PAYPAL_CLIENT_SECRET = os.environ.get("PAYPAL_CLIENT_SECRET", "")
\ No newline at end of file
+# PAYPAL_CLIENT_SECRET = os.environ.get("PAYPAL_CLIENT_SECRET", "")
+
+# Size of the thread pool that runs blocking MongoDB queries off the event loop
+DB_MAX_WORKERS = int(os.environ.get("DB_MAX_WORKERS", "16"))
+
+# Check at startup that every hot query is served by an index (see database/indexes.py)
+VERIFY_INDEXES_ON_STARTUP = os.environ.get("VERIFY_INDEXES_ON_STARTUP", "1") == "1"
+
+# How many round ids each process reserves per counter round trip (1 = strictly sequential ids)
+ROUND_ID_BLOCK_SIZE = int(os.environ.get("ROUND_ID_BLOCK_SIZE", "1"))
+
+# Log a warning when a round deadline fires later than this (milliseconds)
+SCHEDULER_SLIP_WARNING_MS = int(os.environ.get("SCHEDULER_SLIP_WARNING_MS", "500"))
+
+# Bet ingestion: bets are inserted with one insert_many per batch of up to BET_BATCH_SIZE,
+# waiting at most BET_FLUSH_INTERVAL_MS after the first queued bet
+BET_BATCH_SIZE = int(os.environ.get("BET_BATCH_SIZE", "200"))
+BET_FLUSH_INTERVAL_MS = int(os.environ.get("BET_FLUSH_INTERVAL_MS", "5"))
+
+# Broadcasts: parallel sends, broadcast send rate (kept below OUTBOX_GLOBAL_RATE so other traffic
+# always has headroom), recipients per checkpointed page, seconds between progress updates
+BROADCAST_CONCURRENCY = int(os.environ.get("BROADCAST_CONCURRENCY", "20"))
+BROADCAST_RATE_PER_SECOND = float(os.environ.get("BROADCAST_RATE_PER_SECOND", "20"))
+BROADCAST_PAGE_SIZE = int(os.environ.get("BROADCAST_PAGE_SIZE", "500"))
+BROADCAST_PROGRESS_INTERVAL = int(os.environ.get("BROADCAST_PROGRESS_INTERVAL", "10"))
+
+# Number of entries kept in memory for each leaderboard period
+LEADERBOARD_SIZE = int(os.environ.get("LEADERBOARD_SIZE", "10"))
+
+# Leaderboard display names: seconds one is used before it is looked up again, and how many are
+# kept (least recently shown dropped first; must be at least 3 x LEADERBOARD_SIZE)
+LEADERBOARD_NAME_TTL = int(os.environ.get("LEADERBOARD_NAME_TTL", "3600"))
+LEADERBOARD_NAME_CACHE_SIZE = int(os.environ.get("LEADERBOARD_NAME_CACHE_SIZE", "1000"))
+
+# Seconds between writes of buffered analytics counters to MongoDB
+ANALYTICS_FLUSH_INTERVAL = int(os.environ.get("ANALYTICS_FLUSH_INTERVAL", "5"))
+
+# Seconds between reconciliations of the analytics totals against the source collections
+ANALYTICS_RECONCILE_INTERVAL = int(os.environ.get("ANALYTICS_RECONCILE_INTERVAL", "3600"))
+
+# Pending deposits/withdrawals shown per page of the admin review queue
+PAYMENT_QUEUE_PAGE_SIZE = int(os.environ.get("PAYMENT_QUEUE_PAGE_SIZE", "5"))
+
+# Conversation state (multi-step flows such as "reply with the bet amount"):
+# 'memory' keeps it in this process, 'mongo' shares it between worker processes.
+# Idle sessions expire after CONVERSATION_TTL seconds; the memory backend also keeps at most
+# CONVERSATION_MAX_SESSIONS, evicting the least recently used.
+CONVERSATION_BACKEND = os.environ.get("CONVERSATION_BACKEND", "memory")
+CONVERSATION_TTL = int(os.environ.get("CONVERSATION_TTL", "600"))
+CONVERSATION_MAX_SESSIONS = int(os.environ.get("CONVERSATION_MAX_SESSIONS", "10000"))
+
+# User cache: seconds a cached user is served before its version is re-checked, and max entries
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", "5"))
+USER_CACHE_MAX_SIZE = int(os.environ.get("USER_CACHE_MAX_SIZE", "50000"))
+
+# Settlement: winners credited per bulk write, and how many settled round ids each user keeps
+# to make a repeated credit a no-op (must exceed the rounds a user can win during one outage)
+SETTLEMENT_CREDIT_CHUNK = int(os.environ.get("SETTLEMENT_CREDIT_CHUNK", "1000"))
+SETTLEMENT_MEMORY = int(os.environ.get("SETTLEMENT_MEMORY", "50"))
+
+# Outbound messages: global and per-chat send rates (messages per second, with per-chat bursts),
+# concurrent Telegram requests, and FloodWait retries before a message is given up. A FloodWait
+# longer than OUTBOX_GLOBAL_FLOOD_WAIT seconds is taken as a bot-wide limit and pauses all sending.
+# The rates apply per worker process; with several workers, split the bot's budget between them.
+OUTBOX_GLOBAL_RATE = float(os.environ.get("OUTBOX_GLOBAL_RATE", "25"))
+OUTBOX_CHAT_RATE = float(os.environ.get("OUTBOX_CHAT_RATE", "1"))
+OUTBOX_CHAT_BURST = int(os.environ.get("OUTBOX_CHAT_BURST", "3"))
+OUTBOX_CONCURRENCY = int(os.environ.get("OUTBOX_CONCURRENCY", "16"))
+OUTBOX_MAX_RETRIES = int(os.environ.get("OUTBOX_MAX_RETRIES", "3"))
+OUTBOX_GLOBAL_FLOOD_WAIT = float(os.environ.get("OUTBOX_GLOBAL_FLOOD_WAIT", "5"))
+
+# Round result messages: sends in flight at once, bettors read per batch (one checkpoint each),
+# and how old (seconds) an interrupted round may be for its messages to be resumed on startup
+RESULT_NOTIFY_CONCURRENCY = int(os.environ.get("RESULT_NOTIFY_CONCURRENCY", "50"))
+RESULT_NOTIFY_BATCH = int(os.environ.get("RESULT_NOTIFY_BATCH", "500"))
+RESULT_NOTIFY_RESUME_WINDOW = int(os.environ.get("RESULT_NOTIFY_RESUME_WINDOW", "3600"))
+
+# Live countdowns on open game menus: seconds between edits, and between edits in the final
+# window (seconds) before betting closes; edits per second across all menus; menus kept per round
+COUNTDOWN_INTERVAL = int(os.environ.get("COUNTDOWN_INTERVAL", "10"))
+COUNTDOWN_FINAL_INTERVAL = int(os.environ.get("COUNTDOWN_FINAL_INTERVAL", "3"))
+COUNTDOWN_FINAL_WINDOW = int(os.environ.get("COUNTDOWN_FINAL_WINDOW", "30"))
+COUNTDOWN_EDITS_PER_SECOND = float(os.environ.get("COUNTDOWN_EDITS_PER_SECOND", "10"))
+COUNTDOWN_MAX_MESSAGES = int(os.environ.get("COUNTDOWN_MAX_MESSAGES", "200"))
+
+# Updates are processed one at a time per user; at most this many may be queued for one user
+# (including the one running) before further ones are rejected
+UPDATE_MAX_BACKLOG = int(os.environ.get("UPDATE_MAX_BACKLOG", "20"))
+
+# Multi-process deployment: every worker process handles updates, and the one holding the
+# scheduler lease also runs rounds, settlement, result messages and broadcasts.
+# WORKER_ID names this process (its Pyrogram session and lease owner; hostname:pid if empty).
+# The lease lasts LEASE_TTL seconds without renewal and is renewed every LEASE_HEARTBEAT seconds.
+WORKER_ID = os.environ.get("WORKER_ID", "")
+LEASE_TTL = int(os.environ.get("LEASE_TTL", "15"))
+LEASE_HEARTBEAT = int(os.environ.get("LEASE_HEARTBEAT", "5"))
+# Every process may receive the same Telegram update, so with UPDATE_CLAIMS each update is claimed
+# in MongoDB before it is handled (one insert per update), and a claim is remembered for
+# UPDATE_CLAIM_TTL seconds. On by default when WORKER_ID is set; a single process needs no claims.
+UPDATE_CLAIMS = os.environ.get("UPDATE_CLAIMS", "1" if WORKER_ID else "0") == "1"
+UPDATE_CLAIM_TTL = int(os.environ.get("UPDATE_CLAIM_TTL", "3600"))
+
+# Seconds between reads of the current rounds by worker processes that do not run the scheduler
+ROUND_SYNC_INTERVAL = float(os.environ.get("ROUND_SYNC_INTERVAL", "1"))
+
+# Seconds the scheduler waits after a draw before settling, so bets other worker processes
+# accepted just before the close are written and settled rather than refunded. Correctness does
+# not depend on it: a bet written after settlement began is withdrawn and refunded (games.bet_ingest).
+SETTLEMENT_GRACE = float(os.environ.get("SETTLEMENT_GRACE", "2"))
+
+# Seconds between leaderboard reloads (the scheduler process also reloads it after each settlement)
+LEADERBOARD_REFRESH_INTERVAL = int(os.environ.get("LEADERBOARD_REFRESH_INTERVAL", "30"))
@@ -0,0 +1,88 @@
+import sys
+from datetime import datetime
+from bson import ObjectId
+from database.models import (User, GameRound, Bet, Transaction, Leaderboard, DailyBonus, Counter, BroadcastJob,
+                             AnalyticsBucket, ConversationSession, SettlementJob, Lease, UpdateClaim)
+
+MODELS = [User, GameRound, Bet, Transaction, Leaderboard, DailyBonus, Counter, BroadcastJob, AnalyticsBucket,
+          ConversationSession, SettlementJob, Lease, UpdateClaim]
+
+# Indexes that older versions created and that now get in the way: (model, index name)
+OBSOLETE_INDEXES = [
+    # round_id used to be unique on its own; it is now unique per game type, and the old index
+    # rejects the same round id in two games
+    (GameRound, 'round_id_1'),
+]
+
+# Every query on a hot path, in the shape the code actually issues it.
+# Placeholder values are fine: only the query plan matters, not the result.
+HOT_QUERIES = {
+    "bets_unsettled_in_round": lambda: Bet.objects(game_round=ObjectId(), is_settled=False),
+    "bets_unsettled_outcome_in_round": lambda: Bet.objects(game_round=ObjectId(), is_settled=False, bet_value='red'),
+    "bets_payouts_in_round": lambda: Bet.objects(game_round=ObjectId(), payout__gt=0),
+    "pending_transactions_page": lambda: Transaction.objects(transaction_type='deposit', status='pending', id__gt=ObjectId()).order_by('id').limit(5),
+    "uncredited_payment_batches": lambda: Transaction.objects(credit_pending=True),
+    "user_transaction_history": lambda: Transaction.objects(user=ObjectId()).order_by('-created_at').limit(10),
+    "leaderboard_weekly": lambda: Leaderboard.objects(week_bucket='2026-W01').order_by('-weekly_earnings').limit(10),
+    "leaderboard_monthly": lambda: Leaderboard.objects(month_bucket='2026-01').order_by('-monthly_earnings').limit(10),
+    "leaderboard_all_time": lambda: Leaderboard.objects().order_by('-all_time_earnings').limit(10),
+    "latest_round_for_game": lambda: GameRound.objects(game_type='color_prediction').order_by('-round_id').limit(1),
+    "round_by_id": lambda: GameRound.objects(game_type='color_prediction', round_id=1),
+    "unsettled_rounds": lambda: GameRound.objects(is_settled=False, end_time__lte=datetime.utcnow()).order_by('end_time'),
+    "user_by_telegram_id": lambda: User.objects(user_id=0),
+}
+
+def drop_obsolete_indexes():
+    for model, name in OBSOLETE_INDEXES:
+        collection = model._get_collection()
+        if name in collection.index_information():
+            collection.drop_index(name)
+            print(f"Dropped obsolete index {name} on {collection.name}.")
+
+def ensure_indexes():
+    drop_obsolete_indexes()
+    for model in MODELS:
+        model.ensure_indexes()
+
+def _plan_stages(plan):
+    # Walk a winning plan and yield every stage name in it
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            yield plan['stage']
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+def check_hot_queries():
+    # Returns {query_name: [stages]} for every hot query that falls back to a collection scan
+    collection_scans = {}
+    for name, build_query in HOT_QUERIES.items():
+        explain = build_query().explain()
+        winning_plan = explain.get('queryPlanner', {}).get('winningPlan', {})
+        stages = list(_plan_stages(winning_plan))
+        if 'COLLSCAN' in stages:
+            collection_scans[name] = stages
+    return collection_scans
+
+def verify_indexes():
+    # Fails loudly if any registered hot query would scan a whole collection
+    ensure_indexes()
+    collection_scans = check_hot_queries()
+    if collection_scans:
+        details = "\n".join(f"  {name}: {' -> '.join(stages)}" for name, stages in collection_scans.items())
+        raise RuntimeError(f"Hot queries fall back to a collection scan:\n{details}")
+    print(f"Index check passed for {len(HOT_QUERIES)} hot queries.")
+
+if __name__ == "__main__":
+    # Usage: python -m database.indexes
+    from database.db_manager import connect_db, disconnect_db
+    connect_db()
+    try:
+        verify_indexes()
+    except RuntimeError as e:
+        print(e)
+        sys.exit(1)
+    finally:
+        disconnect_db()
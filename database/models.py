@@ -1,5 +1,5 @@
 from datetime import datetime
-from mongoengine import Document, StringField, IntField, FloatField, DateTimeField, ListField, ReferenceField, BooleanField
+from mongoengine import Document, StringField, IntField, FloatField, DateTimeField, ListField, ReferenceField, BooleanField, DictField, ObjectIdField
 
 class User(Document):
     user_id = IntField(required=True, unique=True)
@@ -10,17 +10,35 @@ class User(Document):
     referral_code = StringField(unique=True)
     referred_by = ReferenceField('self')
     is_admin = BooleanField(default=False)
+    is_banned = BooleanField(default=False)
+    version = IntField(default=0) # Bumped by every write; lets cached copies be revalidated cheaply
+    settlements = ListField(ObjectIdField()) # Last few rounds whose winnings were credited; makes payout credits idempotent
     created_at = DateTimeField(default=datetime.utcnow)
     updated_at = DateTimeField(default=datetime.utcnow)
+    meta = {
+        'indexes': [
+            ('user_id', 'version'), # Covered version probe for the user cache
+        ]
+    }
 
 class GameRound(Document):
-    round_id = IntField(required=True, unique=True)
+    round_id = IntField(required=True, unique_with='game_type') # Round ids are numbered per game type
     game_type = StringField(required=True) # e.g., 'color_prediction', 'parity_evens'
     start_time = DateTimeField(default=datetime.utcnow)
     end_time = DateTimeField()
     result = StringField()
     is_manual_result = BooleanField(default=False)
-    meta = {'allow_inheritance': True}
+    # False until the round's SettlementJob finishes. Rounds saved before this field existed
+    # do not have it at all, so the recovery query (is_settled=False) leaves them alone.
+    is_settled = BooleanField(default=False)
+    meta = {
+        'allow_inheritance': True,
+        'index_cls': False,
+        'indexes': [
+            ('game_type', '-round_id'), # Latest round per game
+            ('is_settled', 'end_time'), # Startup recovery of unsettled rounds
+        ]
+    }
 
 class ColorPredictionRound(GameRound):
     # Specific fields for Color Prediction
@@ -35,6 +53,11 @@ class Bet(Document):
     payout = FloatField(default=0.0)
     is_settled = BooleanField(default=False)
     created_at = DateTimeField(default=datetime.utcnow)
+    meta = {
+        'indexes': [
+            ('game_round', 'is_settled', 'bet_value'), # Settlement, per outcome
+        ]
+    }
 
 class Transaction(Document):
     user = ReferenceField(User, required=True)
@@ -45,19 +68,139 @@ class Transaction(Document):
     transaction_id = StringField(unique=True) # For external payment IDs
     screenshot_proof = StringField() # URL or file ID
     approved_by = ReferenceField(User) # Admin who approved
+    batch_id = StringField() # Set by approve/reject; identifies the rows one claim flipped
+    credit_pending = BooleanField() # Set while a claimed batch still has to be credited (payments.batch)
     created_at = DateTimeField(default=datetime.utcnow)
     updated_at = DateTimeField(default=datetime.utcnow)
+    meta = {
+        'indexes': [
+            ('transaction_type', 'status', '_id'), # Pending payment queues, paged by _id
+            ('user', '-created_at'), # Transaction history
+            {'fields': ['batch_id'], 'sparse': True}, # Rows flipped by one approve/reject
+            {'fields': ['credit_pending'], 'sparse': True}, # Claimed batches not yet credited
+        ]
+    }
 
 class Leaderboard(Document):
     user = ReferenceField(User, required=True, unique=True)
     weekly_earnings = FloatField(default=0.0)
     monthly_earnings = FloatField(default=0.0)
     all_time_earnings = FloatField(default=0.0)
+    week_bucket = StringField() # e.g. '2026-W42'; weekly_earnings belongs to this week only
+    month_bucket = StringField() # e.g. '2026-10'; monthly_earnings belongs to this month only
+    settlements = ListField(ObjectIdField()) # Last few settlements counted here; makes adding earnings idempotent
     updated_at = DateTimeField(default=datetime.utcnow)
+    meta = {
+        'indexes': [
+            ('week_bucket', '-weekly_earnings'),
+            ('month_bucket', '-monthly_earnings'),
+            '-all_time_earnings',
+        ]
+    }
 
 class DailyBonus(Document):
     user = ReferenceField(User, required=True, unique=True)
     last_claimed = DateTimeField()
     streak_count = IntField(default=0)
 
+class Counter(Document):
+    # Named monotonic sequences, e.g. 'round_id:color_prediction'
+    name = StringField(primary_key=True)
+    value = IntField(default=0)
+
+class BroadcastJob(Document):
+    text = StringField(required=True)
+    created_by = IntField(required=True) # Admin Telegram user id
+    status = StringField(default='running') # 'running', 'completed'
+    total = IntField(default=0)
+    sent = IntField(default=0)
+    failed = IntField(default=0)
+    last_user_id = IntField(default=0) # Checkpoint: recipients are processed in user_id order
+    progress_chat_id = IntField()
+    progress_message_id = IntField()
+    created_at = DateTimeField(default=datetime.utcnow)
+    updated_at = DateTimeField(default=datetime.utcnow)
+    finished_at = DateTimeField()
+    meta = {
+        'indexes': ['status']
+    }
+
+class AnalyticsBucket(Document):
+    # Running totals ('total') and time rollups ('minute:2026-10-18T12:34', 'hour:2026-10-18T12', 'day:2026-10-18')
+    key = StringField(primary_key=True)
+    granularity = StringField(required=True) # 'total', 'minute', 'hour', 'day'
+    bucket_start = DateTimeField()
+    counters = DictField() # new_users, bets, wagered, payouts, deposits, withdrawals
+    games = DictField() # game_type -> {bets, wagered, payouts}
+    active_users = ListField(IntField()) # Telegram ids that placed a bet; day buckets only
+    expires_at = DateTimeField() # Short-lived rollups are dropped by MongoDB after this
+    updated_at = DateTimeField(default=datetime.utcnow)
+    reconciled_at = DateTimeField()
+    meta = {
+        'indexes': [
+            ('granularity', '-bucket_start'),
+            {'fields': ['expires_at'], 'expireAfterSeconds': 0}
+        ]
+    }
+
+class ConversationSession(Document):
+    # Shared conversation state, used when CONVERSATION_BACKEND is 'mongo'
+    user_id = IntField(primary_key=True) # Telegram user id; one active flow per user
+    flow = StringField(required=True) # 'bet', 'deposit', 'withdraw', 'admin'
+    step = StringField(required=True) # e.g. 'waiting_for_bet_amount'
+    message_id = IntField()
+    data = DictField()
+    expires_at = DateTimeField(required=True)
+    meta = {
+        'indexes': [
+            {'fields': ['expires_at'], 'expireAfterSeconds': 0}
+        ]
+    }
+
+class SettlementJob(Document):
+    # Durable settlement of one round; stages run in order and each is safe to repeat:
+    # 'pending' -> 'bets_settled' (every bet has its payout) -> 'credited' (winners paid)
+    # -> 'recorded' (analytics and leaderboard updated) -> 'done'
+    id = ObjectIdField(primary_key=True) # The settled GameRound's id
+    game_type = StringField(required=True)
+    round_id = IntField(required=True)
+    result = StringField()
+    winning_multipliers = DictField() # bet_value -> payout multiplier, fixed when the job is created
+    status = StringField(default='pending')
+    settled_bets = IntField(default=0)
+    winners = IntField(default=0)
+    credited_users = IntField(default=0) # Checkpoint within the 'bets_settled' stage
+    total_payout = FloatField(default=0.0)
+    attempts = IntField(default=0)
+    last_error = StringField()
+    notified_users = IntField(default=0) # Result messages sent so far
+    notified_through = ObjectIdField() # Checkpoint: bettors are notified in User ObjectId order
+    notified_at = DateTimeField() # Set once every bettor has been sent their result
+    created_at = DateTimeField(default=datetime.utcnow)
+    updated_at = DateTimeField(default=datetime.utcnow)
+    finished_at = DateTimeField()
+    meta = {
+        'indexes': ['status', ('notified_at', 'finished_at')]
+    }
+
+class Lease(Document):
+    # A role held by one process at a time, e.g. 'scheduler'. The holder renews it before it
+    # expires; once expired any process may take it. Expiry is in MongoDB's clock, not a worker's.
+    name = StringField(primary_key=True)
+    owner = StringField(required=True) # Worker id of the holder
+    expires_at = DateTimeField(required=True)
+    renewed_at = DateTimeField()
+
+class UpdateClaim(Document):
+    # A Telegram update taken by one worker process. Every process may receive the same update;
+    # only the one whose insert succeeds handles it.
+    key = StringField(primary_key=True) # 'cb:<callback query id>' or 'msg:<chat id>:<message id>'
+    owner = StringField(required=True) # Worker id of the process handling it
+    expires_at = DateTimeField(required=True)
+    meta = {
+        'indexes': [
+            {'fields': ['expires_at'], 'expireAfterSeconds': 0}
+        ]
+    }
+
 # Add more models as needed for other game types, VIP, etc.
\ No newline at end of file
@@ -0,0 +1,597 @@
+import asyncio
+import functools
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from bson import ObjectId
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from database.models import User, GameRound, Bet, Transaction, Leaderboard, DailyBonus, BroadcastJob, AnalyticsBucket, ConversationSession, SettlementJob, Lease, UpdateClaim
+from database.user_cache import user_cache
+from config import DB_MAX_WORKERS, SETTLEMENT_MEMORY
+
+# mongoengine/pymongo are blocking, so every query runs on a bounded thread pool.
+# Handlers await the result and the event loop keeps serving other updates meanwhile;
+# the pool size caps how many queries are in flight against MongoDB at once.
+_executor = ThreadPoolExecutor(max_workers=DB_MAX_WORKERS, thread_name_prefix="db")
+
+async def run_db(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+def shutdown_executor():
+    _executor.shutdown(wait=True)
+
+
+class UserRepository:
+    # Reads by Telegram id go through user_cache. Every write bumps User.version; writes that
+    # return the new document refresh the cache, the rest invalidate the cached entry.
+    async def get(self, user_id: int):
+        cached, fresh = user_cache.lookup(user_id)
+        if fresh:
+            return cached
+        if cached is not None:
+            # Stale entry: a covered index probe tells whether anyone has written the user since
+            doc = await run_db(User._get_collection().find_one, {'user_id': user_id}, {'_id': 0, 'version': 1})
+            if doc and doc.get('version', 0) == (cached.version or 0):
+                user_cache.renew(user_id)
+                return cached
+            user_cache.invalidate(user_id)
+        user = await run_db(lambda: User.objects(user_id=user_id).first())
+        user_cache.put(user, refetched=cached is not None)
+        return user
+
+    async def get_by_pk(self, pk):
+        return await run_db(lambda: User.objects(id=pk).first())
+
+    async def get_by_referral_code(self, referral_code: str):
+        return await run_db(lambda: User.objects(referral_code=referral_code).first())
+
+    async def get_referrer(self, user):
+        # Dereferencing a ReferenceField is a query, so it happens off the event loop too
+        return await run_db(lambda: user.referred_by)
+
+    async def create(self, **fields):
+        user = User(**fields)
+        await run_db(user.save)
+        user_cache.put(user)
+        return user
+
+    async def save(self, user):
+        # Full-document save; the cached copy cannot be trusted to match, so drop it
+        user.updated_at = datetime.utcnow()
+        user.version = (user.version or 0) + 1
+        await run_db(user.save)
+        user_cache.invalidate(user.user_id)
+        return user
+
+    async def is_admin(self, user_id: int) -> bool:
+        user = await self.get(user_id)
+        return bool(user and user.is_admin)
+
+    async def set_admin(self, user_id: int, is_admin: bool) -> bool:
+        query = {'user_id': user_id}
+        if not is_admin:
+            query['is_admin'] = True
+        updated = await run_db(lambda: User.objects(**query).update_one(
+            set__is_admin=is_admin, inc__version=1, set__updated_at=datetime.utcnow()))
+        user_cache.invalidate(user_id)
+        return updated > 0
+
+    async def set_banned(self, user_id: int, is_banned: bool) -> bool:
+        updated = await run_db(lambda: User.objects(user_id=user_id).update_one(
+            set__is_banned=is_banned, inc__version=1, set__updated_at=datetime.utcnow()))
+        user_cache.invalidate(user_id)
+        return updated > 0
+
+    async def debit(self, user_id: int, amount: float, allow_banned: bool = True):
+        # Conditional atomic debit; returns the updated user or None if the balance is too low
+        # (or the user is banned, when allow_banned is False)
+        query = {'user_id': user_id, 'balance__gte': amount}
+        if not allow_banned:
+            query['is_banned__ne'] = True
+        user = await run_db(lambda: User.objects(**query).modify(
+            dec__balance=amount, inc__version=1, set__updated_at=datetime.utcnow(), new=True))
+        user_cache.put(user)
+        return user
+
+    async def credit(self, user_id: int, amount: float):
+        user = await run_db(lambda: User.objects(user_id=user_id).modify(
+            inc__balance=amount, inc__version=1, set__updated_at=datetime.utcnow(), new=True))
+        user_cache.put(user)
+        return user
+
+    async def credit_by_pk(self, pk, amount: float):
+        updated = await run_db(lambda: User.objects(id=pk).update_one(inc__balance=amount, inc__version=1))
+        user_cache.invalidate_pks([pk])
+        return updated
+
+    async def credit_settlement(self, settlement_id, amounts_by_pk: dict) -> int:
+        # Idempotent bulk credit of one round's winnings, or of one payment batch. Each user document
+        # remembers the last SETTLEMENT_MEMORY settlement ids it was credited for, and the update only
+        # matches users that do not have this one yet, so repeating a credit after a crash pays nobody twice.
+        if not amounts_by_pk:
+            return 0
+        ops = [UpdateOne({'_id': pk, 'settlements': {'$ne': settlement_id}},
+                         {'$inc': {'balance': amount, 'version': 1},
+                          '$push': {'settlements': {'$each': [settlement_id], '$slice': -SETTLEMENT_MEMORY}}})
+               for pk, amount in amounts_by_pk.items()]
+        result = await run_db(User._get_collection().bulk_write, ops, ordered=False)
+        user_cache.invalidate_pks(amounts_by_pk)
+        return result.modified_count
+
+    async def count(self) -> int:
+        return await run_db(User.objects.count)
+
+    async def display_names(self, pks) -> dict:
+        # One batched lookup: User ObjectId -> username, falling back to first name
+        docs = await run_db(lambda: list(User.objects(id__in=list(pks)).only('username', 'first_name').as_pymongo()))
+        return {doc['_id']: doc.get('username') or doc.get('first_name') or 'Unknown' for doc in docs}
+
+    async def user_ids_after(self, last_user_id: int, limit: int):
+        # Keyset page of Telegram ids only, in user_id order (served by the unique user_id index)
+        return await run_db(lambda: list(User.objects(user_id__gt=last_user_id).order_by('user_id').limit(limit).scalar('user_id')))
+
+
+class RoundRepository:
+    async def save(self, game_round):
+        await run_db(game_round.save)
+        return game_round
+
+    async def get(self, game_type: str, round_id: int):
+        return await run_db(lambda: GameRound.objects(game_type=game_type, round_id=round_id).first())
+
+    async def get_by_pk(self, pk):
+        return await run_db(lambda: GameRound.objects(id=pk).first())
+
+    async def latest(self, game_type: str):
+        return await run_db(lambda: GameRound.objects(game_type=game_type).order_by('-round_id').first())
+
+    async def unsettled(self):
+        # Rounds past their end whose settlement never finished, oldest first. Rounds still
+        # running are left out: a new scheduler process adopts those instead.
+        now = datetime.utcnow()
+        return await run_db(lambda: list(GameRound.objects(is_settled=False, end_time__lte=now).order_by('end_time')))
+
+    async def set_manual_result(self, game_round, result: str) -> bool:
+        # Admin result for a round that has not ended yet. Written straight to MongoDB so the
+        # scheduler process sees it whichever process the admin used; see load_manual_result.
+        now = datetime.utcnow()
+        updated = await run_db(lambda: GameRound.objects(id=game_round.id, is_settled__ne=True, end_time__gt=now)
+                               .update_one(set__result=result, set__is_manual_result=True))
+        if updated:
+            game_round.result = result
+            game_round.is_manual_result = True
+        return bool(updated)
+
+    async def load_manual_result(self, game_round):
+        # Called just before the draw: copies an admin's result onto the in-memory round
+        doc = await run_db(lambda: GameRound.objects(id=game_round.id).only('result', 'is_manual_result').first())
+        if doc and doc.is_manual_result:
+            game_round.result = doc.result
+            game_round.is_manual_result = True
+        return game_round
+
+    async def mark_settled(self, game_round):
+        game_round.is_settled = True
+        await run_db(lambda: GameRound.objects(id=game_round.id).update_one(set__is_settled=True))
+
+
+class BetRepository:
+    async def insert(self, bet):
+        await run_db(bet.save)
+        return bet
+
+    async def insert_many(self, bet_list) -> dict:
+        # One unordered insert_many for a batch of new bets. Sets each inserted bet's id and
+        # returns {index in bet_list: error message} for the ones MongoDB rejected.
+        # Any other error leaves it unknown which bets were written: every bet still gets the id
+        # it was sent with, so the caller can look them up, and the error is raised.
+        for bet in bet_list:
+            bet.validate()
+        docs = [bet.to_mongo() for bet in bet_list]
+        failed = {}
+        try:
+            await run_db(Bet._get_collection().insert_many, docs, ordered=False)
+        except BulkWriteError as e:
+            failed = {error['index']: error.get('errmsg', 'write error') for error in e.details.get('writeErrors', [])}
+        except Exception:
+            for bet, doc in zip(bet_list, docs):
+                bet.id = doc.get('_id') # None if pymongo never got as far as sending it
+            raise
+        for index, (bet, doc) in enumerate(zip(bet_list, docs)):
+            if index not in failed:
+                bet.id = doc['_id'] # pymongo assigns the _id on the document it was given
+        return failed
+
+    async def exists(self, bet) -> bool:
+        return await run_db(Bet._get_collection().count_documents, {'_id': bet.id}, limit=1) > 0
+
+    async def withdraw_unsettled(self, bet) -> bool:
+        # Delete a bet that settlement has not reached; False if it was settled first
+        result = await run_db(Bet._get_collection().delete_one, {'_id': bet.id, 'is_settled': False})
+        return result.deleted_count == 1
+
+    async def settle_outcome(self, game_round, bet_value: str, multiplier: float) -> int:
+        # Set-based settlement of every unsettled bet on one outcome, payout computed server-side
+        result = await run_db(
+            Bet._get_collection().update_many,
+            {'game_round': game_round.id, 'is_settled': False, 'bet_value': bet_value},
+            [{'$set': {'is_settled': True, 'payout': {'$multiply': ['$amount', float(multiplier)]}}}]
+        )
+        return result.modified_count
+
+    async def settle_losers(self, game_round) -> int:
+        result = await run_db(
+            Bet._get_collection().update_many,
+            {'game_round': game_round.id, 'is_settled': False},
+            {'$set': {'is_settled': True, 'payout': 0.0}}
+        )
+        return result.modified_count
+
+    async def totals_by_game(self) -> dict:
+        # Full aggregation for analytics reconciliation only; never on a request path
+        pipeline = [
+            {'$group': {'_id': '$game_round', 'bets': {'$sum': 1}, 'wagered': {'$sum': '$amount'},
+                        'payouts': {'$sum': {'$ifNull': ['$payout', 0]}}}},
+            {'$lookup': {'from': GameRound._get_collection_name(), 'localField': '_id',
+                         'foreignField': '_id', 'as': 'round'}},
+            {'$unwind': '$round'},
+            {'$group': {'_id': '$round.game_type', 'bets': {'$sum': '$bets'}, 'wagered': {'$sum': '$wagered'},
+                        'payouts': {'$sum': '$payouts'}}}
+        ]
+        return await run_db(lambda: {row['_id']: {'bets': row['bets'], 'wagered': row['wagered'], 'payouts': row['payouts']}
+                                     for row in Bet._get_collection().aggregate(pipeline, allowDiskUse=True)})
+
+    async def result_summaries(self, round_pk, after_user=None, batch_size: int = 500):
+        # Streams one summary per bettor of a settled round, in User ObjectId order, as lists of up
+        # to batch_size: {'_id': user pk, 'user_id', 'balance', 'stake', 'payout',
+        # 'outcomes': [{'bet_value', 'bets', 'stake', 'payout'}]}. Bets are grouped by the server.
+        pipeline = [
+            {'$match': {'game_round': round_pk, 'is_settled': True}},
+            {'$group': {'_id': {'user': '$user', 'bet_value': '$bet_value'}, 'bets': {'$sum': 1},
+                        'stake': {'$sum': '$amount'}, 'payout': {'$sum': '$payout'}}},
+            {'$group': {'_id': '$_id.user', 'stake': {'$sum': '$stake'}, 'payout': {'$sum': '$payout'},
+                        'outcomes': {'$push': {'bet_value': '$_id.bet_value', 'bets': '$bets',
+                                               'stake': '$stake', 'payout': '$payout'}}}},
+        ]
+        if after_user is not None:
+            pipeline.append({'$match': {'_id': {'$gt': after_user}}})
+        pipeline += [
+            {'$sort': {'_id': 1}},
+            {'$lookup': {'from': User._get_collection_name(), 'localField': '_id', 'foreignField': '_id', 'as': 'user'}},
+            {'$unwind': '$user'},
+            {'$project': {'user_id': '$user.user_id', 'balance': '$user.balance', 'stake': 1, 'payout': 1, 'outcomes': 1}}
+        ]
+        cursor = await run_db(Bet._get_collection().aggregate, pipeline, allowDiskUse=True, batchSize=batch_size)
+        try:
+            while True:
+                batch = await run_db(lambda: list(itertools.islice(cursor, batch_size)))
+                if not batch:
+                    break
+                yield batch
+        finally:
+            await run_db(cursor.close)
+
+    async def payouts_by_user(self, game_round) -> dict:
+        pipeline = [
+            {'$match': {'game_round': game_round.id, 'payout': {'$gt': 0}}},
+            {'$group': {'_id': '$user', 'total': {'$sum': '$payout'}}}
+        ]
+        return await run_db(lambda: {row['_id']: row['total'] for row in Bet._get_collection().aggregate(pipeline)})
+
+
+class TransactionRepository:
+    async def get_by_transaction_id(self, transaction_id: str):
+        return await run_db(lambda: Transaction.objects(transaction_id=transaction_id).first())
+
+    async def get_pending(self, transaction_id: str, transaction_type: str):
+        return await run_db(lambda: Transaction.objects(transaction_id=transaction_id, transaction_type=transaction_type, status='pending').first())
+
+    async def create(self, **fields):
+        transaction = Transaction(**fields)
+        await run_db(transaction.save)
+        return transaction
+
+    async def save(self, transaction):
+        transaction.updated_at = datetime.utcnow()
+        await run_db(transaction.save)
+        return transaction
+
+    async def get_user(self, transaction):
+        return await run_db(lambda: transaction.user)
+
+    async def recent_for_user(self, user, limit: int = 10):
+        return await run_db(lambda: list(Transaction.objects(user=user).order_by('-created_at').limit(limit)))
+
+    async def get_by_pk(self, pk):
+        return await run_db(lambda: Transaction.objects(id=pk).first())
+
+    async def claim_pending(self, transaction_type: str, new_status: str, approved_by_pk, pks=None,
+                            first=None, last=None, credit: bool = False):
+        # Set-based status flip of pending transactions, chosen either by a list of ObjectIds or by
+        # an inclusive _id range (one queue page). The update stamps a fresh batch_id, so only the
+        # rows this call actually flipped are returned, even if another admin works the same queue.
+        # With credit, the rows are also marked credit_pending until payments.batch credits them.
+        query = {'transaction_type': transaction_type, 'status': 'pending'}
+        if pks is not None:
+            query['_id'] = {'$in': list(pks)}
+        else:
+            query['_id'] = {'$gte': first, '$lte': last}
+        # An ObjectId, so the batch can also key the idempotent credit (users.credit_settlement)
+        batch_id = str(ObjectId())
+        update = {'status': new_status, 'approved_by': approved_by_pk, 'batch_id': batch_id, 'updated_at': datetime.utcnow()}
+        if credit:
+            update['credit_pending'] = True
+
+        def _claim():
+            collection = Transaction._get_collection()
+            collection.update_many(query, {'$set': update})
+            return list(collection.find({'batch_id': batch_id}, {'user': 1, 'amount': 1, 'transaction_id': 1, 'batch_id': 1}))
+        return await run_db(_claim)
+
+    async def mark_credited(self, batch_id: str):
+        await run_db(Transaction._get_collection().update_many, {'batch_id': batch_id, 'credit_pending': True},
+                     {'$unset': {'credit_pending': ''}})
+
+    async def uncredited(self) -> dict:
+        # {batch_id: [claimed rows]} for every claimed batch whose credit has not been recorded
+        def _find():
+            batches = {}
+            for row in Transaction._get_collection().find({'credit_pending': True}, {'user': 1, 'amount': 1, 'transaction_id': 1, 'batch_id': 1}):
+                batches.setdefault(row['batch_id'], []).append(row)
+            return batches
+        return await run_db(_find)
+
+    async def pending_page(self, transaction_type: str, limit: int, after=None, before=None, start=None):
+        # One keyset page of pending transactions in _id (creation) order, as raw documents.
+        # after/before/start are transaction ObjectIds: the page begins after `after`, ends before
+        # `before`, or begins at `start` inclusive. Users are fetched in one batched lookup.
+        # Returns (rows, users_by_pk, has_previous, has_next).
+        def _page():
+            collection = Transaction._get_collection()
+            base = {'transaction_type': transaction_type, 'status': 'pending'}
+            if before is not None:
+                rows = list(collection.find(dict(base, _id={'$lt': before})).sort('_id', -1).limit(limit))[::-1]
+            else:
+                bound = {'$gt': after} if after is not None else {'$gte': start} if start is not None else None
+                query = dict(base, _id=bound) if bound else base
+                rows = list(collection.find(query).sort('_id', 1).limit(limit))
+            if not rows:
+                return [], {}, False, False
+
+            has_previous = collection.find_one(dict(base, _id={'$lt': rows[0]['_id']}), {'_id': 1}) is not None
+            has_next = collection.find_one(dict(base, _id={'$gt': rows[-1]['_id']}), {'_id': 1}) is not None
+            user_pks = list({row['user'] for row in rows})
+            users_by_pk = {doc['_id']: doc for doc in User._get_collection().find(
+                {'_id': {'$in': user_pks}}, {'user_id': 1, 'username': 1, 'first_name': 1})}
+            return rows, users_by_pk, has_previous, has_next
+        return await run_db(_page)
+
+    async def approved_totals(self) -> dict:
+        # {transaction_type: approved amount}, for analytics reconciliation
+        pipeline = [
+            {'$match': {'status': 'approved'}},
+            {'$group': {'_id': '$transaction_type', 'total': {'$sum': '$amount'}}}
+        ]
+        return await run_db(lambda: {row['_id']: row['total'] for row in Transaction._get_collection().aggregate(pipeline)})
+
+
+class LeaderboardRepository:
+    async def add_earnings(self, settlement_id, amounts_by_user_pk: dict, week_bucket: str, month_bucket: str):
+        # Incremental upsert per user. A period total restarts from zero when its bucket changes,
+        # so weekly/monthly windows roll over without a reset job.
+        # Like credit_settlement, each entry remembers the last SETTLEMENT_MEMORY settlements it
+        # counted and only matches if this one is not among them, so a repeat adds nothing. The
+        # upsert of an entry that already counted it hits the unique user index and is skipped.
+        if not amounts_by_user_pk:
+            return 0
+        now = datetime.utcnow()
+        ops = []
+        for pk, amount in amounts_by_user_pk.items():
+            ops.append(UpdateOne({'user': pk, 'settlements': {'$ne': settlement_id}}, [{'$set': {
+                'weekly_earnings': {'$cond': [{'$eq': ['$week_bucket', week_bucket]},
+                                              {'$add': ['$weekly_earnings', amount]}, amount]},
+                'monthly_earnings': {'$cond': [{'$eq': ['$month_bucket', month_bucket]},
+                                               {'$add': ['$monthly_earnings', amount]}, amount]},
+                'all_time_earnings': {'$add': [{'$ifNull': ['$all_time_earnings', 0]}, amount]},
+                'week_bucket': week_bucket,
+                'month_bucket': month_bucket,
+                'settlements': {'$slice': [{'$concatArrays': [{'$ifNull': ['$settlements', []]}, [settlement_id]]},
+                                           -SETTLEMENT_MEMORY]},
+                'updated_at': now
+            }}], upsert=True))
+        try:
+            result = await run_db(Leaderboard._get_collection().bulk_write, ops, ordered=False)
+        except BulkWriteError as e:
+            if any(error.get('code') != 11000 for error in e.details.get('writeErrors', [])):
+                raise
+            return e.details.get('nModified', 0) + e.details.get('nUpserted', 0)
+        return result.modified_count + result.upserted_count
+
+    async def top(self, period: str, bucket: str, limit: int = 10):
+        # [(User ObjectId, earnings)] without dereferencing users
+        field = f'{period}_earnings'
+        query = {}
+        if period == 'weekly':
+            query['week_bucket'] = bucket
+        elif period == 'monthly':
+            query['month_bucket'] = bucket
+        return await run_db(lambda: [(row['user'], row.get(field, 0.0)) for row in
+                                     Leaderboard.objects(**query).order_by(f'-{field}').limit(limit).only('user', field).as_pymongo()])
+
+
+class DailyBonusRepository:
+    async def claim(self, user, now: datetime):
+        # Claims today's bonus with one conditional update, so two taps (or two worker processes)
+        # cannot both claim it. Returns the new streak, or None if today's bonus was already claimed.
+        today = datetime(now.year, now.month, now.day)
+
+        def _claim():
+            try:
+                DailyBonus._get_collection().update_one(
+                    {'user': user.pk}, {'$setOnInsert': {'last_claimed': datetime.min, 'streak_count': 0}}, upsert=True)
+            except DuplicateKeyError:
+                pass # Created by a concurrent claim
+            previous = DailyBonus.objects(user=user, last_claimed__lt=today).modify(set__last_claimed=now)
+            if not previous:
+                return None
+            # The claim above is ours alone, so the streak can follow in a second write
+            streak = previous.streak_count + 1 if previous.last_claimed >= today - timedelta(days=1) else 1
+            DailyBonus.objects(id=previous.id).update_one(set__streak_count=streak)
+            return streak
+        return await run_db(_claim)
+
+
+class SettlementJobRepository:
+    async def open(self, game_round, winning_multipliers: dict):
+        # Create the round's job, or return the existing one unchanged: the result and
+        # multipliers of the first attempt are the ones every retry applies
+        now = datetime.utcnow()
+        await run_db(SettlementJob._get_collection().update_one, {'_id': game_round.id},
+                     {'$setOnInsert': {'game_type': game_round.game_type, 'round_id': game_round.round_id,
+                                       'result': game_round.result,
+                                       'winning_multipliers': {value: float(multiplier) for value, multiplier in winning_multipliers.items()},
+                                       'status': 'pending', 'settled_bets': 0, 'winners': 0, 'credited_users': 0,
+                                       'total_payout': 0.0, 'attempts': 0, 'created_at': now, 'updated_at': now}},
+                     upsert=True)
+        return await self.get(game_round.id)
+
+    async def get(self, pk):
+        return await run_db(lambda: SettlementJob.objects(id=pk).first())
+
+    async def started(self, round_pks) -> set:
+        # The rounds, of these, whose settlement has begun (a job exists from the first attempt on)
+        return await run_db(lambda: set(SettlementJob.objects(id__in=list(round_pks)).scalar('id')))
+
+    async def save(self, job):
+        job.updated_at = datetime.utcnow()
+        await run_db(job.save)
+        return job
+
+    async def unnotified(self, finished_since):
+        # Settled rounds whose result messages were interrupted, skipping any too old to be worth sending
+        return await run_db(lambda: list(SettlementJob.objects(status='done', notified_at=None, finished_at__gte=finished_since)))
+
+
+class BroadcastRepository:
+    async def create(self, **fields):
+        job = BroadcastJob(**fields)
+        await run_db(job.save)
+        return job
+
+    async def save(self, job):
+        job.updated_at = datetime.utcnow()
+        await run_db(job.save)
+        return job
+
+    async def unfinished(self):
+        return await run_db(lambda: list(BroadcastJob.objects(status='running')))
+
+
+class LeaseRepository:
+    async def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        # Take the lease if it is free or expired, or renew it if `owner` already holds it.
+        # Expiry is set and compared with MongoDB's clock ($$NOW, MongoDB 4.2+), so worker clocks
+        # do not have to agree. Another holder makes the upsert hit the unique _id.
+        def claim():
+            try:
+                Lease._get_collection().update_one(
+                    {'_id': name, '$or': [{'owner': owner}, {'$expr': {'$lte': ['$expires_at', '$$NOW']}}]},
+                    [{'$set': {'owner': owner, 'renewed_at': '$$NOW',
+                               'expires_at': {'$add': ['$$NOW', int(ttl * 1000)]}}}],
+                    upsert=True
+                )
+                return True
+            except DuplicateKeyError:
+                return False
+        return await run_db(claim)
+
+    async def release(self, name: str, owner: str):
+        # Expire our lease now so another process takes over without waiting out the TTL
+        await run_db(Lease._get_collection().update_one, {'_id': name, 'owner': owner},
+                     [{'$set': {'expires_at': '$$NOW'}}])
+
+    async def get(self, name: str):
+        return await run_db(lambda: Lease.objects(name=name).first())
+
+
+class UpdateClaimRepository:
+    async def claim(self, key: str, owner: str, ttl: float) -> bool:
+        # Insert-only claim on an update; False if another process (or an earlier delivery) has it
+        def insert():
+            try:
+                UpdateClaim._get_collection().insert_one(
+                    {'_id': key, 'owner': owner, 'expires_at': datetime.utcnow() + timedelta(seconds=ttl)})
+                return True
+            except DuplicateKeyError:
+                return False
+        return await run_db(insert)
+
+
+class AnalyticsRepository:
+    async def apply(self, updates: dict):
+        # updates maps bucket key -> {'granularity', 'bucket_start', 'expires_at', 'inc', 'active_users'};
+        # every bucket touched since the last flush is written in one unordered bulk write
+        if not updates:
+            return
+        now = datetime.utcnow()
+        ops = []
+        for key, update in updates.items():
+            operation = {'$set': {'granularity': update['granularity'], 'bucket_start': update['bucket_start'],
+                                  'expires_at': update['expires_at'], 'updated_at': now}}
+            if update['inc']:
+                operation['$inc'] = update['inc']
+            if update['active_users']:
+                operation['$addToSet'] = {'active_users': {'$each': list(update['active_users'])}}
+            ops.append(UpdateOne({'_id': key}, operation, upsert=True))
+        await run_db(AnalyticsBucket._get_collection().bulk_write, ops, ordered=False)
+
+    async def get(self, key: str):
+        return await run_db(lambda: AnalyticsBucket.objects(key=key).first())
+
+    async def days_since(self, since: datetime):
+        return await run_db(lambda: list(AnalyticsBucket.objects(granularity='day', bucket_start__gte=since)))
+
+    async def set_totals(self, counters: dict, games: dict):
+        now = datetime.utcnow()
+        await run_db(AnalyticsBucket._get_collection().update_one, {'_id': 'total'},
+                     {'$set': {'granularity': 'total', 'counters': counters, 'games': games,
+                               'updated_at': now, 'reconciled_at': now}}, upsert=True)
+
+
+class ConversationRepository:
+    async def get_active(self, user_id: int, ttl: float):
+        # Sliding expiry: reading a live session pushes its expiry forward
+        now = datetime.utcnow()
+        return await run_db(lambda: ConversationSession.objects(user_id=user_id, expires_at__gt=now).modify(
+            set__expires_at=now + timedelta(seconds=ttl), new=True))
+
+    async def put(self, user_id: int, flow: str, step: str, message_id, data: dict, ttl: float):
+        await run_db(lambda: ConversationSession.objects(user_id=user_id).update_one(
+            set__flow=flow, set__step=step, set__message_id=message_id, set__data=data,
+            set__expires_at=datetime.utcnow() + timedelta(seconds=ttl), upsert=True))
+
+    async def delete(self, user_id: int, flow: str = None):
+        query = {'user_id': user_id}
+        if flow:
+            query['flow'] = flow
+        return await run_db(lambda: ConversationSession.objects(**query).delete())
+
+    async def count_active(self) -> int:
+        now = datetime.utcnow()
+        return await run_db(lambda: ConversationSession.objects(expires_at__gt=now).count())
+
+
+users = UserRepository()
+rounds = RoundRepository()
+bets = BetRepository()
+transactions = TransactionRepository()
+leaderboards = LeaderboardRepository()
+daily_bonuses = DailyBonusRepository()
+broadcasts = BroadcastRepository()
+settlement_jobs = SettlementJobRepository()
+analytics_buckets = AnalyticsRepository()
+conversation_sessions = ConversationRepository()
+leases = LeaseRepository()
+update_claims = UpdateClaimRepository()
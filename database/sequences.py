@@ -0,0 +1,44 @@
+import asyncio
+from database.models import Counter, GameRound
+from database.repository import run_db
+from config import ROUND_ID_BLOCK_SIZE
+
+class RoundIdAllocator:
+    # Hands out round ids from a per-game counter document with an atomic find-and-increment.
+    # With block_size > 1 each reservation claims a whole block, so most rounds start with no
+    # database round trip at all. Ids left in a block when the process stops are skipped.
+    def __init__(self, block_size: int = ROUND_ID_BLOCK_SIZE):
+        self.block_size = max(1, block_size)
+        self._blocks = {} # game_type -> [next_id, last_id]
+        self._locks = {}
+        self._seeded = set()
+
+    def _counter_name(self, game_type: str) -> str:
+        return f"round_id:{game_type}"
+
+    def _seed(self, game_type: str):
+        # Make sure the counter starts above rounds created before it existed (once per process)
+        last_round = GameRound.objects(game_type=game_type).order_by('-round_id').only('round_id').first()
+        Counter.objects(name=self._counter_name(game_type)).update_one(
+            upsert=True, max__value=last_round.round_id if last_round else 0)
+
+    def _reserve(self, game_type: str):
+        if game_type not in self._seeded:
+            self._seed(game_type)
+            self._seeded.add(game_type)
+        counter = Counter.objects(name=self._counter_name(game_type)).modify(
+            upsert=True, new=True, inc__value=self.block_size)
+        return [counter.value - self.block_size + 1, counter.value]
+
+    async def next_id(self, game_type: str) -> int:
+        lock = self._locks.setdefault(game_type, asyncio.Lock())
+        async with lock:
+            block = self._blocks.get(game_type)
+            if not block or block[0] > block[1]:
+                block = await run_db(self._reserve, game_type)
+                self._blocks[game_type] = block
+            round_id = block[0]
+            block[0] += 1
+            return round_id
+
+round_ids = RoundIdAllocator()
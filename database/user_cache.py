@@ -0,0 +1,86 @@
+import time
+from collections import OrderedDict
+from config import USER_CACHE_TTL, USER_CACHE_MAX_SIZE
+
+class UserCache:
+    # Bounded LRU of User documents keyed by Telegram id, filled by UserRepository.
+    # Writes that return the updated document store it (write-through); writes that do not
+    # (bulk credits, flag updates) drop the entry. Every write also bumps User.version in MongoDB.
+    # An entry is served without a query for USER_CACHE_TTL seconds. After that it is revalidated
+    # with a covered-index probe of the version, so a write made by another worker process is
+    # picked up within the TTL, and only a changed user is fetched again.
+    def __init__(self, ttl: float = USER_CACHE_TTL, max_size: int = USER_CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict() # user_id -> (fresh_until, User)
+        self._user_ids_by_pk = {} # User ObjectId -> Telegram id, for writes keyed by pk
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.refetched = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def lookup(self, user_id: int):
+        # Returns (user, fresh); (None, False) if the user is not cached
+        entry = self._entries.get(user_id)
+        if not entry:
+            self.misses += 1
+            return None, False
+        self._entries.move_to_end(user_id)
+        fresh_until, user = entry
+        if time.monotonic() < fresh_until:
+            self.hits += 1
+            return user, True
+        return user, False
+
+    def renew(self, user_id: int):
+        # The version probe matched: serve the cached copy for another TTL
+        entry = self._entries.get(user_id)
+        if entry:
+            self._entries[user_id] = (time.monotonic() + self.ttl, entry[1])
+            self.revalidated += 1
+            self.hits += 1
+
+    def put(self, user, refetched: bool = False):
+        if user is None:
+            return
+        cached = self._entries.get(user.user_id)
+        if cached and (cached[1].version or 0) > (user.version or 0):
+            return # A newer copy is already cached; never go back in time
+        self._entries[user.user_id] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(user.user_id)
+        self._user_ids_by_pk[user.id] = user.user_id
+        if refetched:
+            self.refetched += 1
+        while len(self._entries) > self.max_size:
+            evicted_id, (_, evicted) = self._entries.popitem(last=False)
+            self._user_ids_by_pk.pop(evicted.id, None)
+            self.evictions += 1
+
+    def invalidate(self, user_id: int):
+        entry = self._entries.pop(user_id, None)
+        if entry:
+            self._user_ids_by_pk.pop(entry[1].id, None)
+            self.invalidations += 1
+
+    def invalidate_pks(self, pks):
+        for pk in pks:
+            user_id = self._user_ids_by_pk.get(pk)
+            if user_id is not None:
+                self.invalidate(user_id)
+
+    def metrics(self) -> dict:
+        lookups = self.hits + self.misses + self.refetched
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "refetched": self.refetched,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+user_cache = UserCache()
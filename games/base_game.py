@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+from database.models import GameRound
+from database.repository import rounds
+from database.sequences import round_ids
+from games.betting import place_bet_atomic
+from games.settlement import settle_round
+from games.round_state import round_table
+
+class BaseGame:
+    # Round lifecycle shared by every game: open a round, close it and draw the result, settle it,
+    # and take bets against the in-memory round table. A game sets game_type, payout_table (bet
+    # value -> payout multiplier) and its timings, and supplies draw(); games whose results are not
+    # simply a winning bet value also override winning_multipliers() and the manual result hooks.
+    game_type = None
+    payout_table = {}
+    round_model = GameRound
+    round_duration = 60 # seconds for a round
+    bet_cutoff = 10 # seconds before round ends to stop bets
+
+    def __init__(self):
+        self.current_round = None
+
+    # Game rules
+
+    def draw(self) -> str:
+        # A random result for a round
+        raise NotImplementedError
+
+    def winning_multipliers(self, result: str) -> dict:
+        # Winning bet value -> payout multiplier for a result; every other bet loses
+        return {result: self.payout_table.get(result, 0)}
+
+    def is_valid_result(self, result: str) -> bool:
+        # Whether an admin may set this as a round's result
+        return result in self.payout_table
+
+    def manual_result(self, result: str) -> str:
+        # The stored result for a result an admin set
+        return result
+
+    # Lifecycle
+
+    async def start_new_round(self):
+        new_round_id = await round_ids.next_id(self.game_type)
+        start_time = datetime.utcnow()
+        self.current_round = self.round_model(
+            round_id=new_round_id,
+            game_type=self.game_type,
+            start_time=start_time,
+            end_time=start_time + timedelta(seconds=self.round_duration)
+        )
+        await rounds.save(self.current_round)
+        round_table.open(self.game_type, self.current_round, self.bet_cutoff, self.payout_table)
+        print(f"Started new {self.game_type} round {new_round_id}")
+        return self.current_round
+
+    async def draw_result(self):
+        # Close betting and determine the result of the current round; returns the round to settle
+        game_round = self.current_round
+        if not game_round:
+            return None
+
+        # Stop accepting bets before the result is drawn
+        round_table.close(self.game_type)
+        # An admin may have set the result from another worker process
+        await rounds.load_manual_result(game_round)
+
+        # Random result, unless an admin has already set one for this round
+        if game_round.is_manual_result:
+            game_round.result = self.manual_result(game_round.result)
+        else:
+            game_round.result = self.draw()
+        await rounds.save(game_round)
+        print(f"Ended {self.game_type} round {game_round.round_id} with result {game_round.result}"
+              f"{' (manual)' if game_round.is_manual_result else ''}")
+        self.current_round = None # Reset for next round
+        return game_round
+
+    async def settle(self, game_round):
+        stats = await settle_round(game_round, self.winning_multipliers(game_round.result))
+        round_table.settled(self.game_type, game_round.round_id)
+        return stats
+
+    async def end_current_round(self):
+        # Round timing is normally driven by games.scheduler.RoundScheduler
+        game_round = await self.draw_result()
+        if game_round:
+            return await self.settle(game_round)
+
+    async def place_bet(self, user_id: int, round_id: int, bet_type: str, bet_value: str, amount: float):
+        # Validate against the in-memory round table instead of re-loading the round from the database
+        valid, msg = round_table.validate_bet(self.game_type, round_id, bet_value)
+        if not valid:
+            return False, msg
+
+        game_round = round_table.get(self.game_type).document
+        return await place_bet_atomic(user_id, game_round, bet_type, bet_value, amount)
@@ -0,0 +1,206 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from database.repository import bets, settlement_jobs
+from config import BET_BATCH_SIZE, BET_FLUSH_INTERVAL_MS
+
+class LateBetError(Exception):
+    # The bet was written after its round's settlement began, and has been withdrawn again
+    pass
+
+class BetUnconfirmedError(Exception):
+    # The write failed in a way that may have stored the bet, and checking it failed too
+    pass
+
+class BetIngestQueue:
+    # Micro-batched bet inserts.
+    # place_bet_atomic debits the user, then hands the Bet to submit() and waits: bets queued
+    # within BET_FLUSH_INTERVAL_MS of each other (or BET_BATCH_SIZE of them, whichever comes
+    # first) are written with one insert_many, and each caller is released only once its own
+    # bet is committed or has failed. Batches are written one at a time, so bets arriving during
+    # a write simply make the next batch bigger.
+    # Settlement calls drain(round) first: it waits for every bet on that round that has been
+    # admitted (debited, queued or being written) to finish, so no stake is missed.
+    # drain() only sees this process's bets. Other processes take bets by their own round table,
+    # so every written bet is also checked against the database: if its round's SettlementJob
+    # already exists, settlement may have passed it by, and the bet is withdrawn unless it was
+    # settled after all. The job is created before settlement reads any bet and the check runs
+    # after the bet is written, so every bet is either settled or withdrawn (and refunded).
+    # A write error other than a per-bet rejection may come after the server applied it, so
+    # the bets are not refunded blindly: each is withdrawn the same way, and only refunded if
+    # the withdraw succeeds or the bet was never stored.
+    def __init__(self, batch_size: int = BET_BATCH_SIZE, flush_interval_ms: int = BET_FLUSH_INTERVAL_MS):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self._queue = [] # (Bet, Future) in arrival order
+        self._pending = asyncio.Event() # Set while the queue is non-empty
+        self._full = asyncio.Event() # Set while at least one full batch is queued
+        self._active = {} # GameRound ObjectId -> bets admitted but not yet finished
+        self._settled = asyncio.Condition()
+        self._task = None
+        self.batches = 0
+        self.bets_written = 0
+        self.bets_failed = 0
+        self.bets_late = 0 # Written after settlement began, then withdrawn and refunded
+        self.bets_unconfirmed = 0 # Left unrefunded because their write could not be checked
+        self.max_batch = 0
+        self.flush_ms_total = 0.0
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Write whatever is queued, then stop the writer
+        if not self._task:
+            return
+        while self._queue:
+            await self._flush(self._take())
+        self._task.cancel()
+        self._task = None
+
+    @asynccontextmanager
+    async def admit(self, game_round):
+        # Wraps one bet placement from debit to commit, so drain() knows it is in progress
+        self._active[game_round.id] = self._active.get(game_round.id, 0) + 1
+        try:
+            yield
+        finally:
+            remaining = self._active[game_round.id] - 1
+            if remaining:
+                self._active[game_round.id] = remaining
+            else:
+                del self._active[game_round.id]
+                async with self._settled:
+                    self._settled.notify_all()
+
+    async def drain(self, game_round):
+        # Wait until no bet on this round is still being placed
+        async with self._settled:
+            await self._settled.wait_for(lambda: game_round.id not in self._active)
+
+    async def submit(self, bet):
+        # Returns once the bet is committed; raises if it could not be written
+        if not self._task:
+            # Writer not running (scripts, shutdown): write it directly
+            failed, unconfirmed = await self._write([bet])
+            if failed:
+                raise RuntimeError(failed[0])
+            if unconfirmed:
+                raise BetUnconfirmedError("Your bet could not be confirmed.")
+            if await self._withdraw_late([bet]):
+                raise LateBetError("Betting on this round has closed.")
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((bet, future))
+        self._pending.set()
+        if len(self._queue) >= self.batch_size:
+            self._full.set()
+        await future
+
+    def _take(self):
+        batch, self._queue = self._queue[:self.batch_size], self._queue[self.batch_size:]
+        if len(self._queue) < self.batch_size:
+            self._full.clear()
+        if not self._queue:
+            self._pending.clear()
+        return batch
+
+    async def _run(self):
+        while True:
+            await self._pending.wait()
+            if not self._full.is_set():
+                # Give the batch up to the flush interval to fill
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            await self._flush(self._take())
+
+    async def _flush(self, batch):
+        if not batch:
+            return
+        started = time.perf_counter()
+        failed, unconfirmed = await self._write([bet for bet, _ in batch])
+        written = [bet for index, (bet, _) in enumerate(batch) if index not in failed and index not in unconfirmed]
+        withdrawn = await self._withdraw_late(written)
+        self.flush_ms_total += (time.perf_counter() - started) * 1000
+        self.batches += 1
+        self.max_batch = max(self.max_batch, len(batch))
+        self.bets_written += len(written) - len(withdrawn)
+        self.bets_failed += len(failed)
+        self.bets_late += len(withdrawn)
+        self.bets_unconfirmed += len(unconfirmed)
+
+        for index, (bet, future) in enumerate(batch):
+            if future.done():
+                continue # Caller was cancelled
+            if index in failed:
+                future.set_exception(RuntimeError(failed[index]))
+            elif index in unconfirmed:
+                future.set_exception(BetUnconfirmedError("Your bet could not be confirmed."))
+            elif bet.id in withdrawn:
+                future.set_exception(LateBetError("Betting on this round has closed."))
+            else:
+                future.set_result(True)
+
+    async def _write(self, bet_list):
+        # Returns ({index: error} for bets not stored, {index} for bets whose outcome is unknown)
+        try:
+            return await bets.insert_many(bet_list), set()
+        except Exception as e:
+            print(f"Bet write failed, checking which bets were stored: {e}")
+            return await self._resolve_unknown(bet_list, str(e))
+
+    async def _resolve_unknown(self, bet_list, error: str):
+        # After an ambiguous write, take back every bet that settlement has not reached.
+        # A bet that was withdrawn, or never stored, fails and is refunded; a settled one stands.
+        failed, unconfirmed = {}, set()
+        for index, bet in enumerate(bet_list):
+            if bet.id is None:
+                failed[index] = error # Never sent
+                continue
+            try:
+                if await bets.withdraw_unsettled(bet) or not await bets.exists(bet):
+                    failed[index] = error
+            except Exception as e:
+                print(f"Could not tell whether bet {bet.id} was stored, leaving it unrefunded: {e}")
+                unconfirmed.add(index)
+        return failed, unconfirmed
+
+    async def _withdraw_late(self, written) -> set:
+        # Ids of the written bets that were withdrawn because their round's settlement had begun
+        if not written:
+            return set()
+        try:
+            started = await settlement_jobs.started({bet.game_round.id for bet in written})
+        except Exception as e:
+            # Unknown: treat every round as started, so an unseen bet is refunded rather than lost
+            print(f"Failed to check bets against settlement, withdrawing them: {e}")
+            started = {bet.game_round.id for bet in written}
+
+        withdrawn = set()
+        for bet in written:
+            if bet.game_round.id not in started:
+                continue
+            try:
+                if await bets.withdraw_unsettled(bet):
+                    withdrawn.add(bet.id)
+            except Exception as e:
+                print(f"Failed to withdraw late bet {bet.id}: {e}")
+        return withdrawn
+
+    def metrics(self) -> dict:
+        return {
+            "queued": len(self._queue),
+            "in_flight": sum(self._active.values()),
+            "batches": self.batches,
+            "bets_written": self.bets_written,
+            "bets_failed": self.bets_failed,
+            "bets_late": self.bets_late,
+            "bets_unconfirmed": self.bets_unconfirmed,
+            "avg_batch": self.bets_written / self.batches if self.batches else 0.0,
+            "max_batch": self.max_batch,
+            "avg_flush_ms": self.flush_ms_total / self.batches if self.batches else 0.0
+        }
+
+bet_ingest = BetIngestQueue()
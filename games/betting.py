@@ -0,0 +1,55 @@
+from database.models import Bet
+from database.repository import users
+from games.bet_ingest import bet_ingest, LateBetError, BetUnconfirmedError
+from games.round_state import round_table
+from admin.analytics import analytics
+
+async def place_bet_atomic(user_id: int, game_round, bet_type: str, bet_value: str, amount: float):
+    # Shared bet placement path for every game.
+    # A successful bet costs one conditional debit plus its share of one batched insert.
+    if amount <= 0:
+        return False, "Invalid amount. Please enter a positive number."
+
+    # Round trip 1: debit only if the balance covers the stake. The filter and the $inc are
+    # applied atomically by MongoDB, so concurrent bets from the same user can never overdraw.
+    async with bet_ingest.admit(game_round):
+        user = await users.debit(user_id, amount, allow_banned=False)
+        if not user:
+            # Only reached on the failure path, to give the user an accurate message
+            user = await users.get(user_id)
+            if not user:
+                return False, "User not found."
+            if user.is_banned:
+                return False, "Your account has been banned."
+            return False, "Insufficient balance."
+
+        # Round trip 2: the insert, shared with every other bet in the same micro-batch.
+        # The user is only told the bet is placed once its batch has been committed.
+        bet = Bet(
+            user=user,
+            game_round=game_round,
+            bet_type=bet_type,
+            bet_value=bet_value,
+            amount=amount
+        )
+        try:
+            await bet_ingest.submit(bet)
+        except LateBetError as e:
+            # Another process closed and began settling the round before this bet was written
+            await users.credit_by_pk(user.id, amount)
+            print(f"Late bet for user {user_id} on {game_round.game_type} round {game_round.round_id}, stake refunded")
+            return False, str(e)
+        except BetUnconfirmedError as e:
+            # The bet may have been stored, so the stake is kept until someone checks
+            print(f"Unconfirmed bet for user {user_id} on {game_round.game_type} round {game_round.round_id}, "
+                  f"stake of {amount} not refunded")
+            return False, f"{e} Please check your balance before betting again."
+        except Exception as e:
+            # Give the stake back if the bet could not be recorded
+            await users.credit_by_pk(user.id, amount)
+            print(f"Failed to record bet for user {user_id}, stake refunded: {e}")
+            return False, "Could not place bet. Please try again."
+
+    round_table.record_bet(game_round.game_type, game_round.round_id, user_id, bet_value, amount)
+    analytics.record_bet(user_id, game_round.game_type, amount)
+    return True, "Bet placed successfully."
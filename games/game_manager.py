@@ -1,8 +1,21 @@
 from games.color_prediction import ColorPredictionGame
 from games.parity_evens import ParityEvensGame
-from gamesfrom .number_prediction import NumberPredictionGame
-from .wheel_spin import WheelSpinGame
-from .lucky_7 import Lucky7Game
+from games.number_prediction import NumberPredictionGame
+from games.wheel_spin import WheelSpinGame
+from games.lucky_7 import Lucky7Game
+from games.round_state import round_table
+from games.scheduler import RoundScheduler
+from games.round_sync import RoundSync
+from games.leadership import leadership
+
+# Short names accepted by /bet, e.g. `/bet color red 10`
+GAME_ALIASES = {
+    "color": "color_prediction",
+    "parity": "parity_evens",
+    "number": "number_prediction",
+    "wheel": "wheel_spin",
+    "lucky": "lucky_7"
+}
 
 class GameManager:
     def __init__(self):
@@ -13,27 +26,61 @@ class GameManager:
             "wheel_spin": WheelSpinGame(),
             "lucky_7": Lucky7Game()
         }
+        # In-memory authoritative round state for every game, shared by all managers
+        self.rounds = round_table
+        self.scheduler = RoundScheduler(self.games)
+        self.sync = RoundSync(self.games)
+
+    def resolve_game_type(self, game_type: str) -> str:
+        return GAME_ALIASES.get(game_type, game_type)
+
+    async def start(self):
+        # Follow the shared rounds until this process is elected (see games.leadership)
+        await self.sync.start()
 
-    async def start_all_games(self):
-        await self.color_prediction_game.start_new_round()
-        await self.parity_evens_game.start_new_round()
-        # Start other games here
+    async def lead(self):
+        # One scheduler, in the lease holder, opens, closes, settles and rolls over every game's rounds
+        await self.sync.stop()
+        await self.scheduler.start()
+
+    async def step_down(self):
+        await self.scheduler.stop()
+        await self.sync.start()
+
+    async def stop(self):
+        await self.scheduler.stop()
+        await self.sync.stop()
 
     async def get_game_instance(self, game_type: str):
-        if game_type == 'color_prediction':
-            return self.color_prediction_game
-        elif game_type == 'parity_evens':
-            return self.parity_evens_game
-        # Add other game types here
-        return None
+        return self.games.get(self.resolve_game_type(game_type))
+
+    def get_round(self, game_type: str):
+        return self.rounds.get(self.resolve_game_type(game_type))
+
+    def validate_bet(self, game_type: str, round_id: int, bet_value: str):
+        # Zero-query bet validation against the round table
+        return self.rounds.validate_bet(self.resolve_game_type(game_type), round_id, bet_value)
+
+    def get_exposure(self, game_type: str):
+        # Live per-outcome liability of the game's current round, or None if no round is running
+        state = self.get_round(game_type)
+        return state.exposure_report() if state else None
+
+    def get_all_exposure(self):
+        return [state.exposure_report() for state in self.rounds.all()]
 
     async def get_current_round_info(self, game_type: str):
-        game = await self.get_game_instance(game_type)
-        if game and game.current_round:
+        state = self.get_round(game_type)
+        if state and state.status == 'open':
             return {
-                "round_id": game.current_round.round_id,
-                "start_time": game.current_round.start_time,
-                "end_time": game.current_round.end_time,
-                "game_type": game.current_round.game_type
+                "round_id": state.round_id,
+                "start_time": state.opens_at,
+                "end_time": state.closes_at,
+                "game_type": state.game_type,
+                "payout_table": state.payout_table
             }
-        return None
\ No newline at end of file
+        return None
+
+game_manager = GameManager()
+leadership.on_lead(game_manager.lead)
+leadership.on_step_down(game_manager.step_down)
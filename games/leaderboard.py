@@ -0,0 +1,90 @@
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime
+from database.repository import leaderboards, users
+from config import LEADERBOARD_SIZE, LEADERBOARD_REFRESH_INTERVAL, LEADERBOARD_NAME_TTL, LEADERBOARD_NAME_CACHE_SIZE
+
+PERIODS = ('weekly', 'monthly', 'all_time')
+
+def current_buckets(now: datetime = None) -> dict:
+    # Time bucket each period's totals belong to; a new bucket starts the window from zero
+    now = now or datetime.utcnow()
+    year, week, _ = now.isocalendar()
+    return {
+        'weekly': f"{year}-W{week:02d}",
+        'monthly': f"{now.year}-{now.month:02d}",
+        'all_time': 'all'
+    }
+
+class LeaderboardService:
+    # Materialized leaderboard.
+    # Earnings are added incrementally as rounds settle, and the top entries of every period
+    # are kept in memory with display names already attached, so serving a leaderboard page
+    # is a dictionary read. Names are looked up in one batched query, only for users that
+    # enter a top list without a cached name. Settlement only runs in the scheduler process, so
+    # every process also reloads the lists every LEADERBOARD_REFRESH_INTERVAL seconds.
+    def __init__(self, size: int = LEADERBOARD_SIZE):
+        self.size = size
+        self._top = {period: [] for period in PERIODS} # period -> [(display_name, earnings)]
+        self._buckets = {} # period -> bucket the cached top list was built for
+        # User ObjectId -> (fresh_until, display name), least recently shown first. Bounded, and
+        # re-read after LEADERBOARD_NAME_TTL seconds so renamed users show their new name.
+        self._names = OrderedDict()
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    async def start(self):
+        await self.refresh()
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(LEADERBOARD_REFRESH_INTERVAL)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Failed to refresh the leaderboard: {e}")
+
+    async def record_payouts(self, settlement_id, payouts_by_user_pk: dict):
+        # Called by settlement with {User ObjectId: amount won in the round}; safe to repeat
+        if not payouts_by_user_pk:
+            return
+        buckets = current_buckets()
+        await leaderboards.add_earnings(settlement_id, payouts_by_user_pk, buckets['weekly'], buckets['monthly'])
+        await self.refresh()
+
+    async def refresh(self):
+        async with self._lock:
+            buckets = current_buckets()
+            rows = {period: await leaderboards.top(period, buckets[period], self.size) for period in PERIODS}
+
+            now = time.monotonic()
+            shown = {pk for period_rows in rows.values() for pk, _ in period_rows}
+            missing = {pk for pk in shown if pk not in self._names or self._names[pk][0] <= now}
+            if missing:
+                found = await users.display_names(missing)
+                for pk in missing:
+                    self._names[pk] = (now + LEADERBOARD_NAME_TTL, found.get(pk, 'Unknown'))
+            for pk in shown:
+                self._names.move_to_end(pk)
+            while len(self._names) > LEADERBOARD_NAME_CACHE_SIZE:
+                self._names.popitem(last=False)
+
+            for period, period_rows in rows.items():
+                self._top[period] = [(self._names.get(pk, (0, 'Unknown'))[1], earnings) for pk, earnings in period_rows]
+                self._buckets[period] = buckets[period]
+
+    def get_top(self, period: str):
+        if period not in self._top:
+            return []
+        if self._buckets.get(period) != current_buckets()[period]:
+            return [] # The window rolled over since the last refresh; nobody has earned anything in it yet
+        return self._top[period]
+
+leaderboard_service = LeaderboardService()
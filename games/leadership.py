@@ -0,0 +1,139 @@
+import asyncio
+import os
+import socket
+import time
+from database.repository import leases
+from config import WORKER_ID, LEASE_TTL, LEASE_HEARTBEAT
+
+SCHEDULER_LEASE = 'scheduler'
+
+class Leadership:
+    # Elects the one worker process that runs rounds, settlement and other background jobs.
+    # Every process tries to take the scheduler lease each LEASE_HEARTBEAT seconds and the holder
+    # renews it. Taking it runs the on_lead listeners; while_leading listeners then run after the
+    # promotion and on later renewals. Listeners run in a task of their own, one run at a time, so
+    # slow recovery never holds up a renewal. The leader steps down (on_step_down listeners) when
+    # another process holds the lease, or when a renewal failed and the next one could come too
+    # late to be sure the lease is still ours. If the leader dies, another process takes over
+    # within LEASE_TTL. Work that must not overlap with another leader checks holds_lease() first.
+    def __init__(self, name: str = SCHEDULER_LEASE):
+        self.name = name
+        self.worker_id = WORKER_ID or f"{socket.gethostname()}:{os.getpid()}"
+        self.is_leader = False
+        self._valid_until = 0.0 # Monotonic time until which the lease is certainly ours
+        self._lead_listeners = []
+        self._step_down_listeners = []
+        self._leading_listeners = []
+        self._task = None
+        self._listener_task = None # The on_lead or while_leading run in progress
+        self.promotions = 0
+        self.step_downs = 0
+        self.renew_failures = 0
+
+    def on_lead(self, listener):
+        self._lead_listeners.append(listener)
+
+    def on_step_down(self, listener):
+        self._step_down_listeners.append(listener)
+
+    def while_leading(self, listener):
+        self._leading_listeners.append(listener)
+
+    async def start(self):
+        # Contend once straight away and, if elected, let the promotion finish before returning;
+        # renewals already run meanwhile
+        await self._beat()
+        self._task = asyncio.create_task(self._run())
+        if self._listener_task:
+            await asyncio.gather(self._listener_task, return_exceptions=True)
+
+    async def stop(self):
+        # Hand over: stop leading, then expire the lease so a follower takes over at once
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self.is_leader:
+            await self._step_down()
+            await self._release()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(LEASE_HEARTBEAT)
+            await self._beat()
+
+    async def _beat(self):
+        started = time.monotonic()
+        try:
+            held = await leases.acquire(self.name, self.worker_id, LEASE_TTL)
+        except Exception as e:
+            self.renew_failures += 1
+            print(f"Failed to renew the {self.name} lease: {e}")
+            held = None # Unknown; the lease may or may not still be ours
+
+        if held:
+            self._valid_until = started + LEASE_TTL
+            if not self.is_leader:
+                print(f"Worker {self.worker_id} took the {self.name} lease")
+                self.is_leader = True
+                self.promotions += 1
+                self._run_listeners(self._lead())
+            elif not self._listeners_running():
+                self._run_listeners(self._notify(self._leading_listeners))
+        elif self.is_leader and (held is False or time.monotonic() + LEASE_HEARTBEAT >= self._valid_until):
+            print(f"Worker {self.worker_id} lost the {self.name} lease")
+            await self._step_down()
+
+    def holds_lease(self) -> bool:
+        # The lease is certainly ours right now, not merely not yet known to be lost
+        return self.is_leader and time.monotonic() < self._valid_until
+
+    def _listeners_running(self) -> bool:
+        return self._listener_task is not None and not self._listener_task.done()
+
+    def _run_listeners(self, coroutine):
+        self._listener_task = asyncio.create_task(coroutine)
+
+    async def _lead(self):
+        if not await self._notify(self._lead_listeners):
+            # Leading half-started is worse than not leading: let another process try
+            await self._step_down()
+            await self._release()
+            return
+        await self._notify(self._leading_listeners)
+
+    async def _step_down(self):
+        self.is_leader = False
+        self.step_downs += 1
+        # Stop any promotion or while_leading run still going, unless that is what is stepping down
+        task = self._listener_task
+        if task and not task.done() and task is not asyncio.current_task():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        await self._notify(self._step_down_listeners)
+
+    async def _release(self):
+        try:
+            await leases.release(self.name, self.worker_id)
+        except Exception as e:
+            print(f"Failed to release the {self.name} lease: {e}") # It expires on its own
+
+    async def _notify(self, listeners) -> bool:
+        ok = True
+        for listener in listeners:
+            try:
+                await listener()
+            except Exception as e:
+                ok = False
+                print(f"Leadership listener {getattr(listener, '__name__', listener)} failed: {e}")
+        return ok
+
+    def metrics(self) -> dict:
+        return {
+            "worker_id": self.worker_id,
+            "is_leader": self.is_leader,
+            "promotions": self.promotions,
+            "step_downs": self.step_downs,
+            "renew_failures": self.renew_failures
+        }
+
+leadership = Leadership()
@@ -1,109 +1,29 @@
 import asyncio
-from datetime import datetime, timedelta
-from database.models import GameRound, Bet, User
-
-class ParityEvensGame:
-    def __init__(self):
-        self.current_round = None
-        self.round_duration = 180 # seconds (3 minutes)
-        self.countdown_task = None
-
-    async def start_new_round(self):
-        if self.current_round and self.current_round.start_time + timedelta(seconds=self.round_duration) > datetime.utcnow():
-            # Round already in progress
-            return
-
-        last_round = GameRound.objects(game_type='parity_evens').order_by('-round_id').first()
-        new_round_id = (last_round.round_id + 1) if last_round else 1
-
-        self.current_round = GameRound(
-            round_id=new_round_id,
-            game_type='parity_evens',
-            start_time=datetime.utcnow(),
-            end_time=datetime.utcnow() + timedelta(seconds=self.round_duration)
-        )
-        self.current_round.save()
-        print(f"Started new Parity/Evens Round: {new_round_id}")
-
-        # Start countdown for the round
-        self.countdown_task = asyncio.create_task(self._countdown_timer())
-
-    async def _countdown_timer(self):
-        await asyncio.sleep(self.round_duration)
-        await self.end_current_round()
-
-    async def end_current_round(self):
-        if not self.current_round:
-            return
-
-        # Determine result (random number 0-9)
-        import random
-        result_number = random.randint(0, 9)
-        self.current_round.result = str(result_number) # Store as string
-        self.current_round.save()
-
-        print(f"Round {self.current_round.round_id} ended. Result: {self.current_round.result}")
-
-        await self._settle_bets(self.current_round)
-        self.current_round = None # Reset for next round
-
-    async def _settle_bets(self, game_round):
-        bets = Bet.objects(game_round=game_round, is_settled=False)
-        result_number = int(game_round.result)
-        
-        for bet in bets:
-            user = bet.user
-            payout_multiplier = 0
-
-            if bet.bet_value == 'even' and result_number % 2 == 0:
-                payout_multiplier = 2
-            elif bet.bet_value == 'odd' and result_number % 2 != 0:
-                payout_multiplier = 2
-            elif bet.bet_value == str(result_number): # Direct number prediction
-                payout_multiplier = 10 # Example payout for direct number
-
-            if payout_multiplier > 0:
-                payout_amount = bet.amount * payout_multiplier
-                user.balance += payout_amount
-                bet.payout = payout_amount
-                print(f"User {user.user_id} won {payout_amount} in round {game_round.round_id}")
-            else:
-                print(f"User {user.user_id} lost {bet.amount} in round {game_round.round_id}")
-
-            bet.is_settled = True
-            bet.save()
-            user.save()
-
-    async def place_bet(self, user_id: int, round_id: int, bet_type: str, bet_value: str, amount: float):
-        user = User.objects(user_id=user_id).first()
-        game_round = GameRound.objects(round_id=round_id, game_type='parity_evens').first()
-
-        if not user or not game_round:
-            return False, "User or round not found."
-
-        if user.balance < amount:
-            return False, "Insufficient balance."
-
-        if game_round.end_time < datetime.utcnow():
-            return False, "Betting for this round has closed."
-
-        # Validate bet_value for parity/evens or number prediction
-        valid_bet_values = ['even', 'odd'] + [str(i) for i in range(10)]
-        if bet_value not in valid_bet_values:
-            return False, "Invalid bet value."
-
-        user.balance -= amount
-        user.save()
-
-        bet = Bet(
-            user=user,
-            game_round=game_round,
-            bet_type=bet_type,
-            bet_value=bet_value,
-            amount=amount
-        )
-        bet.save()
-        return True, "Bet placed successfully."
+import random
+from database.models import User
+from games.base_game import BaseGame
+
+class ParityEvensGame(BaseGame):
+    game_type = 'parity_evens'
+    # Payout multiplier per bet value: x2 for even/odd, x10 for a direct number prediction
+    payout_table = dict({'even': 2, 'odd': 2}, **{str(i): 10 for i in range(10)})
+    round_duration = 180 # seconds (3 minutes)
+    bet_cutoff = 0 # Bets are accepted until the round ends
+
+    def draw(self) -> str:
+        return str(random.randint(0, 9)) # Store as string
+
+    def is_valid_result(self, result: str) -> bool:
+        return result.isdigit() and 0 <= int(result) <= 9
+
+    def winning_multipliers(self, result: str) -> dict:
+        # A number pays its own bets and its parity
+        result_number = int(result)
+        parity = 'even' if result_number % 2 == 0 else 'odd'
+        return {
+            parity: self.payout_table[parity],
+            str(result_number): self.payout_table[str(result_number)]
+        }
 
 # Example usage (for testing)
 async def main():
@@ -121,7 +41,7 @@ async def main():
     success, message = await game.place_bet(user.user_id, game.current_round.round_id, 'parity', 'even', 10.0)
     print(f"Bet status: {success}, Message: {message}")
 
-    await asyncio.sleep(game.round_duration) # Wait for round to end
+    await game.end_current_round() # In the bot this is driven by the round scheduler
 
     from mongoengine import disconnect
     disconnect()
@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+
+class RoundState:
+    # Authoritative in-memory view of a game's current round.
+    # Bets and game menus are validated against this; MongoDB is only the persistence backstop.
+    def __init__(self, game_type: str, document, bet_cutoff: int, payout_table: dict):
+        self.game_type = game_type
+        self.document = document # The persisted GameRound, used as the Bet reference
+        self.round_id = document.round_id
+        self.opens_at = document.start_time
+        self.closes_at = document.end_time - timedelta(seconds=bet_cutoff) # Betting deadline
+        self.ends_at = document.end_time # Result deadline
+        self.payout_table = payout_table
+        self.status = 'open' # 'open' -> 'closed' -> 'settled'
+        # Live house liability: bet_value -> {stake, bets, bettors, potential_payout}
+        self.exposure = {}
+        self._bettors = {} # bet_value -> set of Telegram ids that bet on it
+        self.total_stake = 0.0
+        self.total_bets = 0
+
+    def seconds_left(self, now: datetime = None) -> int:
+        now = now or datetime.utcnow()
+        return max(0, int((self.closes_at - now).total_seconds()))
+
+    def accepts_bets(self, now: datetime = None) -> bool:
+        now = now or datetime.utcnow()
+        return self.status == 'open' and now < self.closes_at
+
+    def validate_bet(self, round_id: int, bet_value: str):
+        if round_id != self.round_id or not self.accepts_bets():
+            return False, "Betting for this round has closed."
+        if bet_value not in self.payout_table:
+            return False, "Invalid bet value."
+        return True, None
+
+    def record_bet(self, user_id: int, bet_value: str, amount: float):
+        # O(1) running totals for one accepted bet
+        outcome = self.exposure.get(bet_value)
+        if outcome is None:
+            outcome = self.exposure[bet_value] = {'stake': 0.0, 'bets': 0, 'bettors': 0, 'potential_payout': 0.0}
+            self._bettors[bet_value] = set()
+        bettors = self._bettors[bet_value]
+        if user_id not in bettors:
+            bettors.add(user_id)
+            outcome['bettors'] += 1
+        outcome['stake'] += amount
+        outcome['bets'] += 1
+        outcome['potential_payout'] += amount * self.payout_table.get(bet_value, 0)
+        self.total_stake += amount
+        self.total_bets += 1
+
+    def exposure_report(self) -> dict:
+        # Outcomes ordered by what the house would pay if they hit, largest first.
+        # house_net is the round's stakes minus that payout; negative means the house loses.
+        # Note that some results pay more than one outcome (a parity_evens number also pays its parity).
+        outcomes = sorted(
+            ({'bet_value': bet_value, **values, 'house_net': self.total_stake - values['potential_payout']}
+             for bet_value, values in self.exposure.items()),
+            key=lambda outcome: outcome['potential_payout'], reverse=True
+        )
+        return {
+            "game_type": self.game_type,
+            "round_id": self.round_id,
+            "status": self.status,
+            "total_stake": self.total_stake,
+            "total_bets": self.total_bets,
+            "outcomes": outcomes
+        }
+
+
+class RoundTable:
+    # game_type -> RoundState of the round currently running for that game
+    def __init__(self):
+        self._rounds = {}
+        self._close_listeners = [] # callables(game_type, round_id), run when a round stops taking bets
+
+    def on_close(self, listener):
+        self._close_listeners.append(listener)
+
+    def open(self, game_type: str, document, bet_cutoff: int, payout_table: dict) -> RoundState:
+        state = RoundState(game_type, document, bet_cutoff, payout_table)
+        self._rounds[game_type] = state
+        return state
+
+    def close(self, game_type: str):
+        state = self._rounds.get(game_type)
+        if state and state.status == 'open':
+            state.status = 'closed'
+            for listener in self._close_listeners:
+                listener(game_type, state.round_id)
+        return state
+
+    def settled(self, game_type: str, round_id: int):
+        state = self._rounds.get(game_type)
+        if state and state.round_id == round_id:
+            state.status = 'settled'
+
+    def get(self, game_type: str):
+        return self._rounds.get(game_type)
+
+    def record_bet(self, game_type: str, round_id: int, user_id: int, bet_value: str, amount: float):
+        state = self._rounds.get(game_type)
+        if state and state.round_id == round_id:
+            state.record_bet(user_id, bet_value, amount)
+
+    def validate_bet(self, game_type: str, round_id: int, bet_value: str):
+        state = self._rounds.get(game_type)
+        if not state:
+            return False, "No active round for this game. Please wait for the next round."
+        return state.validate_bet(round_id, bet_value)
+
+    def all(self):
+        return list(self._rounds.values())
+
+round_table = RoundTable()
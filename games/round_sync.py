@@ -0,0 +1,59 @@
+import asyncio
+from datetime import datetime
+from database.repository import rounds
+from games.round_state import round_table
+from config import ROUND_SYNC_INTERVAL
+
+class RoundSync:
+    # Mirrors the scheduler process's rounds into this process's round table.
+    # Worker processes that do not hold the scheduler lease read the latest round of every game
+    # each ROUND_SYNC_INTERVAL seconds (one indexed query per game). A new round is opened in the
+    # round table, replacing and closing the previous one, and a round past its betting deadline is
+    # closed, which fires the same close listeners as in the scheduler process. Bets are validated
+    # against the mirrored round exactly as they are against the scheduler's own.
+    def __init__(self, games: dict):
+        self.games = games
+        self._task = None
+        self.syncs = 0
+        self.failures = 0
+
+    async def start(self):
+        if self._task:
+            return
+        try:
+            await self.sync()
+        except Exception as e:
+            self.failures += 1
+            print(f"Round sync failed: {e}")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(ROUND_SYNC_INTERVAL)
+            try:
+                await self.sync()
+            except Exception as e:
+                self.failures += 1
+                print(f"Round sync failed: {e}")
+
+    async def sync(self):
+        for game_type, game in self.games.items():
+            game_round = await rounds.latest(game_type)
+            if not game_round:
+                continue
+            now = datetime.utcnow()
+            state = round_table.get(game_type)
+            if not state or state.round_id != game_round.round_id:
+                round_table.close(game_type)
+                if not game_round.is_settled and game_round.end_time > now:
+                    round_table.open(game_type, game_round, game.bet_cutoff, game.payout_table)
+            elif state.status == 'open' and now >= state.closes_at:
+                round_table.close(game_type)
+            elif game_round.is_settled:
+                round_table.settled(game_type, game_round.round_id)
+        self.syncs += 1
@@ -0,0 +1,182 @@
+import asyncio
+import heapq
+import itertools
+import time
+from datetime import datetime
+from database.repository import rounds
+from games.round_state import round_table
+from games.settlement import recover_unsettled
+from games.leadership import leadership
+from config import SCHEDULER_SLIP_WARNING_MS, SETTLEMENT_GRACE
+
+class RoundScheduler:
+    # Drives every registered game from one min-heap of round deadlines.
+    # Each heap entry is (monotonic_deadline, seq, action, game_type, round_id) where action is
+    # 'close' (stop taking bets), 'end' (draw the result, open the next round, settle in the
+    # background) or 'open' (retry opening a round after a failure). Each tick only pops the
+    # earliest entry, so the overhead per tick is O(log n) in the number of games. Nothing is
+    # fired unless this process certainly holds the scheduler lease (games.leadership); an entry
+    # due while that is in doubt is retried shortly, and is dropped if this process steps down.
+    RETRY_DELAY = 5 # seconds before retrying a failed round open, and before the first settlement retry
+    SETTLE_RETRY_MAX = 300 # cap on the doubling delay between settlement retries
+
+    def __init__(self, games: dict):
+        self.games = games
+        self._heap = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._settle_locks = {}
+        self._settle_tasks = set()
+        self._stopping = asyncio.Event() # Wakes settlement retries so stop() does not wait them out
+        self.slip_stats = {} # game_type -> {'last_ms', 'max_ms', 'total_ms', 'count'}
+
+    def _push(self, delay: float, action: str, game_type: str, round_id: int = None):
+        heapq.heappush(self._heap, (time.monotonic() + max(0.0, delay), next(self._seq), action, game_type, round_id))
+        self._wakeup.set()
+
+    def _schedule_round(self, state):
+        now = datetime.utcnow()
+        if state.closes_at < state.ends_at:
+            self._push((state.closes_at - now).total_seconds(), 'close', state.game_type, state.round_id)
+        self._push((state.ends_at - now).total_seconds(), 'end', state.game_type, state.round_id)
+
+    async def _open(self, game_type: str):
+        try:
+            await self.games[game_type].start_new_round()
+        except Exception as e:
+            print(f"Failed to open a {game_type} round, retrying in {self.RETRY_DELAY}s: {e}")
+            self._push(self.RETRY_DELAY, 'open', game_type)
+            return
+        self._schedule_round(round_table.get(game_type))
+
+    async def _adopt(self, game_type: str) -> bool:
+        # Take over a round the previous scheduler process opened and that is still running
+        game = self.games[game_type]
+        game_round = await rounds.latest(game_type)
+        if not game_round or game_round.is_settled or game_round.end_time <= datetime.utcnow():
+            return False
+        if game_round.result and not game_round.is_manual_result:
+            return False # Already drawn
+        game.current_round = game_round
+        state = round_table.open(game_type, game_round, game.bet_cutoff, game.payout_table)
+        if not state.accepts_bets():
+            round_table.close(game_type) # Past its betting deadline, waiting for the draw
+        self._schedule_round(state)
+        print(f"Adopted {game_type} round {game_round.round_id}")
+        return True
+
+    async def start(self):
+        # Finish whatever the previous process left unsettled, then carry on with the rounds it
+        # left running and open new ones for the rest
+        self._heap = []
+        self._stopping.clear()
+        await recover_unsettled(self.games)
+        for game_type in self.games:
+            if not await self._adopt(game_type):
+                await self._open(game_type)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        self._stopping.set()
+        if self._settle_tasks:
+            await asyncio.gather(*self._settle_tasks, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            delay = self._heap[0][0] - time.monotonic()
+            if delay > 0:
+                # Sleep until the earliest deadline, or until an earlier one is pushed
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            deadline, _, action, game_type, round_id = heapq.heappop(self._heap)
+            if not leadership.holds_lease():
+                self._push(self.RETRY_DELAY, action, game_type, round_id)
+                continue
+            self._record_slip(game_type, action, (time.monotonic() - deadline) * 1000)
+            try:
+                await self._fire(action, game_type, round_id)
+            except Exception as e:
+                print(f"Scheduler failed to {action} {game_type} round {round_id}: {e}")
+
+    async def _fire(self, action: str, game_type: str, round_id: int):
+        if action == 'open':
+            await self._open(game_type)
+            return
+
+        state = round_table.get(game_type)
+        if not state or state.round_id != round_id:
+            return # Stale entry, e.g. the round was ended manually
+
+        if action == 'close':
+            round_table.close(game_type)
+        elif action == 'end':
+            game = self.games[game_type]
+            game_round = None
+            try:
+                game_round = await game.draw_result()
+            finally:
+                # Roll over straight away; settlement of the old round must not delay the next one
+                await self._open(game_type)
+            if game_round:
+                task = asyncio.create_task(self._settle(game, game_round))
+                self._settle_tasks.add(task)
+                task.add_done_callback(self._settle_tasks.discard)
+
+    async def _settle(self, game, game_round):
+        # Let other worker processes write the bets they accepted just before the close; any that
+        # come later are refunded by their process rather than settled
+        await asyncio.sleep(SETTLEMENT_GRACE)
+        # Rounds of the same game settle one at a time, in order. A failed settlement is retried
+        # with a doubling delay; the lock is not held while it waits, so later rounds still settle.
+        lock = self._settle_locks.setdefault(game.game_type, asyncio.Lock())
+        delay = self.RETRY_DELAY
+        while True:
+            async with lock:
+                if not leadership.holds_lease():
+                    # The next leader settles it (recover_unsettled)
+                    print(f"Not settling {game.game_type} round {game_round.round_id}: the scheduler lease is not held")
+                    return
+                try:
+                    await game.settle(game_round)
+                    return
+                except Exception as e:
+                    print(f"Failed to settle {game.game_type} round {game_round.round_id}, retrying in {delay}s: {e}")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=delay)
+                return # Shutting down; recover_unsettled finishes it on the next start
+            except asyncio.TimeoutError:
+                pass
+            delay = min(delay * 2, self.SETTLE_RETRY_MAX)
+
+    def _record_slip(self, game_type: str, action: str, slip_ms: float):
+        stats = self.slip_stats.setdefault(game_type, {'last_ms': 0.0, 'max_ms': 0.0, 'total_ms': 0.0, 'count': 0})
+        stats['last_ms'] = slip_ms
+        stats['max_ms'] = max(stats['max_ms'], slip_ms)
+        stats['total_ms'] += slip_ms
+        stats['count'] += 1
+        if slip_ms > SCHEDULER_SLIP_WARNING_MS:
+            print(f"Scheduler: {game_type} {action} deadline slipped by {slip_ms:.0f} ms")
+
+    def get_slip_report(self):
+        return {
+            game_type: {
+                "last_ms": stats['last_ms'],
+                "max_ms": stats['max_ms'],
+                "avg_ms": stats['total_ms'] / stats['count'] if stats['count'] else 0.0
+            }
+            for game_type, stats in self.slip_stats.items()
+        }
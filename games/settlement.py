@@ -0,0 +1,152 @@
+import time
+import asyncio
+from datetime import datetime
+from database.repository import bets, users, rounds, settlement_jobs
+from games.leaderboard import leaderboard_service
+from games.bet_ingest import bet_ingest
+from admin.analytics import analytics
+from config import SETTLEMENT_CREDIT_CHUNK
+
+_job_locks = {} # SettlementJob id -> asyncio.Lock, so one coroutine at a time advances a job here
+_settled_listeners = [] # callables(game_round, job), run once when a round's settlement completes
+
+def on_settled(listener):
+    _settled_listeners.append(listener)
+
+async def settle_round(game_round, winning_multipliers: dict):
+    # Common settlement engine for every game.
+    # winning_multipliers maps each winning bet_value to its payout multiplier; every other
+    # bet in the round loses. The round must already be closed to new bets.
+    # Settlement is a durable SettlementJob keyed by the round. Its stages checkpoint in MongoDB
+    # and are each safe to repeat, so calling this again for the same round (a retry, the
+    # startup recovery pass, a manual result) finishes the job without paying anyone twice.
+    started = time.perf_counter()
+
+    # Bets accepted just before the close may still be waiting in the ingestion queue
+    await bet_ingest.drain(game_round)
+
+    job = await settlement_jobs.open(game_round, winning_multipliers)
+    lock = _job_locks.setdefault(job.id, asyncio.Lock())
+    async with lock:
+        try:
+            job = await settlement_jobs.get(job.id) # Another caller may have advanced it meanwhile
+            await _run_job(job, game_round)
+        finally:
+            _job_locks.pop(job.id, None)
+
+    settle_ms = (time.perf_counter() - started) * 1000
+    print(f"Settled {game_round.game_type} round {game_round.round_id}: {job.settled_bets} bets, "
+          f"{job.winners} winners paid {job.total_payout:.2f} in {settle_ms:.1f} ms"
+          + (f" (attempt {job.attempts})" if job.attempts > 1 else ""))
+    return {
+        "round_id": game_round.round_id,
+        "game_type": game_round.game_type,
+        "settled_bets": job.settled_bets,
+        "winners": job.winners,
+        "total_payout": job.total_payout,
+        "settle_ms": settle_ms
+    }
+
+async def _run_job(job, game_round):
+    # Advance the job from its last checkpoint to 'done'
+    if job.status == 'done':
+        if not game_round.is_settled:
+            await rounds.mark_settled(game_round)
+        return
+
+    job.attempts += 1
+    job.last_error = None
+    await settlement_jobs.save(job)
+    payouts = None
+    try:
+        if job.status == 'pending':
+            # Set-based updates, one per winning outcome, with the payout computed server-side.
+            # Only unsettled bets match, so a repeat leaves already-settled bets alone.
+            settled_bets = 0
+            for bet_value, multiplier in job.winning_multipliers.items():
+                settled_bets += await bets.settle_outcome(game_round, bet_value, multiplier)
+            # Everything left over lost
+            settled_bets += await bets.settle_losers(game_round)
+            job.settled_bets += settled_bets
+            job.status = 'bets_settled'
+            await settlement_jobs.save(job)
+
+        if job.status == 'bets_settled':
+            # Group payouts per user and credit them in chunks of idempotent $inc operations.
+            # credited_users records progress; the per-user settlement guard makes redoing a
+            # chunk that was interrupted harmless.
+            payouts = await bets.payouts_by_user(game_round)
+            user_pks = sorted(payouts)
+            for start in range(job.credited_users, len(user_pks), SETTLEMENT_CREDIT_CHUNK):
+                chunk = user_pks[start:start + SETTLEMENT_CREDIT_CHUNK]
+                await users.credit_settlement(job.id, {pk: payouts[pk] for pk in chunk})
+                job.credited_users = start + len(chunk)
+                await settlement_jobs.save(job)
+            job.winners = len(payouts)
+            job.total_payout = sum(payouts.values())
+            job.status = 'credited'
+            await settlement_jobs.save(job)
+
+        if job.status == 'credited':
+            # Derived views only; balances are final at this point. The 'recorded' checkpoint keeps
+            # a retry of the steps below from counting them again, and the leaderboard add is keyed
+            # by the job, so a crash before that checkpoint is saved does not double it either.
+            analytics.record_payouts(job.game_type, job.total_payout)
+            try:
+                if payouts is None:
+                    payouts = await bets.payouts_by_user(game_round)
+                await leaderboard_service.record_payouts(job.id, payouts)
+            except Exception as e:
+                # A failure here must not undo or repeat a completed payout
+                print(f"Failed to update leaderboard for {game_round.game_type} round {game_round.round_id}: {e}")
+            job.status = 'recorded'
+            await settlement_jobs.save(job)
+
+        if job.status == 'recorded':
+            job.status = 'done'
+            job.finished_at = datetime.utcnow()
+            await settlement_jobs.save(job)
+            await rounds.mark_settled(game_round)
+            for listener in _settled_listeners:
+                try:
+                    listener(game_round, job)
+                except Exception as e:
+                    print(f"Settlement listener failed for {game_round.game_type} round {game_round.round_id}: {e}")
+    except Exception as e:
+        job.last_error = str(e)
+        await settlement_jobs.save(job)
+        raise
+
+async def void_round(game_round, bet_values):
+    # Refund every stake on a round that never got a result (e.g. the process died mid-round)
+    game_round.result = 'void'
+    await rounds.save(game_round)
+    return await settle_round(game_round, {bet_value: 1.0 for bet_value in bet_values})
+
+async def recover_unsettled(games: dict):
+    # Startup pass, run before any new round opens: finish every round whose settlement did not
+    # complete. Rounds with a job resume from its checkpoint, rounds with a result are settled
+    # by their game, and rounds that never drew a result are voided and refunded.
+    pending = await rounds.unsettled()
+    if not pending:
+        return 0
+
+    print(f"Recovering {len(pending)} unsettled rounds")
+    recovered = 0
+    for game_round in pending:
+        game = games.get(game_round.game_type)
+        if not game:
+            print(f"Cannot recover {game_round.game_type} round {game_round.round_id}: unknown game type")
+            continue
+        try:
+            if await settlement_jobs.get(game_round.id):
+                # The job keeps the multipliers it started with; the game's are not consulted
+                await settle_round(game_round, {})
+            elif game_round.result:
+                await game.settle(game_round)
+            else:
+                await void_round(game_round, game.payout_table)
+            recovered += 1
+        except Exception as e:
+            print(f"Failed to recover {game_round.game_type} round {game_round.round_id}: {e}")
+    return recovered
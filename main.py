@@ -1,24 +1,67 @@
 import asyncio
-from pyrogram import Client
-from config import API_ID, API_HASH, BOT_TOKEN
+from pyrogram import Client, idle
+from config import API_ID, API_HASH, BOT_TOKEN, VERIFY_INDEXES_ON_STARTUP, WORKER_ID
+from database.db_manager import connect_db
+from database.indexes import verify_indexes
+from admin.broadcast import broadcast_manager
+from admin.analytics import analytics
+from payments.batch import retry_uncredited
+from games.bet_ingest import bet_ingest
+from games.game_manager import game_manager
+from games.leaderboard import leaderboard_service
+from games.leadership import leadership
+from bot.utils.outbox import outbox
+from bot.utils.notifier import result_notifier
+from bot.utils.countdown import countdowns
+from bot.utils.sequencer import updates
 
 async def main():
+    connect_db()
+    if VERIFY_INDEXES_ON_STARTUP:
+        # Refuse to start if a hot query would scan a whole collection
+        verify_indexes()
+
+    # Any number of these processes can run side by side; each needs its own WORKER_ID and
+    # Pyrogram session, and the one holding the scheduler lease runs the rounds (games.leadership).
+    # An update delivered to several of them is handled by the one that claims it (UPDATE_CLAIMS)
     app = Client(
-        "betting_bot",
+        f"betting_bot_{WORKER_ID}" if WORKER_ID else "betting_bot",
         api_id=API_ID,
         api_hash=API_HASH,
         bot_token=BOT_TOKEN,
         plugins=dict(root="bot/handlers") # Load handlers from bot/handlers
     )
 
-    app.bet_context = {}
-    app.deposit_context = {}
-    app.withdraw_context = {}
-    app.admin_context = {}
+    # Restore analytics counters before any handler can record into them
+    await analytics.start()
+    await bet_ingest.start()
+    await outbox.start()
+    await leaderboard_service.start()
 
     print("Bot starting...")
-    await app.run()
+    await app.start()
+    # Round results wait for the client
+    await result_notifier.start(app)
+    # The scheduler process runs broadcasts, including ones started from other processes or
+    # interrupted by a crash or restart
+    leadership.while_leading(lambda: broadcast_manager.resume_pending(app))
+    # It also finishes payment batches whose credit failed after their rows were approved or rejected
+    leadership.while_leading(retry_uncredited)
+    # Mirror the current rounds, then contend for the scheduler lease
+    await game_manager.start()
+    await leadership.start()
+    await countdowns.start()
+    await idle()
+    await countdowns.stop()
+    await updates.stop() # Finish the updates already queued; their replies still need the outbox
+    await leadership.stop() # Hand the rounds over to another process, if one is running
+    await game_manager.stop()
+    await outbox.stop() # Deliver queued messages while the client is still connected
+    await app.stop()
+    await bet_ingest.stop() # Write any bets still queued
+    await leaderboard_service.stop()
+    await analytics.stop()
     print("Bot stopped.")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,40 @@
+from bson import ObjectId
+from database.repository import users, transactions
+
+def summarize_batch(claimed: list, status: str, requested_pks=None) -> dict:
+    # Per-item result of a bulk approve/reject: transaction id -> status, plus every requested
+    # transaction that was no longer pending (already handled, or not matching the filter)
+    results = {txn.get('transaction_id') or str(txn['_id']): status for txn in claimed}
+    claimed_pks = {txn['_id'] for txn in claimed}
+    for pk in requested_pks or []:
+        if pk not in claimed_pks:
+            results[str(pk)] = 'skipped'
+    return results
+
+def amounts_by_user(claimed: list) -> dict:
+    # Sum the claimed amounts per User ObjectId, ready for users.credit_settlement
+    amounts = {}
+    for txn in claimed:
+        amounts[txn['user']] = amounts.get(txn['user'], 0) + txn['amount']
+    return amounts
+
+async def credit_batch(claimed: list) -> dict:
+    # Credits the rows one claim_pending(credit=True) call flipped (approved deposits, or refunds of
+    # rejected withdrawals), then clears their credit_pending mark. The credit is keyed by the batch
+    # id, so if it is retried after a failure or crash, nobody is paid twice. Returns the amounts by user.
+    if not claimed:
+        return {}
+    batch_id = claimed[0]['batch_id']
+    amounts = amounts_by_user(claimed)
+    await users.credit_settlement(ObjectId(batch_id), amounts)
+    await transactions.mark_credited(batch_id)
+    return amounts
+
+async def retry_uncredited():
+    # Finishes every claimed batch whose credit failed or was cut short; run by the scheduler process
+    for batch_id, rows in (await transactions.uncredited()).items():
+        try:
+            amounts = await credit_batch(rows)
+            print(f"Credited payment batch {batch_id}: {len(rows)} transactions, {sum(amounts.values()):.2f}")
+        except Exception as e:
+            print(f"Failed to credit payment batch {batch_id}: {e}")
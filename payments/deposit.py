@@ -1,17 +1,19 @@
-from database.models import Transaction, User
+from database.repository import users, transactions
+from admin.analytics import analytics
+from payments.batch import summarize_batch, credit_batch
 from datetime import datetime
 
 class DepositManager:
     async def create_deposit_request(self, user_id: int, amount: float, payment_method: str, transaction_id: str, screenshot_proof: str = None):
-        user = User.objects(user_id=user_id).first()
+        user = await users.get(user_id)
         if not user:
             return False, "User not found."
 
         # Check for existing transaction with the same ID to prevent duplicates
-        if Transaction.objects(transaction_id=transaction_id).first():
+        if await transactions.get_by_transaction_id(transaction_id):
             return False, "Transaction ID already exists. Please use a unique ID."
 
-        deposit = Transaction(
+        await transactions.create(
             user=user,
             transaction_type='deposit',
             amount=amount,
@@ -21,42 +23,73 @@ class DepositManager:
             screenshot_proof=screenshot_proof,
             created_at=datetime.utcnow()
         )
-        deposit.save()
         return True, "Deposit request submitted successfully. Awaiting admin approval."
 
     async def approve_deposit(self, transaction_id: str, admin_user_id: int):
-        transaction = Transaction.objects(transaction_id=transaction_id, transaction_type='deposit', status='pending').first()
-        admin_user = User.objects(user_id=admin_user_id, is_admin=True).first()
+        transaction = await transactions.get_pending(transaction_id, 'deposit')
+        admin_user = await users.get(admin_user_id)
 
         if not transaction:
             return False, "Pending deposit transaction not found."
-        if not admin_user:
+        if not admin_user or not admin_user.is_admin:
             return False, "Admin user not found or not authorized."
 
-        user = transaction.user
-        user.balance += transaction.amount
-        user.save()
+        # Same conditional claim as the bulk path, so only one admin action can approve and credit it
+        claimed = await transactions.claim_pending('deposit', 'approved', admin_user.id, [transaction.pk], credit=True)
+        if not claimed:
+            return False, "Pending deposit transaction not found."
+        try:
+            await credit_batch(claimed)
+        except Exception as e:
+            print(f"Failed to credit approved deposit {transaction_id}: {e}")
+            return False, "Deposit was approved but crediting failed. It will be retried."
 
-        transaction.status = 'approved'
-        transaction.approved_by = admin_user
-        transaction.updated_at = datetime.utcnow()
-        transaction.save()
+        user = await transactions.get_user(transaction)
+        analytics.record_deposit(transaction.amount)
         return True, f"Deposit of {transaction.amount} for user {user.user_id} approved."
 
     async def reject_deposit(self, transaction_id: str, admin_user_id: int):
-        transaction = Transaction.objects(transaction_id=transaction_id, transaction_type='deposit', status='pending').first()
-        admin_user = User.objects(user_id=admin_user_id, is_admin=True).first()
+        transaction = await transactions.get_pending(transaction_id, 'deposit')
+        admin_user = await users.get(admin_user_id)
 
         if not transaction:
             return False, "Pending deposit transaction not found."
-        if not admin_user:
+        if not admin_user or not admin_user.is_admin:
             return False, "Admin user not found or not authorized."
 
-        transaction.status = 'rejected'
-        transaction.approved_by = admin_user
-        transaction.updated_at = datetime.utcnow()
-        transaction.save()
+        if not await transactions.claim_pending('deposit', 'rejected', admin_user.id, [transaction.pk]):
+            return False, "Pending deposit transaction not found."
         return True, f"Deposit request {transaction_id} rejected."
 
-    async def get_pending_deposits(self):
-        return Transaction.objects(transaction_type='deposit', status='pending').all()
\ No newline at end of file
+    async def approve_deposits(self, admin_user_id: int, transaction_pks=None, first=None, last=None):
+        # Bulk approval of a list of transaction ObjectIds, or of every pending deposit in the
+        # inclusive _id range first..last. One admin check, one set-based status update and one
+        # bulk credit for the whole batch. Returns (success, message, {transaction id: status}).
+        admin_user = await users.get(admin_user_id)
+        if not admin_user or not admin_user.is_admin:
+            return False, "Admin user not found or not authorized.", {}
+
+        claimed = await transactions.claim_pending('deposit', 'approved', admin_user.id, transaction_pks, first, last, credit=True)
+        try:
+            amounts = await credit_batch(claimed)
+        except Exception as e:
+            # The rows stay credit_pending; payments.batch.retry_uncredited finishes the batch
+            print(f"Failed to credit approved deposits {[txn['_id'] for txn in claimed]}: {e}")
+            return False, "Deposits were approved but crediting failed. It will be retried.", summarize_batch(claimed, 'approved', transaction_pks)
+
+        total = sum(amounts.values())
+        if claimed:
+            analytics.record_deposit(total)
+        return True, f"Approved {len(claimed)} deposits totalling {total:.2f}.", summarize_batch(claimed, 'approved', transaction_pks)
+
+    async def reject_deposits(self, admin_user_id: int, transaction_pks=None, first=None, last=None):
+        admin_user = await users.get(admin_user_id)
+        if not admin_user or not admin_user.is_admin:
+            return False, "Admin user not found or not authorized.", {}
+
+        claimed = await transactions.claim_pending('deposit', 'rejected', admin_user.id, transaction_pks, first, last)
+        return True, f"Rejected {len(claimed)} deposits.", summarize_batch(claimed, 'rejected', transaction_pks)
+
+    async def get_pending_deposits(self, limit: int, after=None, before=None, start=None):
+        # One page of the review queue; see TransactionRepository.pending_page
+        return await transactions.pending_page('deposit', limit, after=after, before=before, start=start)
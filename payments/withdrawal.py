@@ -1,11 +1,13 @@
-from database.models import Transaction, User
+from database.repository import users, transactions
+from admin.analytics import analytics
+from payments.batch import summarize_batch, credit_batch
 from datetime import datetime
 
 class WithdrawalManager:
     MIN_WITHDRAWAL_BALANCE = 10.0 # Example minimum balance for withdrawal
 
     async def create_withdrawal_request(self, user_id: int, amount: float, payment_method: str, payment_address: str):
-        user = User.objects(user_id=user_id).first()
+        user = await users.get(user_id)
         if not user:
             return False, "User not found."
 
@@ -15,11 +17,13 @@ class WithdrawalManager:
         if user.balance < self.MIN_WITHDRAWAL_BALANCE:
             return False, f"Minimum balance for withdrawal is {self.MIN_WITHDRAWAL_BALANCE}."
 
-        # Deduct balance immediately to prevent double spending
-        user.balance -= amount
-        user.save()
+        # Deduct balance immediately to prevent double spending.
+        # The debit is conditional, so a concurrent bet cannot push the balance negative.
+        user = await users.debit(user_id, amount)
+        if not user:
+            return False, "Insufficient balance for withdrawal."
 
-        withdrawal = Transaction(
+        await transactions.create(
             user=user,
             transaction_type='withdrawal',
             amount=amount,
@@ -31,43 +35,73 @@ class WithdrawalManager:
             screenshot_proof=payment_address, # Re-using this field for payment address for now
             created_at=datetime.utcnow()
         )
-        withdrawal.save()
         return True, "Withdrawal request submitted successfully. Awaiting admin approval."
 
     async def approve_withdrawal(self, transaction_id: str, admin_user_id: int):
-        transaction = Transaction.objects(transaction_id=transaction_id, transaction_type='withdrawal', status='pending').first()
-        admin_user = User.objects(user_id=admin_user_id, is_admin=True).first()
+        transaction = await transactions.get_pending(transaction_id, 'withdrawal')
+        admin_user = await users.get(admin_user_id)
 
         if not transaction:
             return False, "Pending withdrawal transaction not found."
-        if not admin_user:
+        if not admin_user or not admin_user.is_admin:
             return False, "Admin user not found or not authorized."
 
-        transaction.status = 'approved'
-        transaction.approved_by = admin_user
-        transaction.updated_at = datetime.utcnow()
-        transaction.save()
-        return True, f"Withdrawal of {transaction.amount} for user {transaction.user.user_id} approved."
+        # Same conditional claim as the bulk path, so a withdrawal cannot be both approved and refunded
+        if not await transactions.claim_pending('withdrawal', 'approved', admin_user.id, [transaction.pk]):
+            return False, "Pending withdrawal transaction not found."
+        user = await transactions.get_user(transaction)
+        analytics.record_withdrawal(transaction.amount)
+        return True, f"Withdrawal of {transaction.amount} for user {user.user_id} approved."
 
     async def reject_withdrawal(self, transaction_id: str, admin_user_id: int):
-        transaction = Transaction.objects(transaction_id=transaction_id, transaction_type='withdrawal', status='pending').first()
-        admin_user = User.objects(user_id=admin_user_id, is_admin=True).first()
+        transaction = await transactions.get_pending(transaction_id, 'withdrawal')
+        admin_user = await users.get(admin_user_id)
 
         if not transaction:
             return False, "Pending withdrawal transaction not found."
-        if not admin_user:
+        if not admin_user or not admin_user.is_admin:
             return False, "Admin user not found or not authorized."
 
         # Refund the balance if withdrawal is rejected
-        user = transaction.user
-        user.balance += transaction.amount
-        user.save()
-
-        transaction.status = 'rejected'
-        transaction.approved_by = admin_user
-        transaction.updated_at = datetime.utcnow()
-        transaction.save()
+        claimed = await transactions.claim_pending('withdrawal', 'rejected', admin_user.id, [transaction.pk], credit=True)
+        if not claimed:
+            return False, "Pending withdrawal transaction not found."
+        try:
+            await credit_batch(claimed)
+        except Exception as e:
+            print(f"Failed to refund rejected withdrawal {transaction_id}: {e}")
+            return False, "Withdrawal was rejected but refunding failed. It will be retried."
         return True, f"Withdrawal request {transaction_id} rejected and amount refunded."
 
-    async def get_pending_withdrawals(self):
-        return Transaction.objects(transaction_type='withdrawal', status='pending').all()
\ No newline at end of file
+    async def approve_withdrawals(self, admin_user_id: int, transaction_pks=None, first=None, last=None):
+        # Bulk approval of a list of transaction ObjectIds, or of every pending withdrawal in the
+        # inclusive _id range first..last. Balances were debited at request time, so this is a
+        # single set-based status update. Returns (success, message, {transaction id: status}).
+        admin_user = await users.get(admin_user_id)
+        if not admin_user or not admin_user.is_admin:
+            return False, "Admin user not found or not authorized.", {}
+
+        claimed = await transactions.claim_pending('withdrawal', 'approved', admin_user.id, transaction_pks, first, last)
+        total = sum(txn['amount'] for txn in claimed)
+        if claimed:
+            analytics.record_withdrawal(total)
+        return True, f"Approved {len(claimed)} withdrawals totalling {total:.2f}.", summarize_batch(claimed, 'approved', transaction_pks)
+
+    async def reject_withdrawals(self, admin_user_id: int, transaction_pks=None, first=None, last=None):
+        # Rejected withdrawals are refunded with one bulk credit
+        admin_user = await users.get(admin_user_id)
+        if not admin_user or not admin_user.is_admin:
+            return False, "Admin user not found or not authorized.", {}
+
+        claimed = await transactions.claim_pending('withdrawal', 'rejected', admin_user.id, transaction_pks, first, last, credit=True)
+        try:
+            amounts = await credit_batch(claimed)
+        except Exception as e:
+            # The rows stay credit_pending; payments.batch.retry_uncredited finishes the batch
+            print(f"Failed to refund rejected withdrawals {[txn['_id'] for txn in claimed]}: {e}")
+            return False, "Withdrawals were rejected but refunding failed. It will be retried.", summarize_batch(claimed, 'rejected', transaction_pks)
+        return True, f"Rejected {len(claimed)} withdrawals and refunded {sum(amounts.values()):.2f}.", summarize_batch(claimed, 'rejected', transaction_pks)
+
+    async def get_pending_withdrawals(self, limit: int, after=None, before=None, start=None):
+        # One page of the review queue; see TransactionRepository.pending_page
+        return await transactions.pending_page('withdrawal', limit, after=after, before=before, start=start)
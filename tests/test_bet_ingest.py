@@ -0,0 +1,254 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from bson import ObjectId
+import games.bet_ingest as bet_ingest_module
+from games.bet_ingest import BetIngestQueue, LateBetError, BetUnconfirmedError
+
+class FakeBets:
+    def __init__(self):
+        self.batches = [] # One list of bets per insert_many call
+        self.stored = set() # Ids of bets currently in the collection
+        self.fail = set() # Bets insert_many rejects
+        self.settled = set() # Bet ids settlement already reached
+        self.write_error = None # 'before_write' or 'after_write': insert_many raises a connection error
+        self.lookup_down = False
+
+    async def insert_many(self, bet_list):
+        self.batches.append(list(bet_list))
+        failed = {}
+        for index, bet in enumerate(bet_list):
+            bet.id = ObjectId() # As pymongo does, before sending
+            if bet in self.fail:
+                failed[index] = 'duplicate key'
+            elif self.write_error != 'before_write':
+                self.stored.add(bet.id)
+        if self.write_error:
+            raise ConnectionError("connection reset")
+        for index in failed:
+            bet_list[index].id = None
+        return failed
+
+    async def withdraw_unsettled(self, bet):
+        if self.lookup_down:
+            raise ConnectionError("mongo down")
+        if bet.id not in self.stored or bet.id in self.settled:
+            return False
+        self.stored.discard(bet.id)
+        return True
+
+    async def exists(self, bet):
+        return bet.id in self.stored
+
+class FakeSettlementJobs:
+    def __init__(self):
+        self.started_rounds = set()
+
+    async def started(self, round_pks):
+        return {pk for pk in round_pks if pk in self.started_rounds}
+
+@pytest.fixture
+def fakes(monkeypatch):
+    bets, jobs = FakeBets(), FakeSettlementJobs()
+    monkeypatch.setattr(bet_ingest_module, 'bets', bets)
+    monkeypatch.setattr(bet_ingest_module, 'settlement_jobs', jobs)
+    return bets, jobs
+
+class FakeBet:
+    def __init__(self, game_round):
+        self.id = None
+        self.game_round = game_round
+
+def _round():
+    return SimpleNamespace(id=ObjectId())
+
+def _run(coroutine):
+    return asyncio.run(coroutine)
+
+def test_concurrent_bets_share_one_insert(fakes):
+    bets, _ = fakes
+
+    async def scenario():
+        queue = BetIngestQueue(batch_size=10, flush_interval_ms=20)
+        await queue.start()
+        game_round = _round()
+        await asyncio.gather(*(queue.submit(FakeBet(game_round)) for _ in range(4)))
+        await queue.stop()
+        return queue
+
+    queue = _run(scenario())
+    assert [len(batch) for batch in bets.batches] == [4]
+    assert queue.metrics()['bets_written'] == 4
+
+def test_batches_are_capped_at_batch_size(fakes):
+    bets, _ = fakes
+
+    async def scenario():
+        queue = BetIngestQueue(batch_size=2, flush_interval_ms=1000)
+        await queue.start()
+        game_round = _round()
+        await asyncio.gather(*(queue.submit(FakeBet(game_round)) for _ in range(5)))
+        await queue.stop()
+
+    _run(scenario())
+    assert [len(batch) for batch in bets.batches] == [2, 2, 1]
+
+def test_rejected_bet_fails_only_its_caller(fakes):
+    bets, _ = fakes
+    game_round = _round()
+    good, bad = FakeBet(game_round), FakeBet(game_round)
+    bets.fail.add(bad)
+
+    async def scenario():
+        queue = BetIngestQueue(batch_size=10, flush_interval_ms=5)
+        await queue.start()
+        results = await asyncio.gather(queue.submit(good), queue.submit(bad), return_exceptions=True)
+        await queue.stop()
+        return queue, results
+
+    queue, results = _run(scenario())
+    assert results[0] is None
+    assert isinstance(results[1], RuntimeError)
+    assert queue.metrics()['bets_failed'] == 1
+
+def test_drain_waits_for_admitted_bets_on_that_round(fakes):
+    async def scenario():
+        queue = BetIngestQueue(batch_size=10, flush_interval_ms=5)
+        await queue.start()
+        game_round, other_round = _round(), _round()
+        release = asyncio.Event()
+        order = []
+
+        async def place():
+            async with queue.admit(game_round):
+                await release.wait()
+                await queue.submit(FakeBet(game_round))
+                order.append('bet written')
+
+        placing = asyncio.create_task(place())
+        await asyncio.sleep(0)
+        # Nothing admitted on the other round, so it drains at once
+        await asyncio.wait_for(queue.drain(other_round), timeout=1)
+
+        draining = asyncio.create_task(queue.drain(game_round))
+        await asyncio.sleep(0.05)
+        assert not draining.done()
+        release.set()
+        await asyncio.wait_for(draining, timeout=1)
+        order.append('drained')
+        await placing
+        await queue.stop()
+        return order
+
+    assert _run(scenario()) == ['bet written', 'drained']
+
+def test_bet_written_after_settlement_began_is_withdrawn(fakes):
+    bets, jobs = fakes
+    open_round, settling_round = _round(), _round()
+    jobs.started_rounds.add(settling_round.id)
+
+    async def scenario():
+        queue = BetIngestQueue(batch_size=10, flush_interval_ms=5)
+        await queue.start()
+        results = await asyncio.gather(queue.submit(FakeBet(open_round)), queue.submit(FakeBet(settling_round)),
+                                       return_exceptions=True)
+        await queue.stop()
+        return queue, results
+
+    queue, results = _run(scenario())
+    assert results[0] is None
+    assert isinstance(results[1], LateBetError)
+    assert queue.metrics()['bets_late'] == 1
+    assert queue.metrics()['bets_written'] == 1
+
+def test_late_bet_that_settlement_reached_stands(fakes):
+    bets, jobs = fakes
+    game_round = _round()
+    jobs.started_rounds.add(game_round.id)
+    bet = FakeBet(game_round)
+    original = bets.insert_many
+
+    async def insert_then_settle(bet_list):
+        failed = await original(bet_list)
+        bets.settled.add(bet.id)
+        return failed
+    bets.insert_many = insert_then_settle
+
+    async def scenario():
+        queue = BetIngestQueue(batch_size=10, flush_interval_ms=5)
+        await queue.start()
+        await queue.submit(bet)
+        await queue.stop()
+        return queue
+
+    queue = _run(scenario())
+    assert queue.metrics()['bets_late'] == 0
+    assert queue.metrics()['bets_written'] == 1
+
+def test_submit_without_writer_inserts_directly(fakes):
+    bets, jobs = fakes
+    game_round = _round()
+
+    async def scenario():
+        queue = BetIngestQueue()
+        await queue.submit(FakeBet(game_round))
+        jobs.started_rounds.add(game_round.id)
+        with pytest.raises(LateBetError):
+            await queue.submit(FakeBet(game_round))
+
+    _run(scenario())
+    # One bet per write, so nothing waited for a flush interval
+    assert [len(batch) for batch in bets.batches] == [1, 1]
+    assert len(bets.stored) == 1
+
+def _submit_all(bet_list):
+    async def scenario():
+        queue = BetIngestQueue(batch_size=10, flush_interval_ms=5)
+        await queue.start()
+        results = await asyncio.gather(*(queue.submit(bet) for bet in bet_list), return_exceptions=True)
+        await queue.stop()
+        return queue, results
+    return _run(scenario())
+
+@pytest.mark.parametrize("write_error", ['before_write', 'after_write'])
+def test_ambiguous_write_failure_fails_only_bets_it_could_take_back(fakes, write_error):
+    bets, _ = fakes
+    bets.write_error = write_error
+    game_round = _round()
+    bet_list = [FakeBet(game_round), FakeBet(game_round)]
+
+    queue, results = _submit_all(bet_list)
+    # Stored or not, every bet ends up absent and its caller is told to refund
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert not bets.stored
+    assert queue.metrics()['bets_failed'] == 2
+
+def test_ambiguous_write_failure_keeps_a_bet_settlement_reached(fakes):
+    bets, _ = fakes
+    bets.write_error = 'after_write'
+    game_round = _round()
+    settled, unsettled = FakeBet(game_round), FakeBet(game_round)
+    original = bets.insert_many
+
+    async def insert_then_settle(bet_list):
+        try:
+            return await original(bet_list)
+        finally:
+            bets.settled.add(settled.id)
+    bets.insert_many = insert_then_settle
+
+    queue, results = _submit_all([settled, unsettled])
+    assert results[0] is None # Already paid out by settlement, so it must not be refunded
+    assert isinstance(results[1], RuntimeError)
+    assert bets.stored == {settled.id}
+    assert queue.metrics()['bets_written'] == 1
+
+def test_ambiguous_write_that_cannot_be_checked_is_not_refunded(fakes):
+    bets, _ = fakes
+    bets.write_error = 'after_write'
+    bets.lookup_down = True
+
+    queue, results = _submit_all([FakeBet(_round())])
+    assert isinstance(results[0], BetUnconfirmedError)
+    assert queue.metrics()['bets_unconfirmed'] == 1
+    assert queue.metrics()['bets_failed'] == 0
@@ -0,0 +1,60 @@
+import base64
+import pytest
+from bson import ObjectId
+from bot.utils.callback_codec import (MARKER, BET, GAME_MENU, PAYMENT_QUEUE, CallbackAction, CallbackDataError,
+                                      ObjectIdField, UInt, decode, is_packed)
+
+def _pack(raw: bytes) -> str:
+    return MARKER + base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def test_bet_round_trip():
+    data = BET.encode(game='wheel_spin', round_id=123456789, option='x20')
+    assert is_packed(data)
+    assert len(data.encode()) <= 64
+    action, payload = decode(data)
+    assert action is BET
+    assert payload == BET.struct(game='wheel_spin', round_id=123456789, option='x20')
+
+def test_varint_boundaries_round_trip():
+    for round_id in (0, 1, 127, 128, 16383, 16384, 2 ** 32, 2 ** 62):
+        _, payload = decode(BET.encode(game='lucky_7', round_id=round_id, option='7'))
+        assert payload.round_id == round_id
+
+def test_optional_object_id_round_trip():
+    target, page = ObjectId(), ObjectId()
+    _, payload = decode(PAYMENT_QUEUE.encode(kind='w', op='A', target=target, page=page))
+    assert payload == PAYMENT_QUEUE.struct(kind='w', op='A', target=target, page=page)
+    _, payload = decode(PAYMENT_QUEUE.encode(kind='d', op='n', target=target, page=None))
+    assert payload.page is None
+
+def test_oversize_payload_is_rejected():
+    big = CallbackAction(250, 'Big', {f"id{i}": ObjectIdField() for i in range(4)})
+    with pytest.raises(CallbackDataError):
+        big.encode(**{f"id{i}": ObjectId() for i in range(4)})
+
+def test_unknown_option_and_negative_int_are_rejected_on_encode():
+    with pytest.raises(CallbackDataError):
+        GAME_MENU.encode(game='roulette')
+    with pytest.raises(CallbackDataError):
+        BET.encode(game='lucky_7', round_id=-1, option='7')
+
+@pytest.mark.parametrize("data", [
+    "game_menu", # Not packed
+    MARKER + "!!!", # Not base64url
+    _pack(b""), # No action id
+    _pack(b"\x80"), # Truncated varint
+    _pack(b"\x80" * 11 + b"\x01"), # Varint longer than 64 bits
+    _pack(b"\x7f"), # Unknown action id
+    _pack(b"\x01\x7f"), # Unknown option code
+    _pack(b"\x01\x00\x00"), # Trailing bytes
+    _pack(b"\x04\x00\x00" + b"\x00" * 5), # Truncated ObjectId
+    _pack(b"\x04\x00\x00" + b"\x00" * 12), # Missing optional field
+])
+def test_invalid_payloads_raise(data):
+    with pytest.raises(CallbackDataError):
+        decode(data)
+
+def test_uint_decodes_from_offset():
+    out = bytearray(b"\xff")
+    UInt().encode(300, out)
+    assert UInt().decode(bytes(out), 1) == (300, len(out))
@@ -0,0 +1,78 @@
+import asyncio
+import time
+import bot.utils.rate_limiter as rate_limiter_module
+from bot.utils.rate_limiter import TokenBucket
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+def _bucket(monkeypatch, rate: float, capacity: float = None):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter_module, 'time', clock)
+    return TokenBucket(rate, capacity), clock
+
+def test_starts_full_and_allows_a_burst_of_capacity(monkeypatch):
+    bucket, clock = _bucket(monkeypatch, rate=1, capacity=3)
+    for _ in range(3):
+        assert bucket.wait_time(clock.now) == 0
+        bucket.take()
+    assert bucket.wait_time(clock.now) == 1.0
+
+def test_refills_at_rate_up_to_capacity(monkeypatch):
+    bucket, clock = _bucket(monkeypatch, rate=2, capacity=2)
+    bucket.take()
+    bucket.take()
+    assert bucket.wait_time(clock.now) == 0.5
+    clock.now += 0.5
+    assert bucket.wait_time(clock.now) == 0
+    clock.now += 100
+    bucket.wait_time(clock.now)
+    assert bucket._tokens == 2 # Never more than capacity, however long it sat idle
+
+def test_wait_time_does_not_take_a_token(monkeypatch):
+    bucket, clock = _bucket(monkeypatch, rate=1, capacity=1)
+    assert bucket.wait_time(clock.now) == 0
+    assert bucket.wait_time(clock.now) == 0
+    bucket.take()
+    assert bucket.wait_time(clock.now) > 0
+
+def test_pause_blocks_until_it_expires_then_refills_from_empty(monkeypatch):
+    bucket, clock = _bucket(monkeypatch, rate=1, capacity=5)
+    bucket.pause(10)
+    assert bucket.wait_time(clock.now) == 10
+    clock.now += 4
+    assert bucket.wait_time(clock.now) == 6
+    # A shorter pause never shortens a longer one
+    bucket.pause(1)
+    assert bucket.wait_time(clock.now) == 6
+    clock.now += 6
+    # One token for the retry, then the bucket refills at its rate instead of allowing a burst
+    assert bucket.wait_time(clock.now) == 0
+    bucket.take()
+    assert bucket.wait_time(clock.now) == 1.0
+    assert not bucket.is_idle(clock.now)
+
+def test_is_idle_only_when_full_and_not_paused(monkeypatch):
+    bucket, clock = _bucket(monkeypatch, rate=1, capacity=2)
+    assert bucket.is_idle(clock.now)
+    bucket.take()
+    assert not bucket.is_idle(clock.now)
+    clock.now += 1
+    assert bucket.is_idle(clock.now)
+
+def test_acquire_paces_callers_to_the_rate():
+    bucket = TokenBucket(rate=50, capacity=1)
+
+    async def scenario():
+        started = time.monotonic()
+        for _ in range(6):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    elapsed = asyncio.run(scenario())
+    # The first token is there at once, the other five come 20 ms apart
+    assert 0.08 <= elapsed < 0.5
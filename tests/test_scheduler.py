@@ -0,0 +1,67 @@
+import asyncio
+import time
+from types import SimpleNamespace
+import pytest
+import games.scheduler as scheduler_module
+from games.scheduler import RoundScheduler
+
+class FlakyGame:
+    def __init__(self, failures: int):
+        self.game_type = 'color_prediction'
+        self.failures = failures
+        self.attempts = []
+
+    async def settle(self, game_round):
+        self.attempts.append(time.monotonic())
+        if len(self.attempts) <= self.failures:
+            raise ConnectionError("mongo down")
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    leadership = SimpleNamespace(leading=True)
+    leadership.holds_lease = lambda: leadership.leading
+    monkeypatch.setattr(scheduler_module, 'leadership', leadership)
+    monkeypatch.setattr(scheduler_module, 'SETTLEMENT_GRACE', 0)
+    scheduler = RoundScheduler({})
+    scheduler.RETRY_DELAY = 0.02
+    scheduler.SETTLE_RETRY_MAX = 0.04
+    return scheduler, leadership
+
+def _round():
+    return SimpleNamespace(round_id=1)
+
+def test_failed_settlement_is_retried_with_backoff(scheduler):
+    scheduler, _ = scheduler
+    game = FlakyGame(failures=3)
+    asyncio.run(asyncio.wait_for(scheduler._settle(game, _round()), timeout=2))
+    assert len(game.attempts) == 4
+    gaps = [later - earlier for earlier, later in zip(game.attempts, game.attempts[1:])]
+    # 0.02, then doubled to the 0.04 cap
+    assert gaps[0] >= 0.02 and gaps[1] >= 0.04 and gaps[2] >= 0.04
+
+def test_retry_stops_when_the_lease_is_lost(scheduler):
+    scheduler, leadership = scheduler
+    game = FlakyGame(failures=10)
+
+    async def scenario():
+        settling = asyncio.create_task(scheduler._settle(game, _round()))
+        await asyncio.sleep(0.01)
+        leadership.leading = False
+        await asyncio.wait_for(settling, timeout=1)
+
+    asyncio.run(scenario())
+    assert len(game.attempts) == 1
+
+def test_stop_does_not_wait_out_a_retry(scheduler):
+    scheduler, _ = scheduler
+    scheduler.RETRY_DELAY = scheduler.SETTLE_RETRY_MAX = 60
+    game = FlakyGame(failures=10)
+
+    async def scenario():
+        task = asyncio.create_task(scheduler._settle(game, _round()))
+        scheduler._settle_tasks.add(task)
+        await asyncio.sleep(0.01)
+        await asyncio.wait_for(scheduler.stop(), timeout=1)
+
+    asyncio.run(scenario())
+    assert len(game.attempts) == 1
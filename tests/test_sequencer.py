@@ -0,0 +1,185 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+import bot.utils.sequencer as sequencer_module
+from bot.utils.sequencer import UpdateSequencer
+
+class FakeClaims:
+    def __init__(self):
+        self.keys = set()
+        self.down = False
+
+    async def claim(self, key, owner, ttl):
+        if self.down:
+            raise ConnectionError("mongo down")
+        if key in self.keys:
+            return False
+        self.keys.add(key)
+        return True
+
+@pytest.fixture
+def claims(monkeypatch):
+    claims = FakeClaims()
+    monkeypatch.setattr(sequencer_module, 'update_claims', claims)
+    monkeypatch.setattr(sequencer_module, 'UPDATE_CLAIMS', True)
+    return claims
+
+_message_ids = iter(range(1, 10 ** 6))
+
+def _message(user_id: int, message_id: int = None):
+    return SimpleNamespace(from_user=SimpleNamespace(id=user_id), chat=SimpleNamespace(id=user_id),
+                           id=message_id or next(_message_ids))
+
+def _run(coroutine):
+    return asyncio.run(coroutine)
+
+def test_each_users_updates_run_in_order_and_users_run_in_parallel(claims):
+    log = []
+
+    async def handler(client, update):
+        log.append(('start', update.label))
+        await asyncio.sleep(update.delay)
+        log.append(('end', update.label))
+
+    async def scenario():
+        updates = UpdateSequencer()
+        wrapped = updates.ordered(handler)
+        first, second, other = _message(1), _message(1), _message(2)
+        first.label, first.delay = 'a1', 0.05
+        second.label, second.delay = 'a2', 0
+        other.label, other.delay = 'b1', 0
+        for update in (first, second, other):
+            await wrapped(None, update)
+        await updates.stop(timeout=1)
+        return updates
+
+    updates = _run(scenario())
+    # a2 waits for a1 to finish; b1 does not wait for user 1 at all
+    assert log.index(('end', 'a1')) < log.index(('start', 'a2'))
+    assert log.index(('end', 'b1')) < log.index(('end', 'a1'))
+    assert updates.metrics()['processed'] == 3
+
+def test_backlog_beyond_limit_is_rejected(claims, monkeypatch):
+    monkeypatch.setattr(sequencer_module, 'UPDATE_MAX_BACKLOG', 2)
+    handled = []
+
+    async def handler(client, update):
+        await asyncio.sleep(0.01)
+        handled.append(update.id)
+
+    async def scenario():
+        updates = UpdateSequencer()
+        accepted = [await updates.submit(1, handler, None, _message(1, message_id)) for message_id in (1, 2, 3)]
+        await updates.stop(timeout=1)
+        return updates, accepted
+
+    updates, accepted = _run(scenario())
+    assert accepted == [True, True, False]
+    assert handled == [1, 2]
+    assert updates.metrics()['rejected'] == 1
+
+def test_failing_handler_does_not_stall_the_queue(claims):
+    handled = []
+
+    async def handler(client, update):
+        if update.id == 1:
+            raise RuntimeError("boom")
+        handled.append(update.id)
+
+    async def scenario():
+        updates = UpdateSequencer()
+        for message_id in (1, 2):
+            await updates.submit(1, handler, None, _message(1, message_id))
+        await updates.stop(timeout=1)
+        return updates
+
+    updates = _run(scenario())
+    assert handled == [2]
+    assert updates.metrics()['failed'] == 1
+
+def test_update_claimed_elsewhere_is_skipped(claims):
+    handled = []
+
+    async def handler(client, update):
+        handled.append(update.id)
+
+    async def scenario():
+        updates = UpdateSequencer()
+        wrapped = updates.ordered(handler)
+        await wrapped(None, _message(1, 7))
+        await wrapped(None, _message(1, 7)) # The same update delivered again
+        await updates.stop(timeout=1)
+        return updates
+
+    updates = _run(scenario())
+    assert handled == [7]
+    assert updates.metrics()['duplicates'] == 1
+
+def test_update_is_dropped_when_it_cannot_be_claimed(claims):
+    claims.down = True
+    handled = []
+
+    async def handler(client, update):
+        handled.append(update.id)
+
+    async def scenario():
+        updates = UpdateSequencer()
+        await updates.ordered(handler)(None, _message(1))
+        await updates.stop(timeout=1)
+
+    _run(scenario())
+    assert handled == []
+
+def test_stopped_sequencer_rejects_new_updates(claims):
+    async def handler(client, update):
+        pass
+
+    async def scenario():
+        updates = UpdateSequencer()
+        await updates.stop(timeout=0)
+        return await updates.submit(1, handler, None, _message(1))
+
+    assert _run(scenario()) is False
+
+def test_nested_ordered_call_runs_on_every_tap(claims):
+    # A button whose callback re-uses an ordered command on the menu message, like "View Profile"
+    shown = []
+
+    async def scenario():
+        updates = UpdateSequencer()
+
+        @updates.ordered
+        async def command(client, message):
+            shown.append(message.id)
+
+        @updates.ordered
+        async def button(client, callback_query):
+            await command(client, callback_query.message)
+
+        menu = _message(1, 42)
+        for tap in range(3):
+            await button(None, SimpleNamespace(from_user=menu.from_user, chat=menu.chat, id=1000 + tap, message=menu))
+        await updates.stop(timeout=1)
+        return updates
+
+    updates = _run(scenario())
+    assert shown == [42, 42, 42]
+    assert updates.metrics()['duplicates'] == 0
+
+def test_claims_can_be_turned_off(claims, monkeypatch):
+    monkeypatch.setattr(sequencer_module, 'UPDATE_CLAIMS', False)
+    claims.down = True # Any claim attempt would drop the update
+    handled = []
+
+    async def handler(client, update):
+        handled.append(update.id)
+
+    async def scenario():
+        updates = UpdateSequencer()
+        wrapped = updates.ordered(handler)
+        await wrapped(None, _message(1, 5))
+        await wrapped(None, _message(1, 5))
+        await updates.stop(timeout=1)
+
+    _run(scenario())
+    assert handled == [5, 5]
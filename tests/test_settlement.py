@@ -0,0 +1,177 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from bson import ObjectId
+import games.settlement as settlement
+
+class Crash(Exception):
+    # The process dying at some point during settlement
+    pass
+
+class Store:
+    # In-memory stand-in for the bets, users and settlement_jobs collections
+    def __init__(self):
+        self.bets = [
+            {'user': 'alice', 'bet_value': 'red', 'amount': 10.0},
+            {'user': 'alice', 'bet_value': 'green', 'amount': 5.0},
+            {'user': 'bob', 'bet_value': 'red', 'amount': 20.0},
+            {'user': 'carol', 'bet_value': 'green', 'amount': 7.0},
+            {'user': 'dave', 'bet_value': 'red', 'amount': 1.0},
+        ]
+        for bet in self.bets:
+            bet.update(is_settled=False, payout=0.0)
+        self.balances = {}
+        self.credited = {} # user -> settlement ids already credited
+        self.persisted = None # The job as last saved
+        self.crash_when = None # Predicate on a job being saved, or on 'credit' / 'leaderboard' after that write lands
+        self.crashed = False
+        self.leaderboard_calls = 0
+        self.earnings = {} # user -> leaderboard earnings
+        self.counted = set() # settlement ids the leaderboard has counted
+
+    def maybe_crash(self, point):
+        if self.crash_when and not self.crashed and self.crash_when(point):
+            self.crashed = True
+            raise Crash()
+
+class FakeBets:
+    def __init__(self, store):
+        self.store = store
+
+    async def settle_outcome(self, game_round, bet_value, multiplier):
+        matched = [bet for bet in self.store.bets if not bet['is_settled'] and bet['bet_value'] == bet_value]
+        for bet in matched:
+            bet.update(is_settled=True, payout=bet['amount'] * multiplier)
+        return len(matched)
+
+    async def settle_losers(self, game_round):
+        matched = [bet for bet in self.store.bets if not bet['is_settled']]
+        for bet in matched:
+            bet.update(is_settled=True, payout=0.0)
+        return len(matched)
+
+    async def payouts_by_user(self, game_round):
+        payouts = {}
+        for bet in self.store.bets:
+            if bet['payout'] > 0:
+                payouts[bet['user']] = payouts.get(bet['user'], 0) + bet['payout']
+        return payouts
+
+class FakeUsers:
+    def __init__(self, store):
+        self.store = store
+
+    async def credit_settlement(self, settlement_id, amounts_by_pk):
+        credited = 0
+        for pk, amount in amounts_by_pk.items():
+            seen = self.store.credited.setdefault(pk, set())
+            if settlement_id not in seen:
+                seen.add(settlement_id)
+                self.store.balances[pk] = self.store.balances.get(pk, 0) + amount
+                credited += 1
+        # The write landed, but the process dies before it hears back
+        self.store.maybe_crash('credit')
+        return credited
+
+class FakeRounds:
+    async def mark_settled(self, game_round):
+        game_round.is_settled = True
+
+class FakeSettlementJobs:
+    def __init__(self, store):
+        self.store = store
+
+    async def save(self, job):
+        self.store.persisted = dict(vars(job))
+        self.store.maybe_crash(job)
+        return job
+
+class FakeLeaderboard:
+    def __init__(self, store):
+        self.store = store
+
+    async def record_payouts(self, settlement_id, payouts):
+        # Keyed by settlement like LeaderboardRepository.add_earnings
+        self.store.leaderboard_calls += 1
+        if settlement_id not in self.store.counted:
+            self.store.counted.add(settlement_id)
+            for pk, amount in payouts.items():
+                self.store.earnings[pk] = self.store.earnings.get(pk, 0) + amount
+        self.store.maybe_crash('leaderboard')
+
+@pytest.fixture
+def store(monkeypatch):
+    store = Store()
+    monkeypatch.setattr(settlement, 'bets', FakeBets(store))
+    monkeypatch.setattr(settlement, 'users', FakeUsers(store))
+    monkeypatch.setattr(settlement, 'rounds', FakeRounds())
+    monkeypatch.setattr(settlement, 'settlement_jobs', FakeSettlementJobs(store))
+    monkeypatch.setattr(settlement, 'leaderboard_service', FakeLeaderboard(store))
+    monkeypatch.setattr(settlement, 'analytics', SimpleNamespace(record_payouts=lambda game_type, total: None))
+    monkeypatch.setattr(settlement, 'SETTLEMENT_CREDIT_CHUNK', 1) # One checkpoint per user
+    return store
+
+def _new_job():
+    return SimpleNamespace(id=ObjectId(), game_type='color_prediction', status='pending',
+                           winning_multipliers={'red': 2.0}, settled_bets=0, winners=0, credited_users=0,
+                           total_payout=0.0, attempts=0, last_error=None, finished_at=None)
+
+def _settle_until_done(store, job):
+    # Run the job, and after every crash resume it from the last saved checkpoint as recovery would
+    game_round = SimpleNamespace(id=job.id, game_type=job.game_type, round_id=1, is_settled=False)
+    for _ in range(5):
+        try:
+            asyncio.run(settlement._run_job(job, game_round))
+            return job, game_round
+        except Crash:
+            job = SimpleNamespace(**store.persisted)
+    raise AssertionError("Settlement did not finish")
+
+EXPECTED_BALANCES = {'alice': 20.0, 'bob': 40.0, 'dave': 2.0}
+
+def _saved(status, **fields):
+    # Crash right after the job is saved with this status (and these field values)
+    return lambda point: not isinstance(point, str) and point.status == status and \
+        all(getattr(point, name) == value for name, value in fields.items())
+
+CRASH_POINTS = {
+    'before_any_stage': _saved('pending'),
+    'after_bets_settled': _saved('bets_settled', credited_users=0),
+    'mid_credit_checkpoint': _saved('bets_settled', credited_users=2),
+    'credit_unacknowledged': lambda point: point == 'credit',
+    'after_credited': _saved('credited'),
+    'leaderboard_unacknowledged': lambda point: point == 'leaderboard',
+    'after_recorded': _saved('recorded'),
+    'after_done': _saved('done'),
+}
+
+def test_settles_and_credits_winners(store):
+    job, game_round = _settle_until_done(store, _new_job())
+    assert job.status == 'done'
+    assert game_round.is_settled
+    assert store.balances == EXPECTED_BALANCES
+    assert job.settled_bets == 5
+    assert job.winners == 3
+    assert job.total_payout == sum(EXPECTED_BALANCES.values())
+
+@pytest.mark.parametrize("crash_point", list(CRASH_POINTS))
+def test_rerun_after_crash_credits_nobody_twice(store, crash_point):
+    store.crash_when = CRASH_POINTS[crash_point]
+    job, game_round = _settle_until_done(store, _new_job())
+    assert store.crashed
+    assert job.status == 'done'
+    assert game_round.is_settled
+    assert store.balances == EXPECTED_BALANCES
+    assert store.earnings == EXPECTED_BALANCES
+
+def test_leaderboard_is_not_recorded_again_after_its_checkpoint(store):
+    store.crash_when = _saved('recorded')
+    _settle_until_done(store, _new_job())
+    assert store.leaderboard_calls == 1
+
+def test_rerun_of_finished_job_changes_nothing(store):
+    job, game_round = _settle_until_done(store, _new_job())
+    leaderboard_calls = store.leaderboard_calls
+    asyncio.run(settlement._run_job(job, game_round))
+    assert store.balances == EXPECTED_BALANCES
+    assert store.leaderboard_calls == leaderboard_calls